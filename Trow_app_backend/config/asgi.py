@@ -9,8 +9,38 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+
+class ApiASGIHandler(ASGIHandler):
+    """
+    Gestionnaire ASGI de Django qui résout les URLs avec ASGI_ROOT_URLCONF (vues asynchrones
+    des lectures de notes et de cours) au lieu de ROOT_URLCONF, utilisé par le déploiement WSGI.
+    """
+    # Réponses de longue durée (flux SSE, config/asgi_urls.py) servies hors du ThreadSensitiveContext de
+    # chaque requête : ce contexte crée un thread par requête (appels synchrones, ORM asynchrone compris),
+    # avec sa connexion à la base, et les garde jusqu'à la fin de la réponse. Leurs appels synchrones passent
+    # par le thread partagé d'asgiref : 1000 flux ouverts n'occupent ni 1000 threads ni 1000 connexions.
+    long_lived_paths = frozenset({'/api/v1/grades/stream/'})
+
+    async def __call__(self, scope, receive, send):
+        path = scope['path'].removeprefix(scope.get('root_path', '')) if scope['type'] == 'http' else None
+        if path in self.long_lived_paths:
+            await self.handle(scope, receive, send)
+        else:
+            await super().__call__(scope, receive, send)
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = settings.ASGI_ROOT_URLCONF
+        return request, error_response
+
+
+# Équivalent de get_asgi_application(), avec le gestionnaire ci-dessus
+django.setup(set_prefix=False)
+application = ApiASGIHandler()
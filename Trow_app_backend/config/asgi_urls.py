@@ -0,0 +1,19 @@
+# config/asgi_urls.py
+
+# URLs de l'application ASGI (config/asgi.py) : les lectures des notes et des cours sont servies par
+# les vues asynchrones de user/async_views.py, placées avant les routes du DefaultRouter.
+# Tout le reste (et, dans ces vues, toute requête autre qu'un GET JSON) suit les URLs de config/urls.py.
+from django.urls import path
+
+from user import async_views
+
+from .urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path('api/v1/grades/', async_views.note_list),
+    path('api/v1/grades/stream/', async_views.grade_stream), # Flux SSE (user/live.py), servi en ASGI uniquement
+    path('api/v1/grades/<int:pk>/', async_views.note_detail),
+    path('api/v1/courses/', async_views.cours_list),
+    path('api/v1/courses/<int:pk>/', async_views.cours_detail),
+    *wsgi_urlpatterns,
+]
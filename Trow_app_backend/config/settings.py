@@ -51,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'user.profiling.ProfilingMiddleware', # En premier : mesure toute la requête (inactif sans REQUEST_PROFILING ni SLOW_REQUEST_LOG)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware', 
@@ -80,6 +81,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# Application ASGI (config/asgi.py) : mêmes URLs, mais les lectures des notes et des cours
+# sont servies par des vues asynchrones (user/async_views.py)
+ASGI_APPLICATION = 'config.asgi.application'
+ASGI_ROOT_URLCONF = 'config.asgi_urls'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -95,6 +101,48 @@ DATABASES = {
     }
 }
 
+# DB_ENGINE=sqlite : base SQLite locale, sans service externe (tests, budgets de performance des endpoints)
+if os.getenv('DB_ENGINE', 'postgresql') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3')),
+    }
+
+# Cache partagé des réponses de lecture (spécialités, promotions : voir user/response_cache.py)
+# RESPONSE_CACHE_BACKEND : 'locmem' (mémoire de chaque processus), 'file' (répertoire partagé par
+# tous les workers d'une machine) ou le chemin complet d'un backend de cache Django.
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'locmem')
+RESPONSE_CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'trow-responses'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'var' / 'response_cache')),
+}
+_response_cache_backend, _response_cache_location = RESPONSE_CACHE_BACKENDS.get(
+    RESPONSE_CACHE_BACKEND, (RESPONSE_CACHE_BACKEND, '')
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    RESPONSE_CACHE_ALIAS: {
+        'BACKEND': _response_cache_backend,
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', _response_cache_location),
+        'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', 3600)), # Les entrées périmées (ancienne version) expirent
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+
+
+# Nombre de processus pour hacher les mots de passe de l'import groupé d'utilisateurs (user/imports.py).
+# Par défaut : un par cœur.
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '0')) or None
+# Nombre maximal de lignes par import : la requête est synchrone, et chaque mot de passe coûte ~0,4 s
+# de calcul (PBKDF2) réparti sur PASSWORD_HASH_WORKERS processus. Une rentrée plus grande est importée
+# en plusieurs fichiers ; le délai du serveur web (ex: gunicorn --timeout) doit couvrir l'import le plus long.
+USER_IMPORT_MAX_ROWS = int(os.getenv('USER_IMPORT_MAX_ROWS', '500'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -131,6 +179,50 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Fichiers écrits par l'application (exports de notes en arrière-plan, voir user/export_jobs.py).
+# Ils sont téléchargés via l'API (contrôle d'accès), pas servis directement sous MEDIA_URL.
+MEDIA_URL = 'media/'
+MEDIA_ROOT = Path(os.getenv('MEDIA_ROOT', BASE_DIR / 'media'))
+
+# Exports de notes en arrière-plan : 'thread' (pool de threads du processus web) ou
+# 'command' (processus dédié : python manage.py run_export_worker)
+EXPORT_WORKER = os.getenv('EXPORT_WORKER', 'thread')
+EXPORT_THREAD_WORKERS = int(os.getenv('EXPORT_THREAD_WORKERS', '2'))
+# Durée au-delà de laquelle un export "en cours" est considéré comme interrompu (secondes)
+EXPORT_JOB_TIMEOUT = int(os.getenv('EXPORT_JOB_TIMEOUT', '3600'))
+# Durée de conservation des exports terminés (jours), voir la commande purge_export_jobs
+EXPORT_RETENTION_DAYS = int(os.getenv('EXPORT_RETENTION_DAYS', '7'))
+
+# Flux de synchronisation /api/v1/sync/ (voir user/sync.py) : marge de relecture des lignes modifiées
+# (au moins la durée de la plus longue transaction d'écriture, ex: un import de notes) et durée de
+# conservation des traces de suppression (un jeton plus ancien repart de zéro)
+SYNC_OVERLAP_SECONDS = int(os.getenv('SYNC_OVERLAP_SECONDS', '300'))
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', '90'))
+# Nombre maximal de notes et de cours créés ou modifiés par page de synchronisation
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', '500'))
+
+# Flux SSE des notes /api/v1/grades/stream/ (voir user/live.py) : intervalle des commentaires de maintien
+# de la connexion, délai de reconnexion indiqué au client et nombre d'événements en attente par connexion
+LIVE_GRADES_HEARTBEAT_SECONDS = float(os.getenv('LIVE_GRADES_HEARTBEAT_SECONDS', '15'))
+LIVE_GRADES_RETRY_MS = int(os.getenv('LIVE_GRADES_RETRY_MS', '5000'))
+LIVE_GRADES_QUEUE_SIZE = int(os.getenv('LIVE_GRADES_QUEUE_SIZE', '100'))
+
+# Profilage des requêtes (voir user/profiling.py) : en-têtes Server-Timing et histogrammes de latence
+# exposés par /api/v1/_metrics. Désactivé, le middleware est retiré de la chaîne au démarrage.
+REQUEST_PROFILING = os.getenv('REQUEST_PROFILING', 'False').lower() in ('true', '1', 't')
+
+# Journal des requêtes lentes (voir user/slow_requests.py) : requêtes plus longues que le seuil, avec leurs
+# requêtes SQL et le plan de la plus lente, dans un fichier JSON lines tournant (une ligne par requête).
+# Synthèse : python manage.py slow_requests_report
+SLOW_REQUEST_LOG = os.getenv('SLOW_REQUEST_LOG', 'False').lower() in ('true', '1', 't')
+SLOW_REQUEST_LOG_FILE = Path(os.getenv('SLOW_REQUEST_LOG_FILE', BASE_DIR / 'logs' / 'slow_requests.log'))
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv('SLOW_REQUEST_THRESHOLD_MS', '500'))
+SLOW_REQUEST_SAMPLE_RATE = float(os.getenv('SLOW_REQUEST_SAMPLE_RATE', '1'))
+# Requêtes SQL conservées pendant une requête (la plus lente l'est toujours)
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv('SLOW_REQUEST_MAX_STATEMENTS', '500'))
+SLOW_REQUEST_LOG_MAX_BYTES = int(os.getenv('SLOW_REQUEST_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+SLOW_REQUEST_LOG_BACKUPS = int(os.getenv('SLOW_REQUEST_LOG_BACKUPS', '5'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -148,7 +240,16 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated', # Par défaut, toutes les API nécessitent une authentification
-    )
+    ),
+    # JSON (par défaut), API navigable, et JSON en colonnes pour les grandes listes (?format=columnar, voir user/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'user.renderers.ColumnarJSONRenderer',
+    ),
+    # Pagination par curseur (keyset) sur toutes les listes : ?cursor=... pour la page suivante/précédente
+    'DEFAULT_PAGINATION_CLASS': 'user.pagination.KeysetPagination',
+    'PAGE_SIZE': 50, # Taille de page par défaut (modifiable avec ?page_size=, bornée par max_page_size)
 }
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60), # Le jeton d'accès expire après 60 minutes
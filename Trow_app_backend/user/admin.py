@@ -3,7 +3,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin # Importe l'admin de base pour User de Django
 from django.contrib.auth.models import User # Importe le modèle User par défaut de Django
-from .models import Profile, Cours, Note, Speciality, Promotion # Importe tous vos modèles
+from .models import Profile, Cours, Note, Speciality, Promotion, CourseGradeStats, ExportJob # Importe tous vos modèles
 
 # Inline pour le Profile : permet d'éditer le Profile directement depuis la page de modification du User
 class ProfileInline(admin.StackedInline): # StackedInline affiche les champs verticalement
@@ -134,4 +134,32 @@ class PromotionAdmin(admin.ModelAdmin):
     list_display = ('name', 'year', 'speciality')
     list_filter = ('speciality', 'year',) # Filtres par spécialité et année
     search_fields = ('name', 'year',)
-    raw_id_fields = ('speciality',) # Utiliser raw_id_fields si beaucoup de spécialités
\ No newline at end of file
+    raw_id_fields = ('speciality',) # Utiliser raw_id_fields si beaucoup de spécialités
+
+
+# Statistiques des notes par cours : table maintenue automatiquement, consultable en lecture seule
+@admin.register(CourseGradeStats)
+class CourseGradeStatsAdmin(admin.ModelAdmin):
+    list_display = ('cours', 'count', 'min_valeur', 'max_valeur', 'updated_at')
+    search_fields = ('cours__nom',)
+    list_select_related = ('cours__speciality', 'cours__promotion')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# Exports de notes en arrière-plan (voir user/export_jobs.py) : suivi des statuts et des erreurs, en lecture seule
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'requested_by', 'row_count', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    list_select_related = ('requested_by__user',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
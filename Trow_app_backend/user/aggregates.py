@@ -0,0 +1,198 @@
+# user/aggregates.py
+
+# Maintenance des tables d'agrégats calculées à partir des notes.
+# Chaque écriture de Note (vue, saisie groupée, administration Django) fournit la liste
+# des changements (cours, ancienne valeur, nouvelle valeur) : les statistiques des cours
+# sont mises à jour de façon incrémentale, sans relire toutes les notes du cours, et les
+# relevés des étudiants concernés sont recalculés en une requête.
+
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Max, Min
+
+from .models import CourseGradeStats, Note, StudentTranscript
+
+# Colonnes lues pour construire les relevés de notes (une seule requête pour tous les étudiants)
+TRANSCRIPT_COLUMNS = (
+    'etudiant_id', 'cours_id', 'cours__nom', 'cours__coefficient',
+    'cours__speciality_id', 'cours__speciality__name', 'valeur', 'date_publication',
+)
+
+
+def _to_decimal(valeur):
+    # Les valeurs assignées par le code peuvent être des int, float ou str
+    return valeur if isinstance(valeur, Decimal) else Decimal(str(valeur))
+
+
+def _empty_histogram():
+    return [0] * CourseGradeStats.HISTOGRAM_BUCKETS
+
+
+def apply_grade_changes(changes):
+    """
+    Applique une liste de changements de notes aux statistiques des cours.
+
+    `changes` est un itérable de tuples (cours_id, ancienne_valeur, nouvelle_valeur) :
+    ancienne_valeur vaut None pour une création, nouvelle_valeur vaut None pour une suppression.
+    Les lignes de statistiques sont verrouillées (select_for_update) pendant la mise à jour.
+    """
+    by_cours = defaultdict(lambda: ([], []))
+    for cours_id, old_valeur, new_valeur in changes:
+        added, removed = by_cours[cours_id]
+        if old_valeur is not None:
+            removed.append(_to_decimal(old_valeur))
+        if new_valeur is not None:
+            added.append(_to_decimal(new_valeur))
+    if not by_cours:
+        return
+
+    with transaction.atomic():
+        # Crée les lignes manquantes pour les cours qui reçoivent des notes.
+        # ignore_conflicts évite une erreur si une autre transaction vient de la créer.
+        CourseGradeStats.objects.bulk_create(
+            [CourseGradeStats(cours_id=cours_id, histogram=_empty_histogram())
+             for cours_id, (added, _) in by_cours.items() if added],
+            ignore_conflicts=True
+        )
+        stats_rows = CourseGradeStats.objects.select_for_update().filter(cours_id__in=list(by_cours))
+
+        for stats in stats_rows:
+            added, removed = by_cours[stats.cours_id]
+            histogram = stats.histogram or _empty_histogram()
+            recompute_bounds = False
+
+            for valeur in removed:
+                stats.count -= 1
+                stats.total -= valeur
+                stats.total_squares -= valeur * valeur
+                histogram[CourseGradeStats.bucket_for(valeur)] -= 1
+                # Le minimum ou le maximum ne peut pas être déduit après une suppression
+                if valeur == stats.min_valeur or valeur == stats.max_valeur:
+                    recompute_bounds = True
+
+            for valeur in added:
+                stats.count += 1
+                stats.total += valeur
+                stats.total_squares += valeur * valeur
+                histogram[CourseGradeStats.bucket_for(valeur)] += 1
+                stats.min_valeur = valeur if stats.min_valeur is None else min(stats.min_valeur, valeur)
+                stats.max_valeur = valeur if stats.max_valeur is None else max(stats.max_valeur, valeur)
+
+            if stats.count <= 0:
+                stats.count, stats.total, stats.total_squares = 0, 0, 0
+                stats.min_valeur = stats.max_valeur = None
+            elif recompute_bounds:
+                # Les notes sont déjà à jour en base : une requête d'agrégat indexée sur le cours suffit
+                bounds = Note.objects.filter(cours_id=stats.cours_id).aggregate(Min('valeur'), Max('valeur'))
+                stats.min_valeur, stats.max_valeur = bounds['valeur__min'], bounds['valeur__max']
+
+            stats.histogram = histogram
+            stats.save()
+
+
+def compute_course_stats(cours_ids=None):
+    """
+    Calcule les statistiques à partir de zéro en parcourant les notes (curseur côté serveur).
+    Retourne un dictionnaire {cours_id: CourseGradeStats non enregistré}.
+    """
+    notes = Note.objects.order_by()
+    if cours_ids is not None:
+        notes = notes.filter(cours_id__in=cours_ids)
+
+    result = {}
+    for cours_id, valeur in notes.values_list('cours_id', 'valeur').iterator(chunk_size=5000):
+        stats = result.get(cours_id)
+        if stats is None:
+            stats = result[cours_id] = CourseGradeStats(cours_id=cours_id, histogram=_empty_histogram())
+        stats.count += 1
+        stats.total += valeur
+        stats.total_squares += valeur * valeur
+        stats.histogram[CourseGradeStats.bucket_for(valeur)] += 1
+        stats.min_valeur = valeur if stats.min_valeur is None else min(stats.min_valeur, valeur)
+        stats.max_valeur = valeur if stats.max_valeur is None else max(stats.max_valeur, valeur)
+    return result
+
+
+def refresh_course_stats(cours_id):
+    """Recalcule entièrement les statistiques d'un seul cours."""
+    with transaction.atomic():
+        CourseGradeStats.objects.filter(cours_id=cours_id).delete()
+        stats = compute_course_stats([cours_id]).get(cours_id)
+        if stats is not None:
+            stats.save()
+
+
+def _weighted_average(weighted_sum, coefficient_total):
+    if not coefficient_total:
+        return None
+    return (weighted_sum / coefficient_total).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def build_transcript(etudiant_id, rows):
+    """
+    Construit un StudentTranscript (non enregistré) à partir des lignes TRANSCRIPT_COLUMNS d'un étudiant.
+    """
+    grades = []
+    weighted_sum = coefficient_total = Decimal(0)
+    by_speciality = {} # speciality_id -> [nom, somme pondérée, somme des coefficients]
+
+    for _, cours_id, cours_nom, coefficient, speciality_id, speciality_name, valeur, date_publication in rows:
+        grades.append({
+            'cours_id': cours_id,
+            'cours_nom': cours_nom,
+            'speciality_id': speciality_id,
+            'speciality_name': speciality_name,
+            'coefficient': str(coefficient),
+            'valeur': str(valeur),
+            'date_publication': date_publication.isoformat(),
+        })
+        weighted_sum += valeur * coefficient
+        coefficient_total += coefficient
+        speciality = by_speciality.setdefault(speciality_id, [speciality_name, Decimal(0), Decimal(0)])
+        speciality[1] += valeur * coefficient
+        speciality[2] += coefficient
+
+    average = _weighted_average(weighted_sum, coefficient_total)
+    return StudentTranscript(
+        etudiant_id=etudiant_id,
+        grades=grades,
+        overall_average=average,
+        coefficient_total=coefficient_total,
+        speciality_averages=[
+            {
+                'speciality_id': speciality_id,
+                'speciality_name': name,
+                'average': str(_weighted_average(total, coefficients)),
+                'coefficient_total': str(coefficients),
+            }
+            for speciality_id, (name, total, coefficients) in by_speciality.items()
+        ],
+    )
+
+
+def refresh_transcripts(etudiant_ids):
+    """
+    Recalcule les relevés de notes des étudiants donnés : une requête de lecture pour
+    tous les étudiants, puis un upsert groupé. Les étudiants sans note n'ont pas de relevé.
+    """
+    etudiant_ids = set(etudiant_ids)
+    if not etudiant_ids:
+        return
+
+    rows_by_etudiant = defaultdict(list)
+    notes = Note.objects.filter(etudiant_id__in=etudiant_ids).order_by('cours__nom')
+    for row in notes.values_list(*TRANSCRIPT_COLUMNS):
+        rows_by_etudiant[row[0]].append(row)
+
+    transcripts = [build_transcript(etudiant_id, rows) for etudiant_id, rows in rows_by_etudiant.items()]
+    with transaction.atomic():
+        StudentTranscript.objects.filter(etudiant_id__in=etudiant_ids - set(rows_by_etudiant)).delete()
+        StudentTranscript.objects.bulk_create(
+            transcripts,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['etudiant'],
+            update_fields=['grades', 'overall_average', 'coefficient_total', 'speciality_averages', 'updated_at'],
+        )
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user'
+
+    def ready(self):
+        # Connecte les récepteurs de signaux (mise à jour des agrégats de notes)
+        from . import signals  # noqa: F401
@@ -0,0 +1,285 @@
+# user/async_views.py
+
+# Lectures asynchrones des notes et des cours (list et retrieve), servies par l'application ASGI
+# (config/asgi.py, URLs dans config/asgi_urls.py). Pendant la publication des résultats, des centaines
+# d'étudiants interrogent /grades/ en boucle : une vue asynchrone rend la main à la boucle d'événements
+# pendant chaque requête SQL au lieu d'immobiliser un worker.
+#
+# DRF n'a pas de vues asynchrones : ces vues réutilisent les pièces des ViewSets (get_queryset, règles
+# de visibilité, classes de permission, pagination, sérialiseurs) et n'en remplacent que les accès à la
+# base (authentification JWT, Principal, ETag, page de résultats) par l'ORM asynchrone (aget, aiterator).
+# Le Principal est construit de façon asynchrone avant les classes de permission : celles-ci le
+# retrouvent sur la requête (get_principal) et ne lisent plus la base.
+# Tout le reste (écritures, OPTIONS, API navigable, formats autres que JSON et JSON en colonnes) est délégué à la vue DRF
+# synchrone : les réponses restent identiques octet pour octet à celles du chemin WSGI.
+# Le flux SSE des notes (GradeStreamView, user/live.py) n'existe que dans l'application ASGI : une connexion
+# ouverte n'y coûte qu'une tâche asyncio, alors qu'elle immobiliserait un thread d'un serveur WSGI. Ses deux
+# lectures (utilisateur, Principal) passent par le thread partagé d'asgiref, dont la connexion est fermée aussitôt.
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.translation import gettext_lazy as _
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAcceptable, NotAuthenticated, NotFound, PermissionDenied
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .conditional import ConditionalGetMixin
+from .live import broker, format_event
+from .principal import aget_principal
+from .profiling import measure, set_principal, set_view_name
+from .versioning import aget_table_versions
+from .views import CoursViewSet, NoteViewSet
+
+# Correspondance méthode HTTP -> action du ViewSet, comme les routes du DefaultRouter (user/urls.py)
+LIST_ACTIONS = {'get': 'list', 'post': 'create'}
+DETAIL_ACTIONS = {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication (REST_FRAMEWORK dans settings.py) dont la lecture de l'utilisateur est asynchrone."""
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        # La validation du jeton (signature, expiration) ne lit pas la base
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        # Mêmes vérifications (et mêmes messages traduits) que JWTAuthentication.get_user
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError as error:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from error
+        try:
+            user = await self.user_model.objects.aget(**{jwt_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as error:
+            raise AuthenticationFailed(_("User not found"), code='user_not_found') from error
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code='user_inactive')
+        if jwt_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
+
+
+class AsyncReadView(View):
+    """
+    Vue asynchrone pour les actions list (detail=False) ou retrieve (detail=True) d'un ViewSet.
+    Usage : AsyncReadView.as_view(viewset=NoteViewSet, basename='grade', detail=False)
+    """
+    viewset = None
+    basename = None
+    detail = False
+    sync_view = None # Vue DRF synchrone des autres méthodes, construite par as_view
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        viewset = initkwargs.get('viewset', cls.viewset)
+        detail = initkwargs.get('detail', cls.detail)
+        initkwargs['sync_view'] = viewset.as_view(
+            DETAIL_ACTIONS if detail else LIST_ACTIONS, basename=initkwargs.get('basename', cls.basename), detail=detail
+        )
+        # Comme les vues DRF : l'authentification JWT n'utilise pas de cookie, pas de vérification CSRF
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def fallback(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+    post = put = patch = delete = head = options = fallback
+
+    async def get(self, request, *args, **kwargs):
+        drf_request = Request(request) # Ni parseurs ni authentification : le corps n'est pas lu
+        # Même libellé de métriques que la vue DRF (ProfiledViewMixin.initial)
+        set_view_name(f"{self.viewset.__name__}.{'retrieve' if self.detail else 'list'}")
+        view = self.viewset(
+            request=drf_request, args=args, kwargs=kwargs, format_kwarg=None, headers={},
+            action='retrieve' if self.detail else 'list', basename=self.basename, detail=self.detail,
+        )
+        # Comme ViewSet.as_view : les méthodes HTTP pointent vers les actions (en-tête Allow)
+        view.action_map = DETAIL_ACTIONS if self.detail else LIST_ACTIONS
+        for method, action_name in view.action_map.items():
+            setattr(view, method, getattr(view, action_name))
+        view.head = view.get
+        # Seuls les formats JSON (JSON, JSON en colonnes) sont servis ici : l'API navigable passe par la vue DRF
+        try:
+            renderer, media_type = view.perform_content_negotiation(drf_request)
+        except NotAcceptable:
+            return await self.fallback(request, *args, **kwargs)
+        if not isinstance(renderer, JSONRenderer):
+            return await self.fallback(request, *args, **kwargs)
+        drf_request.accepted_renderer, drf_request.accepted_media_type = renderer, media_type
+
+        try:
+            await self.check_permissions(view, drf_request)
+            if self.detail:
+                response = await self.retrieve(view, drf_request, **kwargs)
+            else:
+                response = await self.list(view, drf_request)
+        except APIException as error:
+            response = self.error_response(view, drf_request, error)
+        response['Allow'] = ', '.join(view.allowed_methods)
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+    async def check_permissions(self, view, request):
+        with measure('auth'):
+            result = await AsyncJWTAuthentication().aauthenticate(request)
+        request.user, request.auth = result if result is not None else (AnonymousUser(), None)
+        with measure('permissions'):
+            # Le Principal est construit ici : les classes de permission et get_queryset le réutilisent sans requête
+            set_principal(await aget_principal(request))
+            for permission in view.get_permissions():
+                if not permission.has_permission(request, view):
+                    if not request.user.is_authenticated:
+                        raise NotAuthenticated()
+                    raise PermissionDenied(getattr(permission, 'message', None), getattr(permission, 'code', None))
+
+    async def get_validators(self, view, request):
+        # ETag et Last-Modified des ViewSets qui les calculent (user/conditional.py), sinon None
+        if not isinstance(view, ConditionalGetMixin):
+            return None
+        return view.get_validators(request, await aget_table_versions(view.version_models))
+
+    async def conditional_response(self, view, request, handler):
+        validators = await self.get_validators(view, request)
+        if validators is None:
+            return await handler()
+        etag, last_modified = validators
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await handler()
+        return view.add_validator_headers(response, etag, last_modified)
+
+    async def list(self, view, request):
+        async def handler():
+            queryset = view.filter_queryset(view.get_queryset())
+            if view.paginator is None:
+                return self.render(request, view.get_serializer([obj async for obj in queryset.aiterator()], many=True).data)
+            page = await view.paginator.apaginate_queryset(queryset, request, view)
+            data = view.get_serializer(page, many=True).data
+            return self.render(request, view.paginator.get_paginated_response(data).data)
+
+        return await self.conditional_response(view, request, handler)
+
+    async def retrieve(self, view, request, **kwargs):
+        async def handler():
+            queryset = view.filter_queryset(view.get_queryset())
+            lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+            try:
+                obj = await queryset.aget(**{view.lookup_field: kwargs[lookup_url_kwarg]})
+            except queryset.model.DoesNotExist:
+                # Même message que get_object_or_404 dans la vue DRF
+                raise NotFound(f"No {queryset.model._meta.object_name} matches the given query.")
+            view.check_object_permissions(request, obj)
+            return self.render(request, view.get_serializer(obj).data)
+
+        return await self.conditional_response(view, request, handler)
+
+    def render(self, request, data, status=200):
+        renderer = request.accepted_renderer
+        response = HttpResponse(status=status, content_type=renderer.media_type)
+        with measure('render'):
+            response.content = renderer.render(data, request.accepted_media_type, {'request': request, 'response': response})
+        return response
+
+    def error_response(self, view, request, error):
+        # Même corps et mêmes en-têtes que le gestionnaire d'exceptions de DRF
+        data = error.detail if isinstance(error.detail, (list, dict)) else {'detail': error.detail}
+        response = self.render(request, data, status=error.status_code)
+        if isinstance(error, (NotAuthenticated, AuthenticationFailed)):
+            response['WWW-Authenticate'] = AsyncJWTAuthentication().authenticate_header(request)
+        return response
+
+
+def _close_connection():
+    # Pas dans une transaction en cours (ATOMIC_REQUESTS, TestCase) : elle serait annulée
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+class GradeStreamView(View):
+    """
+    Flux SSE des notes de l'étudiant connecté (user/live.py). Authentification JWT comme les autres
+    vues (en-tête Authorization) ; réservé aux étudiants. La connexion reste ouverte : un commentaire
+    est envoyé toutes les LIVE_GRADES_HEARTBEAT_SECONDS pour que les proxys ne la ferment pas.
+    Servie hors du thread propre à chaque requête (voir ApiASGIHandler dans config/asgi.py).
+    """
+    http_method_names = ['get']
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def get(self, request):
+        drf_request = Request(request)
+        set_view_name('GradeStreamView.stream')
+        authentication = AsyncJWTAuthentication()
+        try:
+            with measure('auth'):
+                result = await authentication.aauthenticate(drf_request)
+        except APIException as error:
+            result, auth_error = None, error
+        else:
+            auth_error = None if result is not None else NotAuthenticated()
+        if auth_error is not None:
+            response = JsonResponse({'detail': auth_error.detail}, status=auth_error.status_code)
+            response['WWW-Authenticate'] = authentication.authenticate_header(drf_request)
+            return response
+        drf_request.user, drf_request.auth = result
+        principal = await aget_principal(drf_request)
+        # Plus aucune lecture de la base jusqu'à la fin du flux : la connexion du thread qui a exécuté les
+        # requêtes est fermée tout de suite, et non à la fin de la réponse (request_finished)
+        await sync_to_async(_close_connection)()
+        set_principal(principal)
+        if principal is None or not principal.is_student:
+            return JsonResponse({'detail': PermissionDenied.default_detail}, status=PermissionDenied.status_code)
+
+        # Abonnement avant la réponse : aucune note publiée après l'événement "ready" n'est perdue
+        subscription = broker.subscribe(principal.profile_id)
+        response = StreamingHttpResponse(self.events(subscription), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no' # Pas de mise en tampon par nginx
+        # Réponse jamais envoyée (client parti avant) : le générateur ne démarre pas, l'abonnement est libéré ici
+        response._resource_closers.append(lambda: broker.unsubscribe(subscription))
+        return response
+
+    @staticmethod
+    async def events(subscription):
+        try:
+            yield format_event('ready', {}, retry=settings.LIVE_GRADES_RETRY_MS)
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), settings.LIVE_GRADES_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b': ping\n\n'
+                    continue
+                yield format_event(event['event'], event['data'])
+        finally:
+            # Fin du flux, y compris à la déconnexion du client (tâche annulée par le gestionnaire ASGI)
+            broker.unsubscribe(subscription)
+
+
+# Vues de config/asgi_urls.py
+note_list = AsyncReadView.as_view(viewset=NoteViewSet, basename='grade', detail=False)
+note_detail = AsyncReadView.as_view(viewset=NoteViewSet, basename='grade', detail=True)
+cours_list = AsyncReadView.as_view(viewset=CoursViewSet, basename='course', detail=False)
+cours_detail = AsyncReadView.as_view(viewset=CoursViewSet, basename='course', detail=True)
+grade_stream = GradeStreamView.as_view()
@@ -0,0 +1,81 @@
+# user/conditional.py
+
+# GET conditionnels (ETag / Last-Modified) pour les données qui changent rarement.
+# L'ETag est calculé à partir des compteurs de version des tables lues par la vue (user/versioning.py),
+# de l'URL absolue (schéma et hôte compris : les liens de pagination sont absolus), du type de contenu négocié et, si besoin, du périmètre de visibilité de l'appelant.
+# Si le client renvoie cet ETag (If-None-Match) ou une date encore valide (If-Modified-Since),
+# la réponse 304 part avant que le moindre queryset ne soit évalué ou sérialisé.
+
+import hashlib
+import json
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .versioning import get_table_versions
+
+
+class ConditionalGetMixin:
+    """
+    Mixin de ViewSet : ajoute ETag et Last-Modified aux actions list et retrieve,
+    et répond 304 Not Modified quand la copie du client est encore à jour.
+    """
+    # Modèles dont les données apparaissent dans la réponse (la table principale et celles des champs liés)
+    version_models = ()
+
+    def get_version_scope(self):
+        """
+        Périmètre de l'appelant qui change le contenu de la réponse (ex: cours visibles),
+        ou None si tous les utilisateurs reçoivent les mêmes données.
+        """
+        return None
+
+    def get_validators(self, request, versions=None):
+        """
+        Retourne (ETag, Last-Modified). `versions` : résultat de get_table_versions(version_models),
+        déjà lu par l'appelant (ex: vue asynchrone) ; lu ici sinon.
+        """
+        if versions is None:
+            versions = get_table_versions(self.version_models)
+        payload = json.dumps(
+            [
+                request.build_absolute_uri(), # Les liens next/previous contiennent le schéma et l'hôte de la requête
+                request.accepted_media_type, # JSON et API navigable n'ont pas le même contenu
+                # La date accompagne le compteur : un compteur remis à zéro (restauration de la base) change l'ETag
+                [[label, version, updated_at] for label, version, updated_at in versions],
+                self.get_version_scope(),
+            ],
+            separators=(',', ':'), default=str,
+        )
+        etag = quote_etag(hashlib.sha1(payload.encode()).hexdigest()) # ETag fort : contenu identique à l'octet près
+        timestamps = [updated_at.timestamp() for _, _, updated_at in versions if updated_at is not None]
+        last_modified = int(max(timestamps)) if timestamps else None
+        return etag, last_modified
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        # Les permissions ont déjà été vérifiées (initial) : un 304 ne révèle rien à un appelant non autorisé
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self.get_fresh_response(request, etag, handler, *args, **kwargs)
+        return self.add_validator_headers(response, etag, last_modified)
+
+    def add_validator_headers(self, response, etag, last_modified):
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        # Réponse propre à l'utilisateur : le client la garde mais la revalide à chaque utilisation
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Accept', 'Authorization'))
+        return response
+
+    def get_fresh_response(self, request, etag, handler, *args, **kwargs):
+        """Construit la réponse complète (point d'extension pour le cache des réponses)."""
+        return handler(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
@@ -0,0 +1,186 @@
+# user/export_jobs.py
+
+# Exports CSV des notes en arrière-plan. Même en flux, export_csv occupe un worker HTTP et une connexion à
+# la base pendant plusieurs minutes pour un export complet de l'établissement. Ici la requête HTTP ne fait
+# qu'enregistrer un ExportJob ; le fichier est écrit par un worker local, sans Redis ni Celery :
+# - EXPORT_WORKER = 'thread' (par défaut) : un pool de threads du processus web, démarré après la validation
+#   de la transaction qui crée l'export ;
+# - EXPORT_WORKER = 'command' : un processus dédié, `python manage.py run_export_worker`, qui lit la file
+#   des exports en attente dans la base (plusieurs workers peuvent tourner : chaque export est réservé
+#   par une mise à jour conditionnelle).
+# Les lignes sont celles de export_csv (user/exports.py), avec la même visibilité par rôle, écrites par
+# paquets dans un fichier temporaire puis copiées dans le stockage des médias (MEDIA_ROOT/exports/).
+# En mode 'thread', les exports en attente n'existent que dans la file du processus qui les a reçus : chaque
+# demande d'export reprend donc les exports en attente qui ne sont pas dans le pool de ce processus, et remet
+# en attente ceux restés en cours au-delà de EXPORT_JOB_TIMEOUT (processus redémarré pendant l'écriture).
+# Conservation : les exports terminés sont supprimés (ligne et fichier) par `python manage.py purge_export_jobs`.
+# Déduplication : l'empreinte d'un export combine le périmètre de visibilité de l'appelant (notes_scope)
+# et les versions des tables lues (user/versioning.py). Une nouvelle demande identique, tant qu'aucune de
+# ces tables n'a changé, réutilise l'export existant (en cours ou terminé) au lieu d'en écrire un autre.
+
+import hashlib
+import json
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .exports import iter_notes_csv
+from .models import Cours, ExportJob, Note, Profile, Promotion, Speciality
+from .principal import Principal
+from .versioning import get_table_versions
+from .visibility import notes_scope, visible_notes
+
+# Tables lues par les colonnes de l'export (CSV_COLUMNS) : une écriture sur l'une d'elles invalide les exports
+EXPORT_VERSION_MODELS = (Note, Cours, Profile, User, Promotion, Speciality)
+
+_executor = None
+# Exports confiés au pool de threads de ce processus et pas encore terminés
+_submitted = set()
+_submitted_lock = threading.Lock()
+
+
+def export_fingerprint(scope, versions):
+    payload = json.dumps([scope, versions], separators=(',', ':'), default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def request_export(principal):
+    """
+    Retourne (export, créé) : l'export existant de même empreinte s'il y en a un (hors échecs),
+    sinon un nouvel export en attente, confié au worker après la validation de la transaction.
+    """
+    if settings.EXPORT_WORKER == 'thread':
+        resume_thread_jobs()
+    scope = notes_scope(principal)
+    fingerprint = export_fingerprint(scope, get_table_versions(EXPORT_VERSION_MODELS))
+    existing = ExportJob.objects.exclude(status=ExportJob.Status.FAILED).filter(fingerprint=fingerprint).first()
+    if existing is not None:
+        return existing, False
+    try:
+        with transaction.atomic():
+            job = ExportJob.objects.create(requested_by=principal.profile, scope=scope, fingerprint=fingerprint)
+    except IntegrityError:
+        # Demande identique enregistrée entre-temps (contrainte d'unicité sur l'empreinte)
+        return ExportJob.objects.exclude(status=ExportJob.Status.FAILED).get(fingerprint=fingerprint), False
+    if settings.EXPORT_WORKER == 'thread':
+        transaction.on_commit(lambda: _submit(job.pk))
+    return job, True
+
+
+def can_access_export(principal, job):
+    """Un export est lisible par les appelants de même périmètre (ceux qui l'auraient obtenu), et par les administrateurs."""
+    return principal is not None and (principal.is_admin or job.scope == notes_scope(principal))
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.EXPORT_THREAD_WORKERS, thread_name_prefix='export')
+    return _executor
+
+
+def _submit(job_id):
+    with _submitted_lock:
+        if job_id in _submitted:
+            return
+        _submitted.add(job_id)
+    _get_executor().submit(_run_in_thread, job_id)
+
+
+def _run_in_thread(job_id):
+    try:
+        run_export_job(job_id)
+    finally:
+        with _submitted_lock:
+            _submitted.discard(job_id)
+        connection.close() # Connexion propre à ce thread : elle n'est fermée par aucun cycle de requête
+
+
+def resume_thread_jobs():
+    """
+    Mode 'thread' : remet en attente les exports interrompus et confie au pool ceux en attente qui n'y sont pas
+    (processus redémarré, ou arrêté avant la fin). Un export déjà pris par un autre processus est ignoré par claim_job.
+    """
+    requeue_stale_jobs()
+    pending = ExportJob.objects.filter(status=ExportJob.Status.PENDING).order_by('created_at').values_list('pk', flat=True)
+    for job_id in pending:
+        _submit(job_id)
+
+
+def _principal_from_scope(scope):
+    # visible_notes ne lit que le rôle, le profil et les spécialités assignées (les valeurs de notes_scope)
+    role = scope[0] if scope else None
+    profile_id = scope[1] if len(scope) > 1 else None
+    speciality_ids = scope[2] if len(scope) > 2 else []
+    return Principal(profile=Profile(pk=profile_id, role=role), role=role, speciality_ids=frozenset(speciality_ids))
+
+
+def claim_job(job_id):
+    """Réserve un export en attente ; faux s'il a déjà été pris par un autre worker."""
+    return bool(ExportJob.objects.filter(pk=job_id, status=ExportJob.Status.PENDING).update(
+        status=ExportJob.Status.RUNNING, started_at=timezone.now(),
+    ))
+
+
+def run_export_job(job_id):
+    """Écrit le fichier d'un export en attente. Retourne faux si l'export a déjà été réservé par un autre worker."""
+    if not claim_job(job_id):
+        return False
+    job = ExportJob.objects.get(pk=job_id)
+    try:
+        notes = visible_notes(_principal_from_scope(job.scope), Note.objects.all())
+        row_count = -1 # Sans l'en-tête
+        with tempfile.TemporaryFile() as buffer:
+            for line in iter_notes_csv(notes):
+                buffer.write(line.encode('utf-8'))
+                row_count += 1
+            buffer.seek(0)
+            job.file.name = default_storage.save(f'exports/notes_{job.pk}_{job.fingerprint[:12]}.csv', File(buffer))
+        job.row_count = row_count
+        job.status = ExportJob.Status.DONE
+    except Exception as error:
+        job.status = ExportJob.Status.FAILED
+        job.error = f"{type(error).__name__}: {error}"
+    job.finished_at = timezone.now()
+    job.save(update_fields=['file', 'row_count', 'status', 'error', 'finished_at'])
+    return True
+
+
+def requeue_stale_jobs(timeout=None):
+    """Remet en attente les exports restés en cours au-delà du délai (worker arrêté pendant l'écriture)."""
+    timeout = settings.EXPORT_JOB_TIMEOUT if timeout is None else timeout
+    return ExportJob.objects.filter(
+        status=ExportJob.Status.RUNNING, started_at__lt=timezone.now() - timedelta(seconds=timeout),
+    ).update(status=ExportJob.Status.PENDING, started_at=None)
+
+
+def run_pending_jobs(limit=None):
+    """Exécute les exports en attente, du plus ancien au plus récent. Retourne le nombre d'exports exécutés."""
+    pending = ExportJob.objects.filter(status=ExportJob.Status.PENDING).order_by('created_at').values_list('pk', flat=True)
+    return sum(run_export_job(job_id) for job_id in list(pending[:limit] if limit else pending))
+
+
+def purge_export_jobs(days=None):
+    """
+    Supprime les exports terminés (ou en échec) depuis plus de `days` jours, avec leurs fichiers.
+    Retourne le nombre d'exports supprimés.
+    """
+    days = settings.EXPORT_RETENTION_DAYS if days is None else days
+    expired = ExportJob.objects.filter(
+        status__in=[ExportJob.Status.DONE, ExportJob.Status.FAILED],
+        finished_at__lt=timezone.now() - timedelta(days=days),
+    )
+    deleted = 0
+    for job in expired.only('pk', 'file').iterator():
+        if job.file.name:
+            default_storage.delete(job.file.name)
+        deleted += ExportJob.objects.filter(pk=job.pk).delete()[0]
+    return deleted
@@ -0,0 +1,60 @@
+# user/exports.py
+
+# Génération des exports CSV des notes.
+# Les lignes sont lues avec un curseur côté serveur (iterator) sous forme de tuples plats,
+# sans instancier de modèles : la mémoire reste constante quel que soit le nombre de notes.
+
+import csv
+
+# En-tête du CSV (noms des colonnes)
+CSV_HEADER = [
+    'Nom Etudiant', 'Cours', 'Note', 'Date Publication', 'Publie Par',
+    'Specialite Etudiant', 'Promotion Etudiant', 'Specialite Cours'
+]
+
+# Colonnes lues en base, dans le même ordre que l'en-tête
+CSV_COLUMNS = (
+    'etudiant__user__username',
+    'cours__nom',
+    'valeur',
+    'date_publication',
+    'publie_par__user__username',
+    'etudiant__promotion__speciality__name',
+    'etudiant__promotion__name',
+    'cours__speciality__name',
+)
+
+# Nombre de lignes récupérées à chaque aller-retour avec la base de données
+CSV_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """
+    Pseudo-fichier dont la méthode write() renvoie simplement la valeur écrite.
+    Permet d'utiliser csv.writer pour produire les lignes une par une.
+    """
+    def write(self, value):
+        return value
+
+
+def iter_notes_csv(queryset, chunk_size=CSV_CHUNK_SIZE):
+    """
+    Générateur des lignes CSV (en-tête compris) pour un queryset de notes.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+
+    # select_related(None) : les jointures sont faites par values_list, inutile de charger les modèles liés
+    rows = queryset.select_related(None).values_list(*CSV_COLUMNS).iterator(chunk_size=chunk_size)
+    for (username, cours_nom, valeur, date_publication, publie_par,
+         etudiant_speciality, etudiant_promotion, cours_speciality) in rows:
+        yield writer.writerow([
+            username,
+            cours_nom,
+            str(valeur), # Convertir le Decimal en string pour le CSV
+            date_publication.strftime("%Y-%m-%d %H:%M:%S"), # Formater la date
+            publie_par or 'N/A', # Gérer le cas où publie_par est NULL
+            etudiant_speciality or 'N/A',
+            etudiant_promotion or 'N/A',
+            cours_speciality or 'N/A',
+        ])
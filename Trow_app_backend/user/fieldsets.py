@@ -0,0 +1,177 @@
+# user/fieldsets.py
+
+# Champs partiels ("sparse fieldsets") pour les réponses de l'API : ?fields=id,nom ne renvoie que ces champs,
+# ?omit=description les retire. La notation pointée s'applique aux sérialiseurs imbriqués (?fields=id,user.username).
+# Les noms inconnus sont ignorés : si aucun nom demandé n'est connu, tous les champs sont conservés.
+# Le queryset suit les champs retenus : les jointures select_related et les préchargements dont aucun champ
+# n'a besoin sont retirés, et .only() limite les colonnes lues. Le volume de la réponse et le coût de la
+# requête diminuent ensemble (ex: ?fields=id,nom sur les cours ne lit plus que deux colonnes, sans jointure).
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def parse_fieldset(value):
+    """'id,user.username,user.email' -> {'id': {}, 'user': {'username': {}, 'email': {}}}"""
+    tree = {}
+    for item in (value or '').split(','):
+        node = tree
+        for part in item.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def _nested(field):
+    # Sérialiseur imbriqué d'un champ (le sérialiseur enfant pour many=True), ou None
+    target = field.child if isinstance(field, serializers.ListSerializer) else field
+    return target if isinstance(target, serializers.Serializer) else None
+
+
+def _prune(serializer, keep, omit):
+    # Seuls les noms connus comptent : ?fields=inconnu renvoie les objets complets, pas des objets vides
+    keep = {name: subtree for name, subtree in keep.items() if name in serializer.fields}
+    if keep:
+        for name in list(serializer.fields):
+            if name not in keep:
+                serializer.fields.pop(name)
+    for name, subtree in keep.items():
+        nested = _nested(serializer.fields[name])
+        if subtree and nested is not None:
+            _prune(nested, subtree, {})
+    for name, subtree in omit.items():
+        if not subtree:
+            serializer.fields.pop(name, None)
+        elif name in serializer.fields and _nested(serializer.fields[name]) is not None:
+            _prune(_nested(serializer.fields[name]), {}, subtree)
+
+
+def requested_fieldset(request):
+    """(champs à garder, champs à retirer) demandés par une lecture, ou None sans paramètre (ou pour une écriture)."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = request.query_params
+    if FIELDS_PARAM not in params and OMIT_PARAM not in params:
+        return None
+    return parse_fieldset(params.get(FIELDS_PARAM)), parse_fieldset(params.get(OMIT_PARAM))
+
+
+class SparseFieldsetMixin:
+    """
+    Mixin de sérialiseur : applique ?fields= et ?omit= de la requête (contexte 'request') aux lectures.
+    Seul le sérialiseur racine lit la requête ; les sérialiseurs imbriqués sont réduits par la notation pointée.
+    Les champs calculés (SerializerMethodField, méthodes du modèle) déclarent les attributs qu'ils lisent
+    dans Meta.field_sources pour que le queryset puisse être réduit (voir prune_queryset).
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fieldset = requested_fieldset(self._context.get('request'))
+        if fieldset is not None:
+            _prune(self, *fieldset)
+
+
+def _field_paths(serializer, prefix=()):
+    """
+    Chemins d'attributs lus par les champs en lecture d'un sérialiseur (tuples de noms), ou None si
+    un champ lit l'instance d'une façon inconnue (source='*', méthode sans Meta.field_sources).
+    """
+    field_sources = getattr(getattr(serializer, 'Meta', None), 'field_sources', {})
+    paths = set()
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in field_sources:
+            sources = field_sources[name]
+        elif field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+            return None
+        else:
+            sources = (field.source,)
+        for source in sources:
+            path = prefix + tuple(source.split('.'))
+            nested = _nested(field)
+            if nested is None:
+                paths.add(path)
+                continue
+            nested_paths = _field_paths(nested, path)
+            if nested_paths is None:
+                return None
+            paths.add(path)
+            paths |= nested_paths
+    return paths
+
+
+def _resolve(model, path):
+    """
+    Traduit un chemin d'attributs en (relations à joindre, colonne, racine à précharger).
+    Retourne None si le chemin ne correspond pas à des champs du modèle.
+    """
+    relations = []
+    for index, name in enumerate(path):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        orm_path = '__'.join(path[:index + 1])
+        if field.many_to_many or field.one_to_many:
+            return relations, None, orm_path # Relation multi-valuée : préchargée (prefetch_related)
+        if field.one_to_one and not field.concrete:
+            return None # Relation inverse : hors du périmètre de select_related
+        if not field.is_relation or index == len(path) - 1:
+            return relations, orm_path, None # Colonne (pour une clé étrangère : son identifiant)
+        relations.append(orm_path)
+        model = field.related_model
+    return relations, None, None
+
+
+def prune_queryset(queryset, serializer, extra_paths=()):
+    """
+    Réduit un queryset aux colonnes et aux jointures lues par les champs (déjà filtrés) d'un sérialiseur.
+    `extra_paths` : chemins ORM lus ailleurs (ex: clé de tri de la pagination). Le queryset est retourné
+    inchangé si un champ lit l'instance d'une façon qui ne peut pas être déduite.
+    """
+    paths = _field_paths(serializer)
+    if paths is None:
+        return queryset
+    paths |= {tuple(path.lstrip('-').split('__')) for path in extra_paths}
+
+    relations, columns, prefetch_roots = set(), set(), set()
+    for path in paths:
+        resolved = _resolve(queryset.model, path)
+        if resolved is None:
+            return queryset
+        path_relations, column, prefetch_root = resolved
+        relations.update(path_relations)
+        if column:
+            columns.add(column)
+        if prefetch_root:
+            prefetch_roots.add(prefetch_root)
+
+    # Seuls les préchargements dont la racine est encore lue sont conservés (avec leur queryset)
+    prefetches = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if getattr(lookup, 'prefetch_through', lookup).split('__')[0] in prefetch_roots
+    ]
+    # Une relation jointe doit être chargée (only) ; la clé primaire l'est toujours
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if relations:
+        queryset = queryset.select_related(*sorted(relations))
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset.only(*sorted(columns | relations | {'pk'}))
+
+
+class SparseFieldsetViewMixin:
+    """
+    Mixin de ViewSet : réduit le queryset des actions list et retrieve aux champs demandés
+    (le sérialiseur de la vue doit utiliser SparseFieldsetMixin).
+    """
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action not in ('list', 'retrieve') or requested_fieldset(self.request) is None:
+            return queryset
+        paginator = self.paginator if self.action == 'list' else None
+        return prune_queryset(queryset, self.get_serializer(), extra_paths=getattr(paginator, 'ordering', ()))
@@ -0,0 +1,166 @@
+# user/grade_imports.py
+
+# Import des notes depuis un tableur (CSV), pour les formateurs qui tiennent leurs notes hors de l'application.
+# Deux mises en page sont acceptées : celle de l'export CSV (user/exports.py), qui peut donc être modifiée
+# puis renvoyée, ou une mise en page simple username / course / grade.
+# Le fichier est lu ligne par ligne (jamais chargé en entier) ; chaque ligne est réduite à un tuple
+# (ligne, nom d'utilisateur, nom du cours, valeur). Les noms d'utilisateur et de cours sont ensuite
+# résolus avec un index en mémoire construit en une requête chacun (values_list : aucun modèle instancié),
+# puis les notes sont écrites par lots avec upsert_notes (user/services.py), sur la contrainte
+# d'unicité (etudiant, cours). Un fichier de 50 000 lignes ne crée donc jamais 50 000 instances.
+
+import codecs
+import csv
+import itertools
+
+from rest_framework import serializers
+
+from .imports import ImportFormatError
+from .models import Cours, Profile
+from .services import upsert_notes
+
+# Colonnes lues pour chaque mise en page : (nom d'utilisateur, nom du cours, note)
+GRADE_CSV_LAYOUTS = {
+    'export': ('Nom Etudiant', 'Cours', 'Note'), # En-tête de export_csv (les autres colonnes sont ignorées)
+    'simple': ('username', 'course', 'grade'),
+}
+
+# Nombre de notes écrites par transaction (chaque lot verrouille ses notes existantes le temps de l'écriture)
+GRADE_IMPORT_CHUNK_SIZE = 1000
+
+# Nombre maximal de lignes par fichier (la réponse contient une entrée par ligne)
+MAX_GRADE_IMPORT_ROWS = 100000
+
+# Même règle de validation que la saisie groupée (NoteBulkItemSerializer)
+_VALEUR_FIELD = serializers.DecimalField(max_digits=5, decimal_places=2)
+
+
+def open_grade_csv(uploaded_file):
+    """
+    Lit l'en-tête du fichier et retourne (mise en page, itérateur de lignes). L'itérateur produit des
+    tuples (numéro de ligne, nom d'utilisateur, nom du cours, note brute) au fil de la lecture du fichier.
+    Le séparateur (',' ou ';', selon le tableur) est déduit de l'en-tête.
+    """
+    # Lecture ligne par ligne : le décodeur incrémental gère le BOM ajouté par Excel
+    lines = codecs.iterdecode(uploaded_file, 'utf-8-sig')
+    try:
+        header_line = next(lines, '')
+    except UnicodeDecodeError:
+        raise ImportFormatError("Le fichier doit être encodé en UTF-8.")
+    delimiter = ';' if header_line.count(';') > header_line.count(',') else ','
+    reader = csv.reader(itertools.chain([header_line], lines), delimiter=delimiter)
+    header = [column.strip() for column in next(reader, [])]
+
+    for layout, columns in GRADE_CSV_LAYOUTS.items():
+        if all(column in header for column in columns):
+            indexes = [header.index(column) for column in columns]
+            return layout, _iter_rows(reader, indexes)
+    expected = ' ou '.join(', '.join(columns) for columns in GRADE_CSV_LAYOUTS.values())
+    raise ImportFormatError(f"Colonnes attendues dans le CSV : {expected}.")
+
+
+def _iter_rows(reader, indexes):
+    try:
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue # Lignes vides laissées par le tableur
+            yield (reader.line_num, *(row[index].strip() if index < len(row) else '' for index in indexes))
+    except UnicodeDecodeError:
+        raise ImportFormatError(f"Le fichier doit être encodé en UTF-8 (ligne {reader.line_num + 1}).")
+
+
+def _parse_valeur(raw):
+    # Les tableurs en français écrivent les décimales avec une virgule (14,5)
+    return _VALEUR_FIELD.run_validation(raw.replace(',', '.'))
+
+
+def import_grades(uploaded_file, principal, chunk_size=GRADE_IMPORT_CHUNK_SIZE):
+    """
+    Importe les notes d'un fichier CSV au nom de `principal`. Les lignes valides sont écrites même si
+    d'autres sont en erreur. Retourne le rapport : mise en page, compteurs, erreurs détaillées et
+    statut de chaque ligne ('created', 'updated', 'unchanged' ou 'error').
+    """
+    layout, rows = open_grade_csv(uploaded_file)
+    results = {} # Numéro de ligne -> entrée du rapport
+    errors = {}
+
+    def add_error(line, username, course, field, message):
+        results[line] = {'line': line, 'status': 'error'}
+        entry = errors.setdefault(line, {'line': line, 'username': username, 'course': course, 'errors': {}})
+        entry['errors'].setdefault(field, []).append(message)
+
+    # 1. Lecture du fichier : format de chaque ligne, sans accès à la base
+    parsed = []
+    usernames, course_names = set(), set()
+    for line, username, course, grade in rows:
+        if len(results) + len(parsed) >= MAX_GRADE_IMPORT_ROWS:
+            raise ImportFormatError(f"Un import est limité à {MAX_GRADE_IMPORT_ROWS} lignes.")
+        valeur = None
+        if not username:
+            add_error(line, username, course, 'username', "Ce champ est obligatoire.")
+        if not course:
+            add_error(line, username, course, 'course', "Ce champ est obligatoire.")
+        try:
+            valeur = _parse_valeur(grade)
+        except serializers.ValidationError as error:
+            for message in error.detail:
+                add_error(line, username, course, 'grade', str(message))
+        if line not in errors:
+            parsed.append((line, username, course, valeur))
+            usernames.add(username)
+            course_names.add(course)
+    if not parsed and not errors:
+        raise ImportFormatError("Aucune note à importer.")
+
+    # 2. Index en mémoire : une requête pour les étudiants, une pour les cours
+    students = dict(
+        Profile.objects.filter(role=Profile.Roles.ETUDIANT, user__username__in=usernames).values_list('user__username', 'id')
+    )
+    courses = {
+        nom: Cours(pk=pk, formateur_id=formateur_id, speciality_id=speciality_id) # Instances légères, une par cours
+        for nom, pk, formateur_id, speciality_id in Cours.objects.filter(nom__in=course_names).values_list(
+            'nom', 'id', 'formateur_id', 'speciality_id'
+        )
+    }
+
+    # 3. Résolution des lignes et contrôle des doublons (upsert_notes exige des paires uniques)
+    to_write = [] # (ligne, (etudiant_id, cours_id, valeur))
+    seen = {}
+    for line, username, course, valeur in parsed:
+        etudiant_id = students.get(username)
+        cours_obj = courses.get(course)
+        if etudiant_id is None:
+            add_error(line, username, course, 'username', "Étudiant introuvable.")
+        if cours_obj is None:
+            add_error(line, username, course, 'course', "Cours introuvable.")
+        elif principal.is_trainer and not principal.manages_cours(cours_obj):
+            add_error(line, username, course, 'course', "Vous ne pouvez agir que sur les notes des cours que vous enseignez ou de vos spécialités assignées.")
+        if line in errors:
+            continue
+        key = (etudiant_id, cours_obj.pk)
+        if key in seen:
+            add_error(line, username, course, 'username', f"Cet étudiant a déjà une note pour ce cours à la ligne {seen[key]}.")
+            continue
+        seen[key] = line
+        to_write.append((line, (etudiant_id, cours_obj.pk, valeur)))
+
+    # 4. Écriture par lots : une transaction (et un nombre fixe de requêtes) par lot.
+    # Les lignes sont regroupées par étudiant : le relevé de chaque étudiant n'est recalculé que dans
+    # un seul lot (sinon un tableur trié par cours recalculerait les mêmes relevés à chaque lot).
+    to_write.sort(key=lambda item: item[1][:2])
+    counts = {'created': 0, 'updated': 0, 'unchanged': 0}
+    for start in range(0, len(to_write), chunk_size):
+        chunk = to_write[start:start + chunk_size]
+        statuses = []
+        for key, value in upsert_notes([row for _, row in chunk], publie_par=principal.profile, statuses=statuses).items():
+            counts[key] += value
+        for (line, _), status in zip(chunk, statuses):
+            results[line] = {'line': line, 'status': status}
+
+    return {
+        'layout': layout,
+        'rows': len(results),
+        **counts,
+        'errors': [errors[line] for line in sorted(errors)],
+        'results': [results[line] for line in sorted(results)],
+    }
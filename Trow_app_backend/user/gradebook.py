@@ -0,0 +1,128 @@
+# user/gradebook.py
+
+# Tableau de notes d'une promotion (étudiants × cours), pour GET /api/promotions/{id}/gradebook/.
+# Les lignes sont les étudiants de la promotion, les colonnes les cours de la promotion ou de sa spécialité
+# (les cours visibles de l'appelant, voir user/visibility.py).
+# Les cellules sont remplies par une seule requête d'agrégat, qui pivote les notes en SQL : une ligne par
+# étudiant, une colonne MAX(CASE WHEN cours_id = X THEN valeur END) par cours. Le nombre de requêtes ne
+# dépend donc pas de la taille de la promotion (cours + étudiants et cellules, en plus de la promotion).
+# Moyennes : par ligne, pondérée par les coefficients des cours notés (comme les relevés, user/aggregates.py) ;
+# par colonne, moyenne simple des notes du cours.
+
+import csv
+from decimal import Decimal
+
+from django.db.models import Max, Q
+
+from .aggregates import _weighted_average
+from .exports import Echo
+from .models import Profile
+from .visibility import visible_cours
+
+# Nombre d'étudiants lus à chaque aller-retour avec la base pour l'export CSV
+GRADEBOOK_CHUNK_SIZE = 500
+
+CENT = Decimal('0.01')
+
+
+def gradebook_courses(promotion, principal):
+    """Colonnes du tableau : (id, nom, coefficient) des cours de la promotion ou de sa spécialité, visibles de l'appelant."""
+    courses = visible_cours(principal).filter(Q(promotion_id=promotion.pk) | Q(speciality_id=promotion.speciality_id))
+    return list(courses.order_by('nom').values_list('id', 'nom', 'coefficient'))
+
+
+def _cell_alias(cours_id):
+    return f'cours_{cours_id}'
+
+
+def iter_gradebook_rows(promotion, courses, chunk_size=None):
+    """
+    Lignes du tableau, triées par nom d'utilisateur : (étudiant, notes, moyenne pondérée). `étudiant` est
+    un dictionnaire id / username / first_name / last_name ; `notes` suit l'ordre de `courses` (None : pas de note).
+    """
+    students = Profile.objects.filter(role=Profile.Roles.ETUDIANT, promotion_id=promotion.pk).values(
+        'id', 'user__username', 'user__first_name', 'user__last_name',
+    ).annotate(**{
+        _cell_alias(cours_id): Max('notes_recues__valeur', filter=Q(notes_recues__cours_id=cours_id))
+        for cours_id, _, _ in courses
+    }).order_by('user__username')
+    rows = students.iterator(chunk_size=chunk_size) if chunk_size else students
+    for row in rows:
+        # Échelle fixe (2 décimales, comme Note.valeur) : SQLite rend l'agrégat sans ses zéros
+        grades = [row[_cell_alias(cours_id)] for cours_id, _, _ in courses]
+        grades = [None if valeur is None else valeur.quantize(CENT) for valeur in grades]
+        weighted_sum = coefficient_total = Decimal(0)
+        for valeur, (_, _, coefficient) in zip(grades, courses):
+            if valeur is not None:
+                weighted_sum += valeur * coefficient
+                coefficient_total += coefficient
+        student = {
+            'id': row['id'],
+            'username': row['user__username'],
+            'first_name': row['user__first_name'],
+            'last_name': row['user__last_name'],
+        }
+        yield student, grades, _weighted_average(weighted_sum, coefficient_total)
+
+
+class ColumnAverages:
+    """Moyennes par colonne, accumulées ligne par ligne (l'export CSV ne garde pas le tableau en mémoire)."""
+    def __init__(self, size):
+        self.totals = [Decimal(0)] * size
+        self.counts = [0] * size
+
+    def add(self, grades):
+        for index, valeur in enumerate(grades):
+            if valeur is not None:
+                self.totals[index] += valeur
+                self.counts[index] += 1
+
+    def averages(self):
+        return [_weighted_average(total, Decimal(count)) for total, count in zip(self.totals, self.counts)]
+
+
+def _str_or_none(value):
+    # Les décimaux sont rendus en chaînes, comme les DecimalField des sérialiseurs
+    return None if value is None else str(value)
+
+
+def build_gradebook(promotion, principal):
+    """Tableau complet, pour la réponse JSON."""
+    courses = gradebook_courses(promotion, principal)
+    columns = ColumnAverages(len(courses))
+    students = []
+    for student, grades, average in iter_gradebook_rows(promotion, courses):
+        columns.add(grades)
+        students.append({**student, 'grades': [_str_or_none(valeur) for valeur in grades], 'average': _str_or_none(average)})
+    return {
+        'promotion': {
+            'id': promotion.pk,
+            'name': promotion.name,
+            'year': promotion.year,
+            'speciality_name': promotion.speciality.name,
+        },
+        'courses': [
+            {'id': cours_id, 'nom': nom, 'coefficient': str(coefficient), 'average': _str_or_none(average), 'count': count}
+            for (cours_id, nom, coefficient), average, count in zip(courses, columns.averages(), columns.counts)
+        ],
+        'students': students,
+    }
+
+
+def iter_gradebook_csv(promotion, principal, chunk_size=GRADEBOOK_CHUNK_SIZE):
+    """
+    Générateur des lignes CSV du tableau : en-tête, une ligne par étudiant, puis la ligne des moyennes
+    par cours. Les étudiants sont lus par paquets (curseur côté serveur).
+    """
+    writer = csv.writer(Echo())
+    courses = gradebook_courses(promotion, principal)
+    yield writer.writerow(['Nom Etudiant', 'Prenom', 'Nom', *(nom for _, nom, _ in courses), 'Moyenne'])
+
+    columns = ColumnAverages(len(courses))
+    for student, grades, average in iter_gradebook_rows(promotion, courses, chunk_size=chunk_size):
+        columns.add(grades)
+        yield writer.writerow([
+            student['username'], student['first_name'], student['last_name'],
+            *(_str_or_none(valeur) or '' for valeur in grades), _str_or_none(average) or '',
+        ])
+    yield writer.writerow(['Moyenne', '', '', *(_str_or_none(average) or '' for average in columns.averages()), ''])
@@ -0,0 +1,156 @@
+# user/imports.py
+
+# Import groupé d'utilisateurs (étudiants, formateurs, administrateurs) depuis un CSV ou du JSON.
+# Toutes les lignes sont validées avant la moindre écriture : format de chaque ligne sans accès à
+# la base, puis unicité des noms d'utilisateur et des e-mails en une requête, et promotions en une
+# requête. Les mots de passe sont hachés en parallèle dans un pool de processus (user/password_pool.py :
+# PBKDF2 coûte plusieurs centaines de millisecondes par mot de passe), puis User et Profile sont insérés avec
+# bulk_create dans une seule transaction.
+
+import csv
+import io
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .models import Profile, Promotion
+from .password_pool import hash_passwords
+from .serializers import UserImportRowSerializer
+from .versioning import bump_table_version
+
+# Colonnes attendues dans le CSV (first_name, last_name et promotion_id sont optionnelles)
+CSV_REQUIRED_COLUMNS = ('username', 'email', 'password', 'role')
+
+
+class ImportFormatError(ValueError):
+    """Le fichier ou le corps de la requête n'a pas le format attendu."""
+
+
+def read_csv_rows(uploaded_file):
+    """Lit un fichier CSV (UTF-8, en-tête obligatoire) et retourne une liste de dictionnaires."""
+    try:
+        text = uploaded_file.read().decode('utf-8-sig') # utf-8-sig : tolère le BOM ajouté par Excel
+    except UnicodeDecodeError:
+        raise ImportFormatError("Le fichier doit être encodé en UTF-8.")
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [column for column in CSV_REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ImportFormatError(f"Colonnes manquantes dans le CSV : {', '.join(missing)}.")
+    # Les cellules vides des colonnes optionnelles valent "non renseigné"
+    return [{key: value for key, value in row.items() if key and value not in (None, '')} for row in reader]
+
+
+def get_request_rows(request):
+    """
+    Lignes à importer : fichier CSV envoyé en multipart (champ 'file'), ou corps JSON
+    ({"users": [...]} ou directement une liste d'objets).
+    """
+    if 'file' in request.FILES:
+        rows = read_csv_rows(request.FILES['file'])
+    else:
+        data = request.data
+        rows = data.get('users') if isinstance(data, dict) else data
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ImportFormatError("Envoyez un fichier CSV (champ 'file') ou une liste JSON d'utilisateurs ('users').")
+    if not rows:
+        raise ImportFormatError("Aucun utilisateur à importer.")
+    if len(rows) > settings.USER_IMPORT_MAX_ROWS:
+        raise ImportFormatError(f"Un import est limité à {settings.USER_IMPORT_MAX_ROWS} utilisateurs.")
+    return rows
+
+
+def validate_rows(rows):
+    """
+    Valide toutes les lignes. Retourne (lignes valides, erreurs) : les erreurs sont une liste de
+    {'index', 'username', 'errors'} triée par ligne. Trois requêtes au plus, quel que soit le nombre de lignes.
+    """
+    errors = {}
+    valid = []
+
+    def add_error(index, row, field, message):
+        errors.setdefault(index, {'index': index, 'username': row.get('username'), 'errors': {}})
+        errors[index]['errors'].setdefault(field, []).append(message)
+
+    # 1. Format de chaque ligne, sans accès à la base
+    for index, row in enumerate(rows):
+        serializer = UserImportRowSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors[index] = {'index': index, 'username': row.get('username'), 'errors': serializer.errors}
+
+    # 2. Doublons à l'intérieur du fichier
+    seen_usernames, seen_emails = {}, {}
+    for index, data in valid:
+        email = data['email'].lower()
+        if data['username'] in seen_usernames:
+            add_error(index, data, 'username', f"Déjà présent à la ligne {seen_usernames[data['username']]}.")
+        if email in seen_emails:
+            add_error(index, data, 'email', f"Déjà présent à la ligne {seen_emails[email]}.")
+        seen_usernames.setdefault(data['username'], index)
+        seen_emails.setdefault(email, index)
+
+    # 3. Unicité en base des noms d'utilisateur et des e-mails : une seule requête
+    existing_usernames, existing_emails = set(), set()
+    if valid:
+        existing = User.objects.annotate(email_lower=Lower('email')).filter(
+            Q(username__in=seen_usernames) | Q(email_lower__in=seen_emails)
+        ).values_list('username', 'email_lower')
+        for username, email in existing:
+            existing_usernames.add(username)
+            existing_emails.add(email)
+
+    # 4. Promotions : une seule requête pour toutes les lignes
+    promotions = Promotion.objects.in_bulk({data['promotion_id'] for _, data in valid if data.get('promotion_id')})
+
+    for index, data in valid:
+        if data['username'] in existing_usernames:
+            add_error(index, data, 'username', "Un utilisateur avec ce nom existe déjà.")
+        if data['email'].lower() in existing_emails:
+            add_error(index, data, 'email', "Un utilisateur avec cet e-mail existe déjà.")
+        promotion_id = data.get('promotion_id')
+        if promotion_id and promotion_id not in promotions:
+            add_error(index, data, 'promotion_id', "Promotion introuvable.")
+        if promotion_id and data['role'] != Profile.Roles.ETUDIANT:
+            add_error(index, data, 'promotion_id', "Seuls les étudiants appartiennent à une promotion.")
+
+    valid_rows = [
+        {**data, 'promotion': promotions.get(data.get('promotion_id'))}
+        for index, data in valid if index not in errors
+    ]
+    return valid_rows, [errors[index] for index in sorted(errors)]
+
+
+def create_users(rows):
+    """
+    Crée les User et Profile des lignes validées par validate_rows, dans une seule transaction.
+    Retourne la liste des profils créés (avec leur utilisateur).
+    """
+    password_hashes = hash_passwords(row['password'] for row in rows)
+    users = [
+        User(
+            username=row['username'],
+            email=User.objects.normalize_email(row['email']),
+            first_name=row.get('first_name', ''),
+            last_name=row.get('last_name', ''),
+            password=password_hash,
+        )
+        for row, password_hash in zip(rows, password_hashes)
+    ]
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=500)
+        profiles = Profile.objects.bulk_create([
+            Profile(
+                user=user, role=row['role'],
+                # Comme RegisterSerializer : seule une inscription d'étudiant porte une promotion
+                promotion=row['promotion'] if row['role'] == Profile.Roles.ETUDIANT else None,
+            )
+            for user, row in zip(users, rows)
+        ], batch_size=500)
+        # bulk_create n'émet pas de signaux : les ETag qui dépendent de ces tables doivent changer
+        bump_table_version(User)
+        bump_table_version(Profile)
+    return profiles
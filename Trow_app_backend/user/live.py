@@ -0,0 +1,117 @@
+# user/live.py
+
+# Notifications de notes en direct (Server-Sent Events, GET /api/v1/grades/stream/, vue dans
+# user/async_views.py). Le jour des résultats, les étudiants rafraîchissent l'écran des notes en boucle :
+# avec le flux, un étudiant ouvre une seule connexion et reçoit un événement quand une de ses notes est
+# créée ou modifiée, puis relit ses notes (/api/v1/sync/) au lieu d'interroger /grades/ à intervalles fixes.
+#
+# Diffusion dans le processus (sans Redis) : chaque connexion est un abonnement (une file asyncio) du
+# GradeBroker du processus, indexé par profil. Les écritures publient après la validation de leur
+# transaction (transaction.on_commit) : depuis les récepteurs de signaux pour les enregistrements unitaires,
+# depuis user/services.py pour les écritures groupées (bulk_create n'émet pas de signaux).
+# Une connexion inactive ne coûte qu'une tâche asyncio et une file : ni thread, ni connexion à la base
+# (voir ApiASGIHandler dans config/asgi.py).
+#
+# Le client relit ses notes à l'ouverture du flux (événement "ready", aussi à chaque reconnexion) et à
+# chaque événement "resync" (événements perdus). Limite : seuls les abonnés du processus qui écrit la note
+# sont notifiés. Avec plusieurs processus ASGI, un client garde une synchronisation périodique (plus espacée).
+
+import json
+import threading
+from asyncio import Queue, QueueFull, get_running_loop
+from collections import defaultdict
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+CENT = Decimal('0.01')
+
+# Événement envoyé à la place des événements perdus (file pleine) : le client relit ses notes
+RESYNC = {'event': 'resync', 'data': {}}
+
+
+class Subscription:
+    """Abonnement d'une connexion : une file lue par la boucle d'événements qui l'a créée."""
+    def __init__(self, profile_id, queue_size):
+        self.profile_id = profile_id
+        self.loop = get_running_loop()
+        self.queue = Queue(maxsize=queue_size)
+
+    def offer(self, event):
+        # Toujours appelé dans la boucle de l'abonnement (call_soon_threadsafe)
+        try:
+            self.queue.put_nowait(event)
+        except QueueFull:
+            # Client trop lent : les événements en attente sont remplacés par une demande de relecture
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class GradeBroker:
+    """Abonnements aux notes des étudiants connectés au processus. Publication possible depuis n'importe quel thread."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, profile_id):
+        """Crée l'abonnement d'une connexion ; à appeler depuis la boucle d'événements qui le lira."""
+        subscription = Subscription(profile_id, settings.LIVE_GRADES_QUEUE_SIZE)
+        with self._lock:
+            self._subscriptions[profile_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.profile_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.profile_id]
+
+    def publish(self, events):
+        """Diffuse des paires (profile_id, événement) aux abonnements de ces profils."""
+        with self._lock:
+            targets = [
+                (subscription, event)
+                for profile_id, event in events
+                for subscription in self._subscriptions.get(profile_id, ())
+            ]
+        for subscription, event in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # Boucle fermée (processus en cours d'arrêt) : l'abonnement n'a plus de lecteur
+                self.unsubscribe(subscription)
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+
+broker = GradeBroker()
+
+
+def format_event(name, data, retry=None):
+    """Encode un événement au format text/event-stream."""
+    lines = [f'retry: {retry}'] if retry is not None else []
+    lines += [f'event: {name}', f"data: {json.dumps(data, separators=(',', ':'))}"]
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+def grade_event(note, created):
+    """Événement 'grade' d'une note : identifiants et valeur (les autres champs sont relus par le client)."""
+    return note.etudiant_id, {
+        'event': 'grade',
+        'data': {'id': note.pk, 'cours_id': note.cours_id, 'created': created,
+                 'valeur': str(Decimal(str(note.valeur)).quantize(CENT))}, # Comme le DecimalField du sérialiseur
+    }
+
+
+def publish_grades_on_commit(notes, created):
+    """Diffuse les notes créées (ou modifiées) après la validation de la transaction en cours."""
+    events = [grade_event(note, created) for note in notes]
+    if events:
+        transaction.on_commit(partial(broker.publish, events))
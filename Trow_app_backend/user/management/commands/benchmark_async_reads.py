@@ -0,0 +1,131 @@
+# user/management/commands/benchmark_async_reads.py
+
+# Compare le débit des lectures de notes et de cours sous charge concurrente, entre l'application WSGI
+# (config/wsgi.py, vues DRF synchrones) et l'application ASGI (config/asgi.py, vues de user/async_views.py).
+# Les deux applications sont appelées dans le processus, sans serveur ni réseau : côté WSGI, un pool de
+# `--concurrency` threads (comme un serveur WSGI à threads) ; côté ASGI, `--concurrency` requêtes en cours
+# à la fois sur une seule boucle d'événements. La base doit être partagée entre threads (PostgreSQL, ou
+# SQLite sur fichier avec DB_ENGINE=sqlite), et contenir des données (voir `python manage.py seed_scale`).
+# Usage : python manage.py benchmark_async_reads [--requests 500] [--concurrency 50] [--username etudiant1]
+#         [--url /api/v1/grades/ --url /api/v1/courses/]
+
+import asyncio
+import io
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from user.models import Profile
+
+DEFAULT_URLS = ('/api/v1/grades/', '/api/v1/courses/')
+
+
+class Command(BaseCommand):
+    help = "Compare le débit des lectures de notes et de cours entre les applications WSGI et ASGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Nombre de requêtes par mesure.")
+        parser.add_argument('--concurrency', type=int, default=50, help="Requêtes simultanées.")
+        parser.add_argument('--username', help="Utilisateur authentifié (par défaut : le premier étudiant).")
+        parser.add_argument('--url', action='append', dest='urls', help="URL à mesurer (répétable).")
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.select_related('user')
+        if options['username']:
+            profile = profiles.filter(user__username=options['username']).first()
+        else:
+            profile = profiles.filter(role=Profile.Roles.ETUDIANT).order_by('pk').first()
+        if profile is None:
+            raise CommandError("Aucun utilisateur trouvé pour exécuter les requêtes.")
+
+        # Les liens de pagination sont absolus : l'hôte doit être autorisé
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+        headers = {
+            'host': host,
+            'authorization': f'Bearer {AccessToken.for_user(profile.user)}',
+            'accept': 'application/json',
+        }
+        total, concurrency = max(options['requests'], 2), max(options['concurrency'], 1)
+
+        from config.asgi import application as asgi_application
+        from config.wsgi import application as wsgi_application
+
+        for url in options['urls'] or DEFAULT_URLS:
+            for label, run in (
+                ('WSGI', lambda: self.run_wsgi(wsgi_application, url, headers, total, concurrency)),
+                ('ASGI', lambda: asyncio.run(self.run_asgi(asgi_application, url, headers, total, concurrency))),
+            ):
+                started = time.perf_counter()
+                results = run()
+                elapsed = time.perf_counter() - started
+                timings = [timing for timing, _ in results]
+                statuses = Counter(status for _, status in results)
+                if set(statuses) != {200}:
+                    raise CommandError(f"{label} {url} : réponses {dict(statuses)}.")
+                self.stdout.write(
+                    f"{url:<24} {label}  {total / elapsed:8.1f} req/s"
+                    f"  p50 {statistics.median(timings):8.2f} ms"
+                    f"  p95 {statistics.quantiles(timings, n=20)[-1]:8.2f} ms"
+                )
+
+    @staticmethod
+    def run_wsgi(application, url, headers, total, concurrency):
+        parts = urlsplit(url)
+
+        def call(_):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': parts.path, 'QUERY_STRING': parts.query,
+                'SCRIPT_NAME': '', 'SERVER_NAME': headers['host'], 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+                'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+                **{'HTTP_' + name.upper(): value for name, value in headers.items()},
+            }
+            status = []
+            started = time.perf_counter()
+            body = application(environ, lambda line, response_headers, exc_info=None: status.append(line))
+            try:
+                for _ in body:
+                    pass
+            finally:
+                body.close() # Émet request_finished : la connexion à la base est rendue comme par un vrai serveur
+            return (time.perf_counter() - started) * 1000, int(status[0].split()[0])
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(call, range(total)))
+
+    @staticmethod
+    async def run_asgi(application, url, headers, total, concurrency):
+        parts = urlsplit(url)
+        semaphore = asyncio.Semaphore(concurrency)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': parts.path, 'raw_path': parts.path.encode(), 'query_string': parts.query.encode(), 'root_path': '',
+            'headers': [(name.encode(), value.encode()) for name, value in headers.items()],
+            'server': (headers['host'], 80), 'client': ('127.0.0.1', 0),
+        }
+
+        async def call(_):
+            async with semaphore:
+                received, status = [], []
+
+                async def receive():
+                    if not received:
+                        received.append(True)
+                        return {'type': 'http.request', 'body': b'', 'more_body': False}
+                    await asyncio.Event().wait() # Le client reste connecté jusqu'à la fin de la réponse
+
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        status.append(message['status'])
+
+                started = time.perf_counter()
+                await application(dict(scope), receive, send)
+                return (time.perf_counter() - started) * 1000, status[0]
+
+        return await asyncio.gather(*(call(index) for index in range(total)))
@@ -0,0 +1,212 @@
+# user/management/commands/benchmark_live_grades.py
+
+# Test de charge local du flux SSE des notes (user/live.py) face à l'interrogation périodique de /grades/.
+# - Interrogation : `--clients` étudiants rechargent leurs notes toutes les `--poll-interval` secondes pendant
+#   `--duration` secondes, soit clients × durée / intervalle requêtes GET /api/v1/grades/ ; elles sont toutes
+#   exécutées (sans attendre entre elles) pour mesurer le travail du serveur.
+# - Flux : les mêmes étudiants ouvrent une connexion SSE chacun (une requête), restent connectés, et
+#   `--updates` notes sont enregistrées : on mesure la mémoire des connexions inactives, les requêtes SQL
+#   de l'ouverture des connexions (celles des écritures sont les mêmes dans les deux cas) et le délai entre
+#   l'enregistrement d'une note et la réception de l'événement.
+# Comme benchmark_async_reads, l'application ASGI (config/asgi.py) est appelée dans le processus, sans
+# serveur ni réseau, sur une seule boucle d'événements. La base doit contenir des données (seed_scale).
+# Usage : python manage.py benchmark_live_grades [--clients 1000] [--duration 60] [--poll-interval 10] [--updates 200]
+
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.backends.signals import connection_created
+from rest_framework_simplejwt.tokens import AccessToken
+
+from user.live import broker
+from user.models import Note, Profile
+
+
+class Command(BaseCommand):
+    help = "Compare l'interrogation périodique des notes et le flux SSE des notes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000, help="Étudiants connectés.")
+        parser.add_argument('--duration', type=float, default=60, help="Durée simulée de la période de résultats (secondes).")
+        parser.add_argument('--poll-interval', type=float, default=10, help="Intervalle d'interrogation des clients (secondes).")
+        parser.add_argument('--updates', type=int, default=200, help="Notes enregistrées pendant la mesure du flux.")
+        parser.add_argument('--concurrency', type=int, default=50, help="Requêtes d'interrogation simultanées.")
+
+    def handle(self, *args, **options):
+        clients = max(options['clients'], 1)
+        students = list(
+            Profile.objects.filter(role=Profile.Roles.ETUDIANT, notes_recues__isnull=False)
+            .select_related('user').distinct().order_by('pk')[:clients]
+        )
+        if not students:
+            raise CommandError("Aucun étudiant noté en base (voir `python manage.py seed_scale`).")
+        # Moins d'étudiants que de clients : plusieurs connexions par étudiant (plusieurs appareils)
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+        tokens = {student.pk: str(AccessToken.for_user(student.user)) for student in students}
+        connections = [students[index % len(students)] for index in range(clients)]
+
+        from config.asgi import application
+
+        polls = max(int(clients * options['duration'] / options['poll_interval']), 1)
+        elapsed, queries = asyncio.run(self.run_polling(application, host, tokens, connections, polls, options['concurrency']))
+        self.stdout.write(
+            f"Interrogation  {polls:>7} requêtes  {queries:>8} requêtes SQL"
+            f"  {elapsed:8.2f} s de traitement ({polls / elapsed:8.1f} req/s)"
+        )
+
+        result = asyncio.run(self.run_stream(application, host, tokens, connections, options['updates']))
+        self.stdout.write(
+            f"Flux SSE       {clients:>7} requêtes  {result['queries']:>8} requêtes SQL"
+            f"  {result['events']} événements reçus pour {result['updates']} notes"
+        )
+        self.stdout.write(
+            f"  ouverture {result['open_seconds']:.2f} s ({clients / result['open_seconds']:.0f} connexions/s)"
+            f"  mémoire {result['memory'] / clients / 1024:.1f} Kio par connexion inactive"
+        )
+        if result['latencies']:
+            self.stdout.write(
+                f"  délai écriture -> événement p50 {statistics.median(result['latencies']):.2f} ms"
+                f"  max {max(result['latencies']):.2f} ms"
+            )
+        self.stdout.write(
+            f"Requêtes HTTP évitées : {polls - clients} ({1 - clients / polls:.1%})." if polls > clients
+            else "Aucune requête évitée : intervalle d'interrogation plus long que la durée."
+        )
+
+    @staticmethod
+    def scope(path, host, token):
+        return {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', host.encode()), (b'authorization', f'Bearer {token}'.encode()), (b'accept', b'application/json')],
+            'server': (host, 80), 'client': ('127.0.0.1', 0),
+        }
+
+    async def count_queries(self, coroutine):
+        # Chaque requête ASGI exécute ses appels synchrones (l'ORM asynchrone compris) dans son propre thread
+        # (le flux SSE : dans le thread partagé d'asgiref, dont la connexion est refermée après chaque ouverture),
+        # donc sur sa propre connexion : le compteur est installé sur chaque connexion ouverte pendant la mesure
+        count, active = [0], [True]
+
+        def counter(execute, sql, params, many, context):
+            count[0] += active[0]
+            return execute(sql, params, many, context)
+
+        def install(sender, connection, **kwargs):
+            connection.execute_wrappers.append(counter)
+
+        connection_created.connect(install)
+        try:
+            return await coroutine, count[0]
+        finally:
+            active[0] = False
+            connection_created.disconnect(install)
+
+    async def run_polling(self, application, host, tokens, connections, polls, concurrency):
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+        async def poll(index):
+            async with semaphore:
+                student = connections[index % len(connections)]
+                sent = []
+
+                async def receive():
+                    if not sent:
+                        sent.append(True)
+                        return {'type': 'http.request', 'body': b'', 'more_body': False}
+                    await asyncio.Event().wait() # Le client reste connecté jusqu'à la fin de la réponse
+
+                async def send(message):
+                    if message['type'] == 'http.response.start' and message['status'] != 200:
+                        raise CommandError(f"/api/v1/grades/ : réponse {message['status']}.")
+
+                await application(self.scope('/api/v1/grades/', host, tokens[student.pk]), receive, send)
+
+        async def run():
+            started = time.perf_counter()
+            await asyncio.gather(*(poll(index) for index in range(polls)))
+            return time.perf_counter() - started
+
+        return await self.count_queries(run())
+
+    async def run_stream(self, application, host, tokens, connections, updates):
+        disconnect = asyncio.Event()
+        ready = asyncio.Semaphore(0)
+        received = asyncio.Event()
+        published, latencies = {}, []
+        expected = {'events': 0}
+
+        async def stream(student):
+            sent = []
+
+            async def receive():
+                if not sent:
+                    sent.append(True)
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start' and message['status'] != 200:
+                    raise CommandError(f"/api/v1/grades/stream/ : réponse {message['status']}.")
+                body = message.get('body', b'')
+                if b'event: ready' in body:
+                    ready.release()
+                elif b'event: grade' in body:
+                    note_id = int(body.split(b'"id":', 1)[1].split(b',', 1)[0])
+                    latencies.append((time.perf_counter() - published[note_id]) * 1000)
+                    if len(latencies) >= expected['events']:
+                        received.set()
+
+            await application(self.scope('/api/v1/grades/stream/', host, tokens[student.pk]), receive, send)
+
+        async def open_all():
+            tasks = [asyncio.create_task(stream(student)) for student in connections]
+            for _ in connections:
+                await ready.acquire()
+            return tasks
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        tasks, queries = await self.count_queries(open_all())
+        open_seconds = time.perf_counter() - started
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        # Notes des étudiants connectés, réenregistrées telles quelles (les signaux publient l'événement)
+        per_student = {}
+        for student in connections:
+            per_student[student.pk] = per_student.get(student.pk, 0) + 1
+        notes = await sync_to_async(lambda: list(Note.objects.filter(etudiant_id__in=per_student).order_by('pk')[:updates]))()
+        expected['events'] = sum(per_student[note.etudiant_id] for note in notes)
+
+        def save(note):
+            published[note.pk] = time.perf_counter()
+            note.save()
+
+        await self.save_all(notes, save)
+        if notes:
+            try:
+                await asyncio.wait_for(received.wait(), 30)
+            except asyncio.TimeoutError:
+                pass
+
+        disconnect.set()
+        await asyncio.gather(*tasks)
+        if broker.connection_count():
+            raise CommandError(f"{broker.connection_count()} abonnement(s) non libéré(s) après la déconnexion.")
+        return {
+            'queries': queries, 'events': len(latencies), 'updates': len(notes),
+            'open_seconds': open_seconds, 'memory': memory, 'latencies': latencies,
+        }
+
+    @staticmethod
+    async def save_all(notes, save):
+        for note in notes:
+            await sync_to_async(save)(note)
+            await asyncio.sleep(0) # Laisse la boucle livrer les événements entre deux écritures
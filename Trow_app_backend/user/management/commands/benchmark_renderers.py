@@ -0,0 +1,56 @@
+# user/management/commands/benchmark_renderers.py
+
+# Compare le rendu JSON par défaut (JSONRenderer) et le JSON en colonnes (user/renderers.py) sur une liste
+# de notes sérialisées : taille de la réponse (brute et compressée gzip, comme derrière un proxy qui compresse)
+# et temps de rendu. Les notes sont lues et sérialisées une seule fois : seul le rendu est mesuré.
+# Usage : python manage.py benchmark_renderers [--rows 200 --rows 5000] [--iterations 20]
+
+import gzip
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from user.models import Note
+from user.renderers import ColumnarJSONRenderer
+from user.serializers import NoteSerializer
+
+DEFAULT_ROWS = (200, 5000) # Une page au maximum (max_page_size), et une liste complète d'un formateur
+
+
+class Command(BaseCommand):
+    help = "Compare la taille et le temps de rendu des notes en JSON et en JSON en colonnes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, action='append', help="Nombre de notes rendues (répétable).")
+        parser.add_argument('--iterations', type=int, default=20, help="Nombre de rendus par mesure.")
+
+    def handle(self, *args, **options):
+        sizes = options['rows'] or DEFAULT_ROWS
+        notes = list(
+            Note.objects.select_related('etudiant__user', 'cours', 'publie_par__user').order_by('-date_publication', '-id')[:max(sizes)]
+        )
+        if not notes:
+            raise CommandError("Aucune note en base (voir `python manage.py seed_scale`).")
+        records = NoteSerializer(notes, many=True).data
+        iterations = max(options['iterations'], 1)
+
+        for size in sizes:
+            # Même forme qu'une page de l'API (KeysetPagination)
+            data = {'next': None, 'previous': None, 'results': records[:size]}
+            baseline = None
+            for label, renderer in (('JSON', JSONRenderer()), ('colonnes', ColumnarJSONRenderer())):
+                timings = []
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    content = renderer.render(data, renderer.media_type, {})
+                    timings.append((time.perf_counter() - started) * 1000)
+                compressed = len(gzip.compress(content))
+                baseline = baseline or (len(content), compressed)
+                self.stdout.write(
+                    f"{len(data['results']):>6} notes  {label:<9}"
+                    f"  {len(content):>9} octets ({len(content) / baseline[0]:6.1%})"
+                    f"  gzip {compressed:>8} octets ({compressed / baseline[1]:6.1%})"
+                    f"  rendu p50 {statistics.median(timings):8.2f} ms"
+                )
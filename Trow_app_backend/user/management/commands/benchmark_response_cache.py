@@ -0,0 +1,73 @@
+# user/management/commands/benchmark_response_cache.py
+
+# Mesure la latence des listes de spécialités et de promotions sans puis avec le cache des réponses
+# (user/response_cache.py). Les requêtes passent par les ViewSets (authentification, permissions,
+# pagination, rendu JSON) mais pas par le réseau.
+# Usage : python manage.py benchmark_response_cache [--iterations 500] [--username admin]
+
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from user.models import Profile
+from user.response_cache import get_cache_stats, reset_cache_stats
+from user.views import PromotionViewSet, SpecialityViewSet
+
+ENDPOINTS = (
+    ('specialities', SpecialityViewSet, '/api/v1/specialities/'),
+    ('promotions', PromotionViewSet, '/api/v1/promotions/'),
+)
+
+
+class Command(BaseCommand):
+    help = "Compare la latence des listes de référence sans et avec le cache des réponses."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500, help="Nombre de requêtes par mesure.")
+        parser.add_argument('--username', help="Utilisateur authentifié (par défaut : le premier administrateur).")
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.select_related('user')
+        if options['username']:
+            profile = profiles.filter(user__username=options['username']).first()
+        else:
+            profile = profiles.filter(role=Profile.Roles.ADMIN).first()
+        if profile is None:
+            raise CommandError("Aucun utilisateur trouvé pour exécuter les requêtes.")
+
+        # Les liens de pagination sont absolus : l'hôte doit être autorisé
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+        factory = APIRequestFactory(HTTP_HOST=host)
+        reset_cache_stats()
+        for name, viewset, url in ENDPOINTS:
+            for label, enabled in (('sans cache', False), ('avec cache', True)):
+                view = viewset.as_view({'get': 'list'}, response_cache_enabled=enabled)
+                timings = self.measure(factory, view, url, profile.user, options['iterations'])
+                self.stdout.write(
+                    f"{name:<13} {label:<11} moyenne {statistics.fmean(timings):7.3f} ms"
+                    f"  p50 {statistics.median(timings):7.3f} ms"
+                    f"  p95 {statistics.quantiles(timings, n=20)[-1]:7.3f} ms"
+                )
+
+        stats = get_cache_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Cache : {stats['hits']} succès, {stats['misses']} échecs (taux {stats['hit_ratio']})"
+        ))
+
+    @staticmethod
+    def measure(factory, view, url, user, iterations):
+        timings = []
+        for _ in range(max(iterations, 2)):
+            request = factory.get(url, HTTP_ACCEPT='application/json')
+            force_authenticate(request, user=user)
+            start = time.perf_counter()
+            response = view(request)
+            if hasattr(response, 'render'): # Les succès du cache sont déjà des octets
+                response.render()
+            timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f"{url} a répondu {response.status_code}.")
+        return timings
@@ -0,0 +1,21 @@
+# user/management/commands/purge_export_jobs.py
+
+# Supprime les exports de notes (user/export_jobs.py) terminés depuis plus de EXPORT_RETENTION_DAYS,
+# avec leurs fichiers dans le stockage des médias. Une nouvelle demande identique écrit un nouvel export.
+# À planifier une fois par jour (cron).
+# Usage : python manage.py purge_export_jobs [--days 7]
+
+from django.core.management.base import BaseCommand
+
+from user.export_jobs import purge_export_jobs
+
+
+class Command(BaseCommand):
+    help = "Supprime les exports de notes terminés plus anciens que la durée de conservation."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Durée de conservation (par défaut : EXPORT_RETENTION_DAYS).")
+
+    def handle(self, *args, **options):
+        deleted = purge_export_jobs(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} export(s) supprimé(s)."))
@@ -0,0 +1,21 @@
+# user/management/commands/purge_tombstones.py
+
+# Supprime les traces de suppression (user/sync.py) plus anciennes que SYNC_TOMBSTONE_RETENTION_DAYS.
+# Les jetons de synchronisation plus anciens repartent de zéro : les traces ne leur servent plus.
+# À planifier une fois par jour (cron).
+# Usage : python manage.py purge_tombstones [--days 90]
+
+from django.core.management.base import BaseCommand
+
+from user.sync import purge_tombstones
+
+
+class Command(BaseCommand):
+    help = "Supprime les traces de suppression plus anciennes que la durée de conservation."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Durée de conservation (par défaut : SYNC_TOMBSTONE_RETENTION_DAYS).")
+
+    def handle(self, *args, **options):
+        deleted = purge_tombstones(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} trace(s) supprimée(s)."))
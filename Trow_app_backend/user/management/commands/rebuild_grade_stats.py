@@ -0,0 +1,55 @@
+# user/management/commands/rebuild_grade_stats.py
+
+# Reconstruit la table CourseGradeStats à partir des notes, ou vérifie simplement
+# qu'elle n'a pas dérivé (option --check).
+# Usage : python manage.py rebuild_grade_stats [--check]
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from user.aggregates import compute_course_stats
+from user.models import CourseGradeStats
+
+# Champs comparés pour détecter une dérive
+COMPARED_FIELDS = ('count', 'total', 'total_squares', 'min_valeur', 'max_valeur', 'histogram')
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les statistiques des notes par cours (CourseGradeStats) et détecte les dérives."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Vérifie la table sans la modifier ; échoue si une dérive est détectée."
+        )
+
+    def handle(self, *args, **options):
+        expected = compute_course_stats()
+        current = {stats.cours_id: stats for stats in CourseGradeStats.objects.all()}
+
+        drifted = []
+        for cours_id in sorted(set(expected) | set(current)):
+            fresh, stored = expected.get(cours_id), current.get(cours_id)
+            if fresh is None or stored is None:
+                # Une ligne vide (toutes les notes supprimées) équivaut à une ligne absente
+                row = fresh or stored
+                if row.count:
+                    drifted.append(cours_id)
+            elif any(getattr(fresh, field) != getattr(stored, field) for field in COMPARED_FIELDS):
+                drifted.append(cours_id)
+
+        for cours_id in drifted:
+            self.stdout.write(self.style.WARNING(f"Dérive détectée pour le cours {cours_id}"))
+
+        if options['check']:
+            if drifted:
+                raise CommandError(f"{len(drifted)} cours ont des statistiques incorrectes.")
+            self.stdout.write(self.style.SUCCESS(f"Aucune dérive sur {len(expected)} cours."))
+            return
+
+        with transaction.atomic():
+            CourseGradeStats.objects.all().delete()
+            CourseGradeStats.objects.bulk_create(expected.values(), batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(
+            f"Statistiques reconstruites pour {len(expected)} cours ({len(drifted)} corrigés)."
+        ))
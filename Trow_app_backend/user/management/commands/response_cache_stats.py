@@ -0,0 +1,26 @@
+# user/management/commands/response_cache_stats.py
+
+# Affiche les compteurs du cache des réponses (user/response_cache.py).
+# Avec le backend 'locmem', chaque processus a ses propres compteurs : seul le backend 'file'
+# (ou un cache partagé) donne des chiffres pour l'ensemble des workers.
+# Usage : python manage.py response_cache_stats [--reset]
+
+from django.core.management.base import BaseCommand
+
+from user.response_cache import get_cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Affiche (et remet éventuellement à zéro) les compteurs du cache des réponses."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Remet les compteurs à zéro après affichage.")
+
+    def handle(self, *args, **options):
+        stats = get_cache_stats()
+        self.stdout.write(f"Succès : {stats['hits']}")
+        self.stdout.write(f"Échecs : {stats['misses']}")
+        self.stdout.write(f"Taux de succès : {stats['hit_ratio'] if stats['hit_ratio'] is not None else '-'}")
+        if options['reset']:
+            reset_cache_stats()
+            self.stdout.write(self.style.SUCCESS("Compteurs remis à zéro."))
@@ -0,0 +1,36 @@
+# user/management/commands/run_export_worker.py
+
+# Worker des exports de notes en arrière-plan (voir user/export_jobs.py), pour EXPORT_WORKER = 'command' :
+# lit la file des exports en attente dans la base et écrit leurs fichiers, un export à la fois.
+# Plusieurs workers peuvent tourner en parallèle (chaque export est réservé par une mise à jour conditionnelle).
+# Les exports restés "en cours" au-delà de EXPORT_JOB_TIMEOUT (worker arrêté) sont remis en attente.
+# Usage : python manage.py run_export_worker [--once] [--interval 5]
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from user.export_jobs import requeue_stale_jobs, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Exécute les exports de notes en attente."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Traite les exports en attente puis s'arrête.")
+        parser.add_argument('--interval', type=float, default=5, help="Délai entre deux lectures de la file (secondes).")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections() # Comme entre deux requêtes HTTP : une connexion perdue est rouverte
+            requeued = requeue_stale_jobs()
+            if requeued:
+                self.stdout.write(f"{requeued} export(s) interrompu(s) remis en attente.")
+            done = run_pending_jobs()
+            if done:
+                self.stdout.write(self.style.SUCCESS(f"{done} export(s) terminé(s)."))
+            if options['once']:
+                return
+            if not done:
+                time.sleep(options['interval'])
@@ -0,0 +1,73 @@
+# user/management/commands/seed_scale.py
+
+# Remplit la base avec un jeu de données synthétique aux proportions réalistes (voir user/seeding.py).
+# Exemple (~1 million de notes) :
+#   python manage.py seed_scale --years 5 --promotions-per-year 20 --students-per-promotion 250 \
+#       --courses-per-promotion 40 --grade-density 1
+# Usage : python manage.py seed_scale [--seed 42] [--prefix seed] [--no-aggregates] [...]
+
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from user.seeding import SeedConfig, seed_dataset
+
+
+class Command(BaseCommand):
+    help = "Génère des spécialités, promotions, profils, cours et notes en masse, de façon déterministe."
+
+    def add_arguments(self, parser):
+        defaults = SeedConfig()
+        parser.add_argument('--specialities', type=int, default=defaults.specialities, help="Nombre de spécialités.")
+        parser.add_argument('--years', type=int, default=defaults.years, help="Nombre d'années de promotions.")
+        parser.add_argument('--first-year', type=int, default=defaults.first_year, help="Année de la première promotion.")
+        parser.add_argument('--promotions-per-year', type=int, default=defaults.promotions_per_year, help="Promotions par année.")
+        parser.add_argument('--students-per-promotion', type=int, default=defaults.students_per_promotion, help="Étudiants par promotion.")
+        parser.add_argument('--courses-per-promotion', type=int, default=defaults.courses_per_promotion, help="Cours par promotion.")
+        parser.add_argument('--trainers', type=int, default=defaults.trainers, help="Nombre de formateurs.")
+        parser.add_argument('--admins', type=int, default=defaults.admins, help="Nombre d'administrateurs.")
+        parser.add_argument(
+            '--grade-density', type=float, default=defaults.grade_density,
+            help="Part (0 à 1) des cours de sa promotion pour lesquels un étudiant a une note."
+        )
+        parser.add_argument('--seed', type=int, default=defaults.seed, help="Graine du générateur (même graine, mêmes données).")
+        parser.add_argument('--prefix', default=defaults.prefix, help="Préfixe des noms générés.")
+        parser.add_argument('--password', default=defaults.password, help="Mot de passe commun à tous les comptes générés.")
+        parser.add_argument('--chunk-size', type=int, default=defaults.chunk_size, help="Taille des lots d'insertion.")
+        parser.add_argument(
+            '--no-aggregates', action='store_true',
+            help="Ne calcule ni les statistiques des cours ni les relevés (plus rapide)."
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options['grade_density'] <= 1:
+            raise CommandError("--grade-density doit être compris entre 0 et 1.")
+        if min(options['specialities'], options['chunk_size']) < 1:
+            raise CommandError("--specialities et --chunk-size doivent être strictement positifs.")
+        # Les noms générés sont uniques : un second passage avec le même préfixe échouerait au milieu
+        if User.objects.filter(username__startswith=f"{options['prefix']}_").exists():
+            raise CommandError(f"Des utilisateurs avec le préfixe '{options['prefix']}' existent déjà : utilisez --prefix.")
+
+        config = SeedConfig(
+            specialities=options['specialities'],
+            years=options['years'],
+            first_year=options['first_year'],
+            promotions_per_year=options['promotions_per_year'],
+            students_per_promotion=options['students_per_promotion'],
+            courses_per_promotion=options['courses_per_promotion'],
+            trainers=options['trainers'],
+            admins=options['admins'],
+            grade_density=options['grade_density'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            password=options['password'],
+            chunk_size=options['chunk_size'],
+            aggregates=not options['no_aggregates'],
+        )
+        started = time.perf_counter()
+        counts = seed_dataset(config, log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f"{counts['notes']} notes, {counts['profiles']} profils et {counts['courses']} cours "
+            f"générés en {time.perf_counter() - started:.1f} s."
+        ))
@@ -0,0 +1,87 @@
+# user/management/commands/slow_requests_report.py
+
+# Synthèse du journal des requêtes lentes (user/slow_requests.py), anciens fichiers compris :
+# - les points d'accès les plus lents (vue et action) : nombre de requêtes lentes, durées p50 / p95 / max,
+#   requêtes SQL et temps SQL moyens, rôles des appelants ;
+# - les requêtes SQL les plus coûteuses (forme générique, voir normalize_sql) : durée cumulée et maximale,
+#   nombre de requêtes lentes où elles apparaissent, et le plan de la dernière fois où elles étaient la plus lente.
+# Usage : python manage.py slow_requests_report [--file logs/slow_requests.log] [--top 10] [--since 24]
+
+import statistics
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from user.slow_requests import normalize_sql, read_entries
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = "Résume le journal des requêtes lentes : points d'accès et requêtes SQL les plus coûteux."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help="Journal à lire (par défaut : SLOW_REQUEST_LOG_FILE).")
+        parser.add_argument('--top', type=int, default=10, help="Nombre de lignes par tableau.")
+        parser.add_argument('--since', type=float, help="Seulement les requêtes des N dernières heures.")
+
+    def handle(self, *args, **options):
+        entries = read_entries(options['file'] or settings.SLOW_REQUEST_LOG_FILE)
+        if options['since'] is not None:
+            start = timezone.now() - timedelta(hours=options['since'])
+            entries = (entry for entry in entries if datetime.fromisoformat(entry['time']) >= start)
+
+        endpoints = defaultdict(list)
+        statements = defaultdict(lambda: {'total_ms': 0.0, 'max_ms': 0.0, 'requests': 0, 'plan': None})
+        count = 0
+        for entry in entries:
+            count += 1
+            action = f"{entry['view']}.{entry['action']}" if entry.get('action') else entry['view']
+            endpoints[(entry['method'], action)].append(entry)
+            seen = set()
+            for statement in entry['statements']:
+                stats = statements[normalize_sql(statement['sql'])]
+                stats['total_ms'] += statement['duration_ms']
+                stats['max_ms'] = max(stats['max_ms'], statement['duration_ms'])
+                if statement['sql'] not in seen:
+                    seen.add(statement['sql'])
+                    stats['requests'] += 1
+            slowest = entry.get('slowest')
+            if slowest and slowest.get('plan'):
+                statements[normalize_sql(slowest['sql'])]['plan'] = (slowest.get('explain'), slowest['plan'])
+        if not count:
+            raise CommandError("Aucune requête lente dans le journal.")
+
+        top = max(options['top'], 1)
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Points d'accès les plus lents ({count} requêtes lentes)"))
+        ranked = sorted(endpoints.items(), key=lambda item: sum(entry['duration_ms'] for entry in item[1]), reverse=True)
+        for (method, action), items in ranked[:top]:
+            durations = [entry['duration_ms'] for entry in items]
+            roles = Counter(entry.get('role') or '?' for entry in items)
+            self.stdout.write(
+                f"{method:<6} {action:<40} {len(items):>6} req."
+                f"  p50 {statistics.median(durations):9.1f} ms  p95 {_percentile(durations, 0.95):9.1f} ms"
+                f"  max {max(durations):9.1f} ms"
+                f"  SQL {statistics.mean(entry['sql_count'] for entry in items):6.1f} req. /"
+                f" {statistics.mean(entry['sql_ms'] for entry in items):8.1f} ms"
+                f"  rôles {', '.join(f'{role}={number}' for role, number in roles.most_common())}"
+            )
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Requêtes SQL les plus coûteuses"))
+        ranked = sorted(statements.items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        for sql, stats in ranked[:top]:
+            self.stdout.write(
+                f"{stats['total_ms']:10.1f} ms cumulés  max {stats['max_ms']:9.1f} ms  dans {stats['requests']} req."
+                f"  {sql[:200]}{'…' if len(sql) > 200 else ''}"
+            )
+            if stats['plan'] is not None:
+                prefix, plan = stats['plan']
+                self.stdout.write(f"    {prefix} :")
+                for line in plan:
+                    self.stdout.write(f"      {line}")
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_course_stats(apps, schema_editor):
+    # Construit les statistiques pour les notes existantes (même calcul que user.aggregates.compute_course_stats)
+    Note = apps.get_model('user', 'Note')
+    CourseGradeStats = apps.get_model('user', 'CourseGradeStats')
+    width, buckets = 2, 10
+
+    stats_by_cours = {}
+    for cours_id, valeur in Note.objects.order_by().values_list('cours_id', 'valeur').iterator(chunk_size=5000):
+        stats = stats_by_cours.get(cours_id)
+        if stats is None:
+            stats = stats_by_cours[cours_id] = CourseGradeStats(cours_id=cours_id, histogram=[0] * buckets)
+        stats.count += 1
+        stats.total += valeur
+        stats.total_squares += valeur * valeur
+        stats.histogram[max(0, min(int(valeur // width), buckets - 1))] += 1
+        stats.min_valeur = valeur if stats.min_valeur is None else min(stats.min_valeur, valeur)
+        stats.max_valeur = valeur if stats.max_valeur is None else max(stats.max_valeur, valeur)
+    CourseGradeStats.objects.bulk_create(stats_by_cours.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_promotion_speciality_alter_cours_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseGradeStats',
+            fields=[
+                ('cours', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='grade_stats', serialize=False, to='user.cours', verbose_name='Cours')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Nombre de notes')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Somme des notes')),
+                ('total_squares', models.DecimalField(decimal_places=4, default=0, max_digits=20, verbose_name='Somme des carrés des notes')),
+                ('min_valeur', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='Note minimale')),
+                ('max_valeur', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='Note maximale')),
+                ('histogram', models.JSONField(default=list, verbose_name='Répartition des notes')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour')),
+            ],
+            options={
+                'verbose_name': "Statistiques d'un cours",
+                'verbose_name_plural': 'Statistiques des cours',
+            },
+        ),
+        migrations.RunPython(build_course_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:15
+
+import django.core.validators
+import django.db.models.deletion
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+from django.db import migrations, models
+
+
+# Copie figée du calcul des relevés (user/aggregates.py au moment de cette migration) : la migration
+# doit produire le même résultat quelles que soient les versions ultérieures du code de l'application.
+def _weighted_average(weighted_sum, coefficient_total):
+    if not coefficient_total:
+        return None
+    return (weighted_sum / coefficient_total).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def build_transcripts(apps, schema_editor):
+    # Construit les relevés de notes des étudiants qui ont déjà des notes (coefficients à 1)
+    Note = apps.get_model('user', 'Note')
+    StudentTranscript = apps.get_model('user', 'StudentTranscript')
+    columns = (
+        'etudiant_id', 'cours_id', 'cours__nom', 'cours__coefficient',
+        'cours__speciality_id', 'cours__speciality__name', 'valeur', 'date_publication',
+    )
+    rows_by_etudiant = defaultdict(list)
+    for row in Note.objects.order_by('etudiant_id', 'cours__nom').values_list(*columns).iterator(chunk_size=5000):
+        rows_by_etudiant[row[0]].append(row)
+
+    transcripts = []
+    for etudiant_id, rows in rows_by_etudiant.items():
+        grades = []
+        weighted_sum = coefficient_total = Decimal(0)
+        by_speciality = {} # speciality_id -> [nom, somme pondérée, somme des coefficients]
+        for _, cours_id, cours_nom, coefficient, speciality_id, speciality_name, valeur, date_publication in rows:
+            grades.append({
+                'cours_id': cours_id,
+                'cours_nom': cours_nom,
+                'speciality_id': speciality_id,
+                'speciality_name': speciality_name,
+                'coefficient': str(coefficient),
+                'valeur': str(valeur),
+                'date_publication': date_publication.isoformat(),
+            })
+            weighted_sum += valeur * coefficient
+            coefficient_total += coefficient
+            speciality = by_speciality.setdefault(speciality_id, [speciality_name, Decimal(0), Decimal(0)])
+            speciality[1] += valeur * coefficient
+            speciality[2] += coefficient
+
+        transcripts.append(StudentTranscript(
+            etudiant_id=etudiant_id,
+            grades=grades,
+            overall_average=_weighted_average(weighted_sum, coefficient_total),
+            coefficient_total=coefficient_total,
+            speciality_averages=[
+                {
+                    'speciality_id': speciality_id,
+                    'speciality_name': name,
+                    'average': str(_weighted_average(total, coefficients)),
+                    'coefficient_total': str(coefficients),
+                }
+                for speciality_id, (name, total, coefficients) in by_speciality.items()
+            ],
+        ))
+    StudentTranscript.objects.bulk_create(transcripts, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_coursegradestats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentTranscript',
+            fields=[
+                ('etudiant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='transcript', serialize=False, to='user.profile', verbose_name='Étudiant')),
+                ('grades', models.JSONField(default=list, verbose_name='Notes par cours')),
+                ('overall_average', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True, verbose_name='Moyenne générale')),
+                ('coefficient_total', models.DecimalField(decimal_places=2, default=0, max_digits=8, verbose_name='Somme des coefficients')),
+                ('speciality_averages', models.JSONField(default=list, verbose_name='Moyennes par spécialité')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour')),
+            ],
+            options={
+                'verbose_name': 'Relevé de notes',
+                'verbose_name_plural': 'Relevés de notes',
+            },
+        ),
+        migrations.AddField(
+            model_name='cours',
+            name='coefficient',
+            field=models.DecimalField(decimal_places=2, default=1, help_text="Poids du cours dans la moyenne de l'étudiant", max_digits=4, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))], verbose_name='Coefficient'),
+        ),
+        migrations.RunPython(build_transcripts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0004_cours_coefficient_studenttranscript'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cours',
+            index=models.Index(fields=['promotion', 'speciality'], name='cours_promotion_speciality_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['-date_publication', '-id'], name='note_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['etudiant', '-date_publication'], name='note_etudiant_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['publie_par', '-date_publication'], name='note_publie_par_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['cours', '-date_publication'], name='note_cours_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['role'], name='profile_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('role', 'etudiant')), fields=['promotion'], name='profile_etudiant_promo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('role__in', ['formateur', 'admin'])), fields=['id'], name='profile_staff_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('table', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Table')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Version')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Dernière modification')),
+            ],
+            options={
+                'verbose_name': 'Version de table',
+                'verbose_name_plural': 'Versions des tables',
+            },
+        ),
+    ]
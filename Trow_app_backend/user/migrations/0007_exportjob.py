@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0006_tableversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.JSONField(verbose_name='Périmètre')),
+                ('fingerprint', models.CharField(max_length=40, verbose_name='Empreinte')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Terminé'), ('failed', 'Échec')], default='pending', max_length=10, verbose_name='Statut')),
+                ('file', models.FileField(blank=True, upload_to='exports/', verbose_name='Fichier')),
+                ('row_count', models.PositiveIntegerField(blank=True, null=True, verbose_name='Nombre de lignes')),
+                ('error', models.TextField(blank=True, verbose_name='Erreur')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de demande')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Début')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to='user.profile', verbose_name='Demandé par')),
+            ],
+            options={
+                'verbose_name': 'Export de notes',
+                'verbose_name_plural': 'Exports de notes',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['created_at'], name='exportjob_pending_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'failed'), _negated=True), fields=('fingerprint',), name='exportjob_unique_fingerprint')],
+            },
+        ),
+    ]
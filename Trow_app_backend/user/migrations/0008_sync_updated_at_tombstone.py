@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0007_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('note', 'Note'), ('cours', 'Cours')], max_length=5, verbose_name='Type')),
+                ('object_id', models.BigIntegerField(verbose_name='Identifiant')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de suppression')),
+                ('etudiant_id', models.BigIntegerField(blank=True, null=True)),
+                ('publie_par_id', models.BigIntegerField(blank=True, null=True)),
+                ('formateur_id', models.BigIntegerField(blank=True, null=True)),
+                ('speciality_id', models.BigIntegerField(blank=True, null=True)),
+                ('promotion_id', models.BigIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Trace de suppression',
+                'verbose_name_plural': 'Traces de suppression',
+            },
+        ),
+        migrations.AddField(
+            model_name='cours',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Dernière modification'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Dernière modification'),
+        ),
+        migrations.AddIndex(
+            model_name='cours',
+            index=models.Index(fields=['updated_at'], name='cours_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['updated_at'], name='note_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['etudiant', 'updated_at'], name='note_etudiant_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['kind', 'deleted_at'], name='tombstone_kind_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:40
+
+from django.db import migrations
+
+
+# profile_staff_idx indexait id (déjà la clé primaire) : il ne servait pas au filtre sur le rôle des formateurs
+# et administrateurs, déjà couvert par profile_role_idx.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0008_sync_updated_at_tombstone'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='profile',
+            name='profile_staff_idx',
+        ),
+    ]
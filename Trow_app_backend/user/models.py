@@ -1,6 +1,9 @@
 # user/models.py
 
+from decimal import Decimal
+
 from django.conf import settings
+from django.core.validators import MinValueValidator
 from django.db import models
 
 # Modèle pour la Spécialité (ex: "Développement Web", "Réseaux et Sécurité")
@@ -90,6 +93,13 @@ class Profile(models.Model):
 
     class Meta:
         verbose_name_plural = "Profils" # Nom affiché dans l'administration Django
+        indexes = [
+            # Filtres par rôle (limit_choices_to, querysets des sérialiseurs, filtres de l'administration),
+            # dont les formateurs et administrateurs proposés pour Note.publie_par
+            models.Index(fields=['role'], name='profile_role_idx'),
+            # Étudiants d'une promotion (index partiel : seules les lignes des étudiants)
+            models.Index(fields=['promotion'], condition=models.Q(role='etudiant'), name='profile_etudiant_promo_idx'),
+        ]
 
     def __str__(self):
         # Représentation plus informative de l'objet Profile pour le débogage et l'administration
@@ -144,16 +154,40 @@ class Cours(models.Model):
         related_name='cours',
         verbose_name="Promotion du Cours"
     )
+    # Coefficient du cours dans le calcul des moyennes des étudiants (1 par défaut)
+    coefficient = models.DecimalField(
+        max_digits=4,
+        decimal_places=2,
+        default=1,
+        validators=[MinValueValidator(Decimal('0.01'))],
+        verbose_name="Coefficient",
+        help_text="Poids du cours dans la moyenne de l'étudiant"
+    )
+    # Date de la dernière modification (flux de synchronisation /sync/, voir user/sync.py)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Dernière modification")
 
     class Meta:
         verbose_name_plural = "Cours"
         ordering = ['nom'] # Tri par défaut par nom de cours
+        indexes = [
+            # Cours d'une promotion et/ou d'une spécialité (visibilité des étudiants, bulletins)
+            models.Index(fields=['promotion', 'speciality'], name='cours_promotion_speciality_idx'),
+            # Cours modifiés depuis un jeton de synchronisation
+            models.Index(fields=['updated_at'], name='cours_updated_idx'),
+        ]
 
     def __str__(self):
         s_name = f" ({self.speciality.name})" if self.speciality else ""
         p_name = f" ({self.promotion.name})" if self.promotion else ""
         return f"{self.nom}{s_name}{p_name}"
 
+    # Mémorise les valeurs lues en base pour détecter les changements qui impactent les relevés de notes
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
 
 # Modèle Note : représente une note donnée à un étudiant pour un cours
 class Note(models.Model):
@@ -184,6 +218,9 @@ class Note(models.Model):
         verbose_name="Date de Publication",
         help_text="Date et heure auxquelles la note a été publiée"
     )
+    # Date de la dernière modification (flux de synchronisation /sync/, voir user/sync.py).
+    # Les écritures groupées (bulk_update) doivent la renseigner elles-mêmes.
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Dernière modification")
     # Celui qui a publié la note (généralement un formateur ou un admin)
     publie_par = models.ForeignKey(
         Profile,
@@ -199,6 +236,199 @@ class Note(models.Model):
         unique_together = ('etudiant', 'cours')
         ordering = ['-date_publication'] # Tri par défaut par date de publication décroissante
         verbose_name_plural = "Notes"
+        # Index composites alignés sur le tri de la pagination (date_publication, id) :
+        # chaque filtre par rôle lit directement les lignes dans l'ordre, sans tri complet
+        indexes = [
+            models.Index(fields=['-date_publication', '-id'], name='note_date_id_idx'), # Liste complète (administrateur)
+            models.Index(fields=['etudiant', '-date_publication'], name='note_etudiant_date_idx'), # Notes d'un étudiant
+            models.Index(fields=['publie_par', '-date_publication'], name='note_publie_par_date_idx'), # Notes publiées par un formateur
+            models.Index(fields=['cours', '-date_publication'], name='note_cours_date_idx'), # Notes d'un cours / d'une spécialité
+            # Notes modifiées depuis un jeton de synchronisation : toutes (administrateur), celles d'un étudiant
+            models.Index(fields=['updated_at'], name='note_updated_idx'),
+            models.Index(fields=['etudiant', 'updated_at'], name='note_etudiant_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"Note de {self.etudiant.user.username} ({self.valeur}) pour {self.cours.nom}"
+
+    # Mémorise les valeurs lues en base pour que les agrégats (statistiques des cours)
+    # puissent être mis à jour de façon incrémentale lors d'une modification.
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+
+# Statistiques des notes d'un cours, maintenues de façon incrémentale à chaque création,
+# modification ou suppression de Note (voir user/aggregates.py).
+# Permet de répondre à GET /api/courses/{id}/stats/ sans parcourir toutes les notes du cours.
+class CourseGradeStats(models.Model):
+    # Histogramme à intervalles fixes : [0, 2[, [2, 4[, ... [18, 20]
+    # Les valeurs hors de l'échelle sont comptées dans le premier ou le dernier intervalle.
+    HISTOGRAM_BUCKET_WIDTH = 2
+    HISTOGRAM_BUCKETS = 10
+
+    cours = models.OneToOneField(
+        Cours,
+        on_delete=models.CASCADE, # Les statistiques disparaissent avec le cours
+        primary_key=True,
+        related_name='grade_stats',
+        verbose_name="Cours"
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name="Nombre de notes")
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Somme des notes")
+    total_squares = models.DecimalField(max_digits=20, decimal_places=4, default=0, verbose_name="Somme des carrés des notes")
+    min_valeur = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, verbose_name="Note minimale")
+    max_valeur = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, verbose_name="Note maximale")
+    histogram = models.JSONField(default=list, verbose_name="Répartition des notes")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Dernière mise à jour")
+
+    class Meta:
+        verbose_name = "Statistiques d'un cours"
+        verbose_name_plural = "Statistiques des cours"
+
+    def __str__(self):
+        return f"Statistiques de {self.cours.nom} ({self.count} notes)"
+
+    @classmethod
+    def bucket_for(cls, valeur):
+        # Index de l'intervalle de l'histogramme correspondant à une valeur
+        index = int(valeur // cls.HISTOGRAM_BUCKET_WIDTH)
+        return max(0, min(index, cls.HISTOGRAM_BUCKETS - 1))
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def stddev(self):
+        # Écart-type de la population, déduit de la somme et de la somme des carrés
+        if not self.count:
+            return None
+        variance = self.total_squares / self.count - self.mean ** 2
+        return max(variance, 0).sqrt()
+
+
+
+# Relevé de notes d'un étudiant, précalculé à chaque écriture de Note (voir user/aggregates.py).
+# GET /api/profiles/{id}/transcript/ lit cette seule ligne au lieu de joindre Note, Cours et Speciality.
+class StudentTranscript(models.Model):
+    etudiant = models.OneToOneField(
+        Profile,
+        on_delete=models.CASCADE, # Le relevé disparaît avec le profil de l'étudiant
+        primary_key=True,
+        related_name='transcript',
+        verbose_name="Étudiant"
+    )
+    # Une entrée par cours : cours_id, cours_nom, speciality_id, speciality_name, coefficient, valeur, date_publication
+    grades = models.JSONField(default=list, verbose_name="Notes par cours")
+    # Moyenne générale pondérée par les coefficients des cours
+    overall_average = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True, verbose_name="Moyenne générale")
+    coefficient_total = models.DecimalField(max_digits=8, decimal_places=2, default=0, verbose_name="Somme des coefficients")
+    # Une entrée par spécialité : speciality_id, speciality_name, average, coefficient_total
+    speciality_averages = models.JSONField(default=list, verbose_name="Moyennes par spécialité")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Dernière mise à jour")
+
+    class Meta:
+        verbose_name = "Relevé de notes"
+        verbose_name_plural = "Relevés de notes"
+
+    def __str__(self):
+        return f"Relevé de {self.etudiant.user.username}"
+
+
+# Numéro de version d'une table, incrémenté à chaque écriture (voir user/versioning.py).
+# Sert à calculer les ETag et Last-Modified des listes de référence (spécialités, promotions, cours)
+# sans relire les tables elles-mêmes.
+class TableVersion(models.Model):
+    # Libellé du modèle, ex: "user.speciality" ou "auth.user"
+    table = models.CharField(max_length=100, primary_key=True, verbose_name="Table")
+    version = models.PositiveBigIntegerField(default=0, verbose_name="Version")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Dernière modification")
+
+    class Meta:
+        verbose_name = "Version de table"
+        verbose_name_plural = "Versions des tables"
+
+    def __str__(self):
+        return f"{self.table} v{self.version}"
+
+
+# Trace d'une note ou d'un cours supprimé (ou sorti du périmètre de visibilité de certains appelants),
+# pour le flux de synchronisation /sync/ (voir user/sync.py) : sans elle, un client qui ne télécharge
+# que les lignes modifiées ne saurait pas qu'une ligne a disparu.
+# Les colonnes de visibilité de la ligne au moment de sa suppression sont recopiées (l'objet n'existe plus) :
+# les mêmes règles que user/visibility.py s'appliquent aux traces.
+class Tombstone(models.Model):
+    class Kinds(models.TextChoices):
+        NOTE = 'note', 'Note'
+        COURS = 'cours', 'Cours'
+
+    kind = models.CharField(max_length=5, choices=Kinds.choices, verbose_name="Type")
+    object_id = models.BigIntegerField(verbose_name="Identifiant")
+    deleted_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de suppression")
+    # Note : étudiant et auteur ; note et cours : formateur et spécialité du cours ; cours : promotion
+    etudiant_id = models.BigIntegerField(null=True, blank=True)
+    publie_par_id = models.BigIntegerField(null=True, blank=True)
+    formateur_id = models.BigIntegerField(null=True, blank=True)
+    speciality_id = models.BigIntegerField(null=True, blank=True)
+    promotion_id = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Trace de suppression"
+        verbose_name_plural = "Traces de suppression"
+        indexes = [
+            models.Index(fields=['kind', 'deleted_at'], name='tombstone_kind_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} supprimé le {self.deleted_at:%Y-%m-%d %H:%M}"
+
+
+# Export CSV des notes exécuté en arrière-plan (voir user/export_jobs.py) : la requête HTTP ne fait que
+# l'enregistrer, un worker écrit le fichier dans le stockage des médias, et le client interroge son statut
+# puis télécharge le fichier. Deux demandes de même périmètre sur les mêmes données partagent le même export.
+class ExportJob(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'En attente'
+        RUNNING = 'running', 'En cours'
+        DONE = 'done', 'Terminé'
+        FAILED = 'failed', 'Échec'
+
+    requested_by = models.ForeignKey(
+        Profile,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='export_jobs',
+        verbose_name="Demandé par"
+    )
+    # Périmètre de visibilité des notes exportées (voir notes_scope dans user/visibility.py)
+    scope = models.JSONField(verbose_name="Périmètre")
+    # Empreinte du périmètre et des versions des tables lues : clé de déduplication des exports
+    fingerprint = models.CharField(max_length=40, verbose_name="Empreinte")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, verbose_name="Statut")
+    file = models.FileField(upload_to='exports/', blank=True, verbose_name="Fichier")
+    row_count = models.PositiveIntegerField(null=True, blank=True, verbose_name="Nombre de lignes")
+    error = models.TextField(blank=True, verbose_name="Erreur")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de demande")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Début")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
+
+    class Meta:
+        verbose_name = "Export de notes"
+        verbose_name_plural = "Exports de notes"
+        ordering = ['-created_at']
+        constraints = [
+            # Un seul export valide par empreinte : une demande concurrente identique réutilise le premier
+            models.UniqueConstraint(
+                fields=['fingerprint'], condition=~models.Q(status='failed'), name='exportjob_unique_fingerprint'
+            ),
+        ]
+        indexes = [
+            # Exports en attente, du plus ancien au plus récent (worker)
+            models.Index(fields=['created_at'], condition=models.Q(status='pending'), name='exportjob_pending_idx'),
+        ]
 
     def __str__(self):
-        return f"Note de {self.etudiant.user.username} ({self.valeur}) pour {self.cours.nom}"
\ No newline at end of file
+        return f"Export #{self.pk} ({self.get_status_display()})"
@@ -0,0 +1,199 @@
+# user/pagination.py
+
+# Pagination par curseur (keyset) pour toutes les listes de l'API.
+# Contrairement à OFFSET, la page suivante est obtenue avec un filtre sur la clé de tri
+# de la dernière ligne reçue (ex: date_publication < X OU (date_publication = X ET id < Y)) :
+# le coût d'une page ne dépend pas de la profondeur de défilement, et les insertions
+# concurrentes ne décalent pas les pages (ni doublon, ni ligne sautée).
+
+import base64
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination keyset générique. `ordering` liste les champs de tri (préfixe '-' pour un
+    tri décroissant) ; la combinaison doit être unique, d'où le champ 'id' en dernier.
+    """
+    ordering = ('id',)
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = "Curseur invalide."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, position = self.get_page_queryset(queryset, request)
+        return self.set_page(list(queryset), position)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Version asynchrone de paginate_queryset (vues asynchrones, voir user/async_views.py)."""
+        queryset, position = self.get_page_queryset(queryset, request)
+        return self.set_page([obj async for obj in queryset.aiterator()], position)
+
+    def get_page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position, self.reverse = self.decode_cursor(request)
+        if position is not None:
+            position = self.convert_position(queryset.model, position)
+
+        ordering = self.get_ordering(self.reverse)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(ordering, position))
+
+        # Une ligne de plus que la taille de page permet de savoir s'il reste des résultats
+        return queryset[:self.page_size + 1], position
+
+    def set_page(self, results, position):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(requested, self.max_page_size))
+
+    def get_ordering(self, reverse=False):
+        if not reverse:
+            return self.ordering
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering)
+
+    @staticmethod
+    def keyset_filter(ordering, position):
+        # (a, b, c) > (x, y, z)  <=>  a > x OU (a = x ET b > y) OU (a = x ET b = y ET c > z)
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {ordering[i].lstrip('-'): position[i] for i in range(index)}
+            condition |= Q(**equal, **{f'{name}__{lookup}': position[index]})
+        return condition
+
+    # --- Encodage des curseurs ---
+
+    def get_position(self, obj):
+        # Valeurs de la clé de tri pour une ligne (les chemins 'a__b' traversent les relations)
+        position = []
+        for field in self.ordering:
+            value = obj
+            for attr in field.lstrip('-').split('__'):
+                value = getattr(value, attr)
+            if isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            position.append(value if isinstance(value, (int, str)) or value is None else str(value))
+        return position
+
+    def encode_cursor(self, obj, reverse):
+        payload = json.dumps({'p': self.get_position(obj), 'r': int(reverse)}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            position, reverse = payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def convert_position(self, model, position):
+        # Les valeurs du curseur viennent du client : chacune est convertie par le champ de tri correspondant,
+        # pour qu'un curseur mal formé donne une 404 et non une erreur de la base ou du filtre
+        converted = []
+        for field_name, value in zip(self.ordering, position):
+            if isinstance(value, bool) or not isinstance(value, (int, str)):
+                raise NotFound(self.invalid_cursor_message)
+            field = self.get_model_field(model, field_name.lstrip('-'))
+            try:
+                value = field.to_python(value)
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            converted.append(value)
+        return converted
+
+    @staticmethod
+    def get_model_field(model, path):
+        # 'user__username' : champ username du modèle lié par user
+        *relations, name = path.split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.get_field(name)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+
+# Pagination propre à chaque liste, triée sur sa clé naturelle (+ id pour l'unicité)
+
+class NotePagination(KeysetPagination):
+    ordering = ('-date_publication', '-id')
+
+
+class CoursPagination(KeysetPagination):
+    ordering = ('nom', 'id')
+
+
+class ProfilePagination(KeysetPagination):
+    ordering = ('user__username', 'id')
+
+
+class SpecialityPagination(KeysetPagination):
+    ordering = ('name', 'id')
+
+
+class PromotionPagination(KeysetPagination):
+    ordering = ('year', 'name', 'id')
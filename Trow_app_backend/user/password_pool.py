@@ -0,0 +1,81 @@
+# user/password_pool.py
+
+# Hachage de mots de passe en parallèle, dans un pool de processus (import groupé d'utilisateurs).
+# Durée : PBKDF2 coûte ~0,4 s par mot de passe, soit environ USER_IMPORT_MAX_ROWS × 0,4 s / nombre de processus
+# pour l'import le plus long (500 lignes sur 4 cœurs : ~50 s), pendant lesquelles la requête occupe un worker web.
+# Ce module n'importe aucun modèle : les processus démarrés avec 'spawn' le chargent avant que
+# Django ne soit configuré (la fonction exécutée et l'initialiseur sont retrouvés par leur module).
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# En dessous de ce nombre de mots de passe, l'envoi au pool coûte plus qu'il ne rapporte
+PARALLEL_HASH_THRESHOLD = 8
+
+# Pool partagé par les requêtes du processus web : créé au premier import groupé, arrêté à la sortie.
+# Chaque fils charge Django une seule fois (initialiseur), et non à chaque requête.
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def _setup_worker():
+    # Le processus fils lit DJANGO_SETTINGS_MODULE, hérité du processus web, pour connaître PASSWORD_HASHERS
+    import django
+    django.setup()
+
+
+def _make_password(password):
+    from django.contrib.auth.hashers import make_password
+    return make_password(password)
+
+
+def _get_pool(workers):
+    """
+    Pool de `workers` processus, démarrés avec 'spawn' : un processus issu de fork hériterait des
+    connexions à la base du processus web et pourrait les fermer en se terminant.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            else:
+                atexit.register(shutdown_pool)
+            context = multiprocessing.get_context('spawn')
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_setup_worker)
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    """Arrête le pool (sortie du processus, tests)."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = _pool_workers = None
+
+
+def hash_passwords(passwords):
+    """
+    Hache les mots de passe (chacun avec son propre sel) et retourne les hachages dans le même ordre.
+    Avec un seul cœur (ou PASSWORD_HASH_WORKERS = 1), le hachage se fait dans le processus web.
+    """
+    from django.conf import settings
+
+    passwords = list(passwords)
+    workers = getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 1
+    if len(passwords) < PARALLEL_HASH_THRESHOLD or workers < 2:
+        return [_make_password(password) for password in passwords]
+    pool = _get_pool(workers)
+    try:
+        return list(pool.map(_make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+    except BrokenProcessPool:
+        # Un fils s'est arrêté (mémoire, signal) : le pool est recréé à la prochaine requête
+        shutdown_pool()
+        return [_make_password(password) for password in passwords]
@@ -0,0 +1,111 @@
+# user/principal.py
+
+# "Principal" : l'identité de l'appelant pour la durée d'une requête.
+# Il regroupe le profil, le rôle et les spécialités assignées (pour un formateur) et n'est
+# construit qu'une seule fois par requête, en une seule requête SQL. Les classes de permission
+# et les filtres de visibilité l'utilisent au lieu de relire request.user.profile et
+# assigned_specialities.
+
+from dataclasses import dataclass
+
+from .models import Profile
+
+
+@dataclass(frozen=True)
+class Principal:
+    profile: Profile
+    role: str
+    # Identifiants des spécialités assignées (formateur uniquement) : test d'appartenance sans requête SQL
+    speciality_ids: frozenset
+    # Spécialité de la promotion (étudiant uniquement)
+    promotion_speciality_id: int = None
+
+    @property
+    def profile_id(self):
+        return self.profile.pk
+
+    @property
+    def is_admin(self):
+        return self.role == Profile.Roles.ADMIN
+
+    @property
+    def is_trainer(self):
+        return self.role == Profile.Roles.FORMATEUR
+
+    @property
+    def is_student(self):
+        return self.role == Profile.Roles.ETUDIANT
+
+    @property
+    def promotion_id(self):
+        return self.profile.promotion_id
+
+    def manages_cours(self, cours):
+        """Vrai si le formateur enseigne ce cours ou si le cours appartient à une de ses spécialités."""
+        return cours.formateur_id == self.profile_id or cours.speciality_id in self.speciality_ids
+
+
+def _principal_queryset(user):
+    # Une ligne par spécialité assignée (jointure externe), au moins une ligne si le profil existe
+    return Profile.objects.filter(user_id=user.pk).values_list(
+        'id', 'role', 'promotion_id', 'promotion__speciality_id', 'assigned_specialities__id'
+    )
+
+
+def _principal_from_rows(user, rows):
+    if not rows:
+        return None
+
+    profile_id, role, promotion_id, promotion_speciality_id, _ = rows[0]
+    # Le profil est reconstitué à partir des colonnes lues (ce sont tous ses champs concrets)
+    profile = Profile.from_db(
+        Profile.objects.db, ['id', 'user_id', 'role', 'promotion_id'], [profile_id, user.pk, role, promotion_id]
+    )
+    profile.user = user # Évite une requête pour profile.user (ex: formateur_username après création d'un cours)
+    speciality_ids = frozenset(row[4] for row in rows if row[4] is not None)
+    return Principal(
+        profile=profile, role=role, speciality_ids=speciality_ids,
+        promotion_speciality_id=promotion_speciality_id,
+    )
+
+
+def build_principal(user):
+    """
+    Construit le Principal d'un utilisateur en une seule requête : le profil, la spécialité
+    de sa promotion et ses spécialités assignées (une ligne par spécialité, jointure externe).
+    Retourne None pour un utilisateur anonyme ou sans profil.
+    """
+    if user is None or not user.is_authenticated:
+        return None
+    return _principal_from_rows(user, list(_principal_queryset(user)))
+
+
+async def abuild_principal(user):
+    """Version asynchrone de build_principal (vues asynchrones, voir user/async_views.py)."""
+    if user is None or not user.is_authenticated:
+        return None
+    return _principal_from_rows(user, [row async for row in _principal_queryset(user)])
+
+
+def get_principal(request):
+    """
+    Retourne le Principal de la requête. Il est construit à la première utilisation
+    (classe de permission, get_queryset...) puis réutilisé jusqu'à la fin de la requête.
+    """
+    try:
+        return request._principal
+    except AttributeError:
+        principal = request._principal = build_principal(getattr(request, 'user', None))
+        return principal
+
+
+async def aget_principal(request):
+    """
+    Version asynchrone de get_principal. Le Principal est mémorisé sur la requête : les classes
+    de permission et get_queryset appelées ensuite (get_principal) ne lisent plus la base.
+    """
+    try:
+        return request._principal
+    except AttributeError:
+        principal = request._principal = await abuild_principal(getattr(request, 'user', None))
+        return principal
@@ -0,0 +1,391 @@
+# user/profiling.py
+
+# Profilage des requêtes (REQUEST_PROFILING = True dans settings.py). Pour chaque requête :
+# - durée totale, authentification, classes de permission, requêtes SQL (nombre et durée), sérialisation
+#   et rendu, par vue et action (ex: NoteViewSet.list, CoursViewSet.partial_update) ;
+# - en-tête Server-Timing de la réponse (visible dans l'onglet Réseau des outils de développement) ;
+# - histogrammes de latence en mémoire du processus, exposés au format texte de Prometheus par
+#   GET /api/v1/_metrics (administrateurs, vue MetricsView).
+#
+# Les mesures sont rangées dans le RequestProfile de la requête en cours (variable de contexte : elle suit
+# la requête dans les threads de sync_to_async). Les requêtes SQL sont chronométrées par un execute_wrapper
+# installé sur chaque connexion à la base ; la sérialisation et le rendu par ProfiledViewMixin (ViewSets) et
+# par les vues asynchrones (user/async_views.py). Le temps de sérialisation comprend les requêtes SQL qu'elle
+# déclenche (querysets paresseux, relations non préchargées) : les mesures se recouvrent, elles ne s'additionnent pas.
+#
+# Le même middleware alimente le journal des requêtes lentes (SLOW_REQUEST_LOG, voir user/slow_requests.py) :
+# les requêtes SQL de la requête sont alors conservées (texte, paramètres, durée) jusqu'à sa fin.
+#
+# Désactivé (par défaut : ni REQUEST_PROFILING ni SLOW_REQUEST_LOG), le middleware lève MiddlewareNotUsed : il
+# est retiré de la chaîne au démarrage, aucun execute_wrapper n'est installé, et les points de mesure ne lisent
+# qu'une variable de contexte vide.
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Étapes mesurées, dans l'ordre de l'en-tête Server-Timing
+PHASES = ('auth', 'permissions', 'sql', 'serialize', 'render')
+
+# Bornes (secondes) des seaux de l'histogramme Prometheus des durées de requête
+PROMETHEUS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Quantiles publiés pour les étapes et le nombre de requêtes SQL
+PROMETHEUS_QUANTILES = (0.5, 0.9, 0.99)
+
+_current = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """
+    Mesures d'une requête : durées cumulées par étape (secondes) et nombre de requêtes SQL. Avec
+    `max_statements`, les requêtes SQL sont aussi conservées : (durée, sql, paramètres, alias de la base,
+    executemany), les `max_statements` premières, plus la plus lente dans `slowest`.
+    """
+    def __init__(self, max_statements=None):
+        self.started = time.perf_counter()
+        self.view_name = None
+        self.role = None
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.sql_count = 0
+        self.max_statements = max_statements
+        self.statements = [] if max_statements is not None else None
+        self.slowest = None
+
+    def add_statement(self, statement):
+        if len(self.statements) < self.max_statements:
+            self.statements.append(statement)
+        if self.slowest is None or statement[0] > self.slowest[0]:
+            self.slowest = statement
+
+    def add(self, phase, seconds):
+        self.phases[phase] += seconds
+
+    def server_timing(self, total):
+        entries = [
+            f'{phase};desc="{self.sql_count} SQL";dur={self.phases[phase] * 1000:.2f}' if phase == 'sql'
+            else f'{phase};dur={self.phases[phase] * 1000:.2f}'
+            for phase in PHASES
+        ]
+        return ', '.join([*entries, f'total;dur={total * 1000:.2f}'])
+
+
+def current_profile():
+    return _current.get()
+
+
+def set_view_name(name):
+    """Nomme la vue de la requête en cours (libellé des métriques)."""
+    profile = _current.get()
+    if profile is not None:
+        profile.view_name = name
+
+
+def set_principal(principal):
+    """Rôle de l'appelant de la requête en cours (journal des requêtes lentes)."""
+    profile = _current.get()
+    if profile is not None:
+        profile.role = principal.role if principal is not None else 'anonyme'
+
+
+@contextmanager
+def measure(phase):
+    """Ajoute la durée du bloc à une étape de la requête en cours (sans effet si le profilage est désactivé)."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(phase, time.perf_counter() - started)
+
+
+def timed(phase, function):
+    """Enveloppe `function` : ses appels sont mesurés dans l'étape `phase`."""
+    def wrapper(*args, **kwargs):
+        with measure(phase):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def _record_sql(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        profile.add('sql', elapsed)
+        profile.sql_count += 1
+        if profile.statements is not None:
+            profile.add_statement((elapsed, sql, params, context['connection'].alias, many))
+
+
+def _install_sql_wrapper(sender=None, connection=None, **kwargs):
+    if _record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_sql)
+
+
+# --- Histogrammes ---
+
+class LatencyHistogram:
+    """
+    Histogramme à précision relative constante, comme HdrHistogram : valeurs entières (microsecondes, ou
+    nombre de requêtes SQL), exactes jusqu'à 2 × SUB_BUCKETS, puis SUB_BUCKETS seaux linéaires par puissance
+    de deux (erreur relative < 1 / SUB_BUCKETS). Mémoire bornée : quelques centaines de seaux au plus.
+    """
+    SUB_BUCKET_BITS = 5
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+
+    @classmethod
+    def bucket_index(cls, value):
+        shift = max(value.bit_length() - cls.SUB_BUCKET_BITS - 1, 0)
+        return shift * cls.SUB_BUCKETS + (value >> shift)
+
+    @classmethod
+    def bucket_bounds(cls, index):
+        """Intervalle [bas, haut[ des valeurs d'un seau."""
+        if index < 2 * cls.SUB_BUCKETS:
+            return index, index + 1
+        shift = index // cls.SUB_BUCKETS - 1
+        mantissa = index - shift * cls.SUB_BUCKETS
+        return mantissa << shift, (mantissa + 1) << shift
+
+    def record(self, value):
+        value = max(int(value), 0)
+        index = self.bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+
+    def _buckets(self):
+        # (valeur représentative, effectif) par seau croissant ; le milieu du seau borne l'erreur des deux côtés
+        for index in sorted(self.counts):
+            low, high = self.bucket_bounds(index)
+            yield (low + high - 1) / 2, self.counts[index]
+
+    def quantile(self, q):
+        if not self.count:
+            return math.nan
+        rank = max(math.ceil(q * self.count), 1)
+        seen = 0
+        for value, count in self._buckets():
+            seen += count
+            if seen >= rank:
+                return value
+        return value
+
+    def cumulative_counts(self, bounds):
+        """Effectifs cumulés (valeurs <= borne) pour des bornes croissantes, comme les seaux `le` de Prometheus."""
+        result, seen, buckets = [], 0, list(self._buckets())
+        position = 0
+        for bound in bounds:
+            while position < len(buckets) and buckets[position][0] <= bound:
+                seen += buckets[position][1]
+                position += 1
+            result.append(seen)
+        return result
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.duration = LatencyHistogram() # Microsecondes
+        self.phases = {phase: LatencyHistogram() for phase in PHASES} # Microsecondes
+        self.sql_queries = LatencyHistogram()
+
+
+class MetricsRegistry:
+    """Histogrammes par (vue, méthode HTTP, classe de statut) du processus."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, labels, profile, total):
+        with self._lock:
+            metrics = self._views.get(labels)
+            if metrics is None:
+                metrics = self._views[labels] = ViewMetrics()
+            metrics.duration.record(total * 1e6)
+            for phase, seconds in profile.phases.items():
+                metrics.phases[phase].record(seconds * 1e6)
+            metrics.sql_queries.record(profile.sql_count)
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render_prometheus(self):
+        """Format texte d'exposition de Prometheus (version 0.0.4)."""
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = [
+                '# HELP trow_request_duration_seconds Durée des requêtes HTTP par vue.',
+                '# TYPE trow_request_duration_seconds histogram',
+            ]
+            for labels, metrics in views:
+                label_text = _labels(labels)
+                counts = metrics.duration.cumulative_counts([bound * 1e6 for bound in PROMETHEUS_BUCKETS])
+                for bound, count in zip(PROMETHEUS_BUCKETS, counts):
+                    lines.append(f'trow_request_duration_seconds_bucket{{{label_text},le="{bound}"}} {count}')
+                lines.append(f'trow_request_duration_seconds_bucket{{{label_text},le="+Inf"}} {metrics.duration.count}')
+                lines.append(f'trow_request_duration_seconds_sum{{{label_text}}} {metrics.duration.total / 1e6}')
+                lines.append(f'trow_request_duration_seconds_count{{{label_text}}} {metrics.duration.count}')
+
+            lines += [
+                '# HELP trow_request_phase_seconds Durée des étapes des requêtes (authentification, permissions, SQL, sérialisation, rendu).',
+                '# TYPE trow_request_phase_seconds summary',
+            ]
+            for labels, metrics in views:
+                for phase, histogram in metrics.phases.items():
+                    lines += _summary('trow_request_phase_seconds', f'{_labels(labels)},phase="{phase}"', histogram, 1e6)
+
+            lines += [
+                '# HELP trow_request_sql_queries Nombre de requêtes SQL par requête HTTP.',
+                '# TYPE trow_request_sql_queries summary',
+            ]
+            for labels, metrics in views:
+                lines += _summary('trow_request_sql_queries', _labels(labels), metrics.sql_queries, 1)
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    view, method, status = labels
+    return f'view="{_escape(view)}",method="{_escape(method)}",status="{_escape(status)}"'
+
+
+def _summary(name, label_text, histogram, scale):
+    lines = [
+        f'{name}{{{label_text},quantile="{q}"}} {histogram.quantile(q) / scale}'
+        for q in PROMETHEUS_QUANTILES
+    ]
+    lines.append(f'{name}_sum{{{label_text}}} {histogram.total / scale}')
+    lines.append(f'{name}_count{{{label_text}}} {histogram.count}')
+    return lines
+
+
+registry = MetricsRegistry()
+
+
+def profiling_enabled():
+    return settings.REQUEST_PROFILING
+
+
+# --- Middleware et mixin de vue ---
+
+class ProfilingMiddleware:
+    """
+    Premier middleware de MIDDLEWARE : mesure toute la requête. Synchrone ou asynchrone selon le
+    gestionnaire (WSGI ou ASGI), comme les middlewares de Django.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.metrics = profiling_enabled()
+        self.slow_log = settings.SLOW_REQUEST_LOG
+        if not (self.metrics or self.slow_log):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.max_statements = settings.SLOW_REQUEST_MAX_STATEMENTS if self.slow_log else None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(_install_sql_wrapper)
+        for connection in connections.all(initialized_only=True):
+            _install_sql_wrapper(connection=connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = RequestProfile(self.max_statements)
+        token = _current.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = RequestProfile(self.max_statements)
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile)
+
+    def finish(self, request, response, profile):
+        total = time.perf_counter() - profile.started
+        view_name = profile.view_name or self.resolved_view_name(request)
+        if self.metrics:
+            response['Server-Timing'] = profile.server_timing(total)
+            registry.record((view_name, request.method, f'{response.status_code // 100}xx'), profile, total)
+        if self.slow_log:
+            # Import local : user/slow_requests.py importe ce module
+            from .slow_requests import sample_request
+            sample_request(request, response, profile, view_name, total)
+        return response
+
+    @staticmethod
+    def resolved_view_name(request):
+        # Vues hors ViewSets : nom de la route, sinon de la fonction ; 'unresolved' pour une URL inconnue (404)
+        match = getattr(request, 'resolver_match', None)
+        return 'unresolved' if match is None else match.view_name
+
+
+class ProfiledViewMixin:
+    """
+    Mixin de ViewSet : nomme la vue (Classe.action) et mesure l'authentification, les permissions, la
+    sérialisation (to_representation des sérialiseurs de get_serializer) et le rendu de la réponse.
+    """
+    def initial(self, request, *args, **kwargs):
+        set_view_name(f"{type(self).__name__}.{getattr(self, 'action', None) or request.method.lower()}")
+        super().initial(request, *args, **kwargs)
+
+    def perform_authentication(self, request):
+        with measure('auth'):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with measure('permissions'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with measure('permissions'):
+            super().check_object_permissions(request, obj)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if current_profile() is not None:
+            # Attribut d'instance : serializer.data appelle self.to_representation
+            serializer.to_representation = timed('serialize', serializer.to_representation)
+        return serializer
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if current_profile() is not None and hasattr(request, '_principal'):
+            set_principal(request._principal) # Seulement s'il a été construit : pas de requête en plus
+        renderer = getattr(response, 'accepted_renderer', None)
+        if renderer is not None and current_profile() is not None:
+            # Le rendu a lieu après la vue (response.render() dans le gestionnaire de Django)
+            renderer.render = timed('render', renderer.render)
+        return response
@@ -0,0 +1,93 @@
+# user/renderers.py
+
+# Format JSON "en colonnes" pour les grandes listes (application mobile sur données cellulaires).
+# Une liste de notes en JSON répète les clés (etudiant_username, cours_nom, publie_par_username,
+# date_publication...) sur chaque ligne, et les mêmes noms de cours et d'utilisateurs d'une ligne à l'autre.
+# Ce format écrit les clés une seule fois et remplace les chaînes répétées par un indice dans un dictionnaire :
+#
+#   {"next": ..., "previous": ..., "results": {
+#       "columns": ["id", "cours_nom", "valeur", ...],
+#       "dictionaries": {"cours_nom": ["Django", "Réseaux"]},   # colonnes encodées seulement
+#       "rows": [[1, 0, "12.00", ...], [2, 1, "15.50", ...]]}}
+#
+# Sélection : en-tête Accept: application/vnd.trow.columnar+json, ou ?format=columnar.
+# Seules les listes d'objets sont transformées ; un objet seul (retrieve) ou une erreur est rendu tel quel.
+# Mesure : python manage.py benchmark_renderers
+#
+# PrometheusTextRenderer : format texte d'exposition de Prometheus, pour GET /api/v1/_metrics (user/profiling.py).
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+# Une colonne n'est encodée que si ses chaînes se répètent assez (au plus une valeur distincte pour deux lignes)
+DICTIONARY_MAX_RATIO = 0.5
+
+
+def to_columnar(records):
+    """Liste de dictionnaires (même sérialiseur) -> {'columns', 'dictionaries', 'rows'}."""
+    columns = list(records[0]) if records else []
+    dictionaries = {}
+    encoded = []
+    for column in columns:
+        values = [record.get(column) for record in records]
+        present = [value for value in values if value is not None]
+        if not present or not all(isinstance(value, str) for value in present):
+            encoded.append(values)
+            continue
+        distinct = list(dict.fromkeys(present)) # Ordre de première apparition
+        if len(distinct) > len(present) * DICTIONARY_MAX_RATIO:
+            encoded.append(values)
+            continue
+        index = {value: position for position, value in enumerate(distinct)}
+        dictionaries[column] = distinct
+        encoded.append([None if value is None else index[value] for value in values])
+    return {
+        'columns': columns,
+        'dictionaries': dictionaries,
+        'rows': [list(row) for row in zip(*encoded)] if encoded else [[] for _ in records],
+    }
+
+
+def from_columnar(table):
+    """Opération inverse de to_columnar (clients Python, tests)."""
+    dictionaries = table.get('dictionaries', {})
+    decoders = [dictionaries.get(column) for column in table['columns']]
+    return [
+        {
+            column: value if decoder is None or value is None else decoder[value]
+            for column, decoder, value in zip(table['columns'], decoders, row)
+        }
+        for row in table['rows']
+    ]
+
+
+def _is_records(data):
+    return isinstance(data, list) and all(isinstance(item, dict) for item in data)
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """JSONRenderer qui rend les listes d'objets (paginées ou non) en colonnes, voir to_columnar."""
+    media_type = 'application/vnd.trow.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Les erreurs (ex: liste d'erreurs par élément d'un POST en liste) sont rendues telles quelles
+        response = (renderer_context or {}).get('response')
+        if response is not None and response.status_code >= 400:
+            return super().render(data, accepted_media_type, renderer_context)
+        if isinstance(data, dict) and _is_records(data.get('results')):
+            data = {**data, 'results': to_columnar(data['results'])}
+        elif _is_records(data):
+            data = to_columnar(data)
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class PrometheusTextRenderer(BaseRenderer):
+    """Texte déjà formaté (MetricsRegistry.render_prometheus), ou message d'erreur d'une réponse DRF."""
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict): # Erreur (401, 403, 404) : {'detail': ...}
+            data = f"# {data.get('detail', data)}\n"
+        return data.encode(self.charset)
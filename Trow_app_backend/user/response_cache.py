@@ -0,0 +1,88 @@
+# user/response_cache.py
+
+# Cache partagé des réponses de lecture (listes et détails des spécialités et des promotions).
+# Les octets déjà rendus sont stockés dans le cache Django 'responses' (voir CACHES dans settings.py),
+# sous une clé dérivée de l'ETag (user/conditional.py). L'ETag contient l'URL absolue de la requête (les liens
+# de pagination dépendent de l'hôte et du schéma) et les versions des tables lues :
+# une écriture sur l'une d'elles change la clé, l'ancienne entrée n'est plus jamais lue et finit
+# par expirer. Aucune invalidation explicite, et aucune lecture de la base en cas de succès.
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+from .conditional import ConditionalGetMixin
+
+HITS_KEY = 'response-cache:hits'
+MISSES_KEY = 'response-cache:misses'
+
+
+def get_response_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _increment(key):
+    cache = get_response_cache()
+    try:
+        cache.incr(key)
+    except ValueError: # Compteur absent (premier appel, entrée évincée ou supprimée par un autre processus)
+        # add ne remplace pas un compteur créé entre-temps : cet incrément-là est alors perdu, sans erreur
+        cache.add(key, 1, timeout=None)
+
+
+def get_cache_stats():
+    """
+    Compteurs de succès et d'échecs du cache des réponses (partagés si le cache l'est). Ils sont approximatifs :
+    incr n'est pas atomique sur tous les backends (FileBasedCache lit puis réécrit le fichier) et un compteur
+    évincé repart de zéro ; ils servent à suivre un taux de succès, pas à compter exactement.
+    """
+    values = get_response_cache().get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = values.get(HITS_KEY, 0), values.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 4) if total else None}
+
+
+def reset_cache_stats():
+    get_response_cache().delete_many([HITS_KEY, MISSES_KEY])
+
+
+class ResponseCacheMixin(ConditionalGetMixin):
+    """
+    Mixin de ViewSet : sert les actions list et retrieve depuis le cache des réponses.
+    Seules les réponses 200 des formats de cacheable_formats sont stockées (l'API navigable
+    contient le nom de l'utilisateur connecté et un jeton CSRF).
+    """
+    response_cache_enabled = True
+    cacheable_formats = ('json', 'columnar')
+
+    def get_response_cache_key(self, etag):
+        return 'response:' + etag.strip('"')
+
+    def get_fresh_response(self, request, etag, handler, *args, **kwargs):
+        if not self.response_cache_enabled or request.accepted_renderer.format not in self.cacheable_formats:
+            return handler(request, *args, **kwargs)
+
+        key = self.get_response_cache_key(etag)
+        cached = get_response_cache().get(key)
+        if cached is not None:
+            _increment(HITS_KEY)
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        _increment(MISSES_KEY)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            self._response_cache_key = key # Stockée une fois rendue, dans finalize_response
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, '_response_cache_key', None)
+        if key is not None and isinstance(response, Response) and response.status_code == 200:
+            response.render() # Le rendu n'est fait qu'une fois : Django ne le refera pas
+            get_response_cache().set(key, (response.content, response['Content-Type']))
+        return response
@@ -0,0 +1,229 @@
+# user/seeding.py
+
+# Génération d'un jeu de données synthétique aux proportions réalistes (tests de charge locaux) :
+# spécialités, promotions par année, étudiants, formateurs, administrateurs, cours et notes.
+# Tout est écrit avec bulk_create par lots, avec un seul hachage de mot de passe partagé par
+# tous les utilisateurs, et de façon déterministe : la même graine produit les mêmes données.
+# Les notes (l'essentiel du volume) sont insérées avec executemany sur des tuples déjà convertis
+# au format de la base : construire un million d'instances Note coûterait plus que l'insertion.
+# Voir la commande `python manage.py seed_scale`.
+
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .aggregates import compute_course_stats, refresh_transcripts
+from .models import CourseGradeStats, Cours, Note, Profile, Promotion, Speciality
+from .versioning import bump_table_version
+
+
+@dataclass(frozen=True)
+class SeedConfig:
+    specialities: int = 8
+    years: int = 3 # Années de promotion, jusqu'à first_year + years - 1
+    first_year: int = 2023
+    promotions_per_year: int = 8 # Réparties entre les spécialités
+    students_per_promotion: int = 30
+    courses_per_promotion: int = 10
+    trainers: int = 40
+    admins: int = 2
+    grade_density: float = 0.9 # Part des paires (étudiant, cours de sa promotion) qui ont une note
+    seed: int = 42
+    prefix: str = 'seed' # Préfixe des noms : plusieurs jeux peuvent coexister dans la même base
+    password: str = 'motdepasse'
+    chunk_size: int = 5000
+    aggregates: bool = True # Statistiques des cours et relevés (bulk_create n'émet pas de signaux)
+
+
+def _chunks(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _bulk_create(model, objects, chunk_size):
+    # Les objets sont générés au fil de l'eau : un lot en mémoire à la fois
+    created = []
+    for batch in _chunks(objects, chunk_size):
+        created += model.objects.bulk_create(batch, batch_size=chunk_size)
+    return created
+
+
+# Valeurs possibles d'une note (au quart de point), converties une seule fois au format de la base
+_VALEURS = [Decimal(quarter) / 4 for quarter in range(81)]
+
+
+def _random_quarter(rng):
+    # Distribution proche des notes réelles : centrée sur 12/20
+    return round(min(max(rng.gauss(12, 3.5), 0), 20) * 4)
+
+
+def _insert_notes(rows, chunk_size):
+    """
+    Insère des tuples (etudiant_id, cours_id, valeur, date_publication, publie_par_id) déjà convertis.
+    updated_at reçoit la date de publication (une note générée n'a jamais été modifiée).
+    """
+    table = connection.ops.quote_name(Note._meta.db_table)
+    columns = ', '.join(
+        connection.ops.quote_name(Note._meta.get_field(name).column)
+        for name in ('etudiant', 'cours', 'valeur', 'date_publication', 'publie_par', 'updated_at')
+    )
+    sql = f"INSERT INTO {table} ({columns}) VALUES (%s, %s, %s, %s, %s, %s)"
+    count = 0
+    with connection.cursor() as cursor:
+        for batch in _chunks(rows, chunk_size):
+            cursor.executemany(sql, [(*row, row[3]) for row in batch])
+            count += len(batch)
+    return count
+
+
+def seed_dataset(config, log=None):
+    """
+    Crée le jeu de données décrit par `config` dans une seule transaction.
+    `log` reçoit un message par étape (avec sa durée). Retourne le nombre de lignes créées par modèle.
+    """
+    log = log or (lambda message: None)
+    rng = random.Random(config.seed)
+    prefix = config.prefix
+    counts = {}
+
+    def step(name, started):
+        log(f"{name} : {counts.get(name, 0)} en {time.perf_counter() - started:.2f} s")
+
+    with transaction.atomic():
+        started = time.perf_counter()
+        specialities = Speciality.objects.bulk_create([
+            Speciality(name=f"{prefix} Spécialité {i + 1}", description=f"Spécialité générée n°{i + 1}")
+            for i in range(config.specialities)
+        ])
+        counts['specialities'] = len(specialities)
+        step('specialities', started)
+
+        started = time.perf_counter()
+        promotions = Promotion.objects.bulk_create([
+            Promotion(
+                name=f"{prefix} Promo {year}-{index + 1}", year=year,
+                speciality=specialities[index % len(specialities)],
+            )
+            for year in range(config.first_year, config.first_year + config.years)
+            for index in range(config.promotions_per_year)
+        ])
+        counts['promotions'] = len(promotions)
+        step('promotions', started)
+
+        # Un seul hachage pour tous les comptes (le hachage coûte ~0,5 s par appel avec PBKDF2)
+        started = time.perf_counter()
+        password_hash = make_password(config.password)
+        students_count = len(promotions) * config.students_per_promotion
+        usernames = (
+            [f"{prefix}_admin{i + 1}" for i in range(config.admins)] +
+            [f"{prefix}_formateur{i + 1}" for i in range(config.trainers)] +
+            [f"{prefix}_etudiant{i + 1}" for i in range(students_count)]
+        )
+        users = _bulk_create(User, (
+            User(username=username, email=f"{username}@example.com", password=password_hash)
+            for username in usernames
+        ), config.chunk_size)
+        counts['users'] = len(users)
+        step('users', started)
+
+        started = time.perf_counter()
+        roles = (
+            [(Profile.Roles.ADMIN, None)] * config.admins +
+            [(Profile.Roles.FORMATEUR, None)] * config.trainers +
+            [(Profile.Roles.ETUDIANT, promotions[i // config.students_per_promotion]) for i in range(students_count)]
+        )
+        profiles = _bulk_create(Profile, (
+            Profile(user=user, role=role, promotion=promotion) for user, (role, promotion) in zip(users, roles)
+        ), config.chunk_size)
+        admins = profiles[:config.admins]
+        trainers = profiles[config.admins:config.admins + config.trainers]
+        students = profiles[config.admins + config.trainers:]
+        counts['profiles'] = len(profiles)
+        step('profiles', started)
+
+        # Chaque formateur est assigné à une ou deux spécialités
+        started = time.perf_counter()
+        Assignment = Profile.assigned_specialities.through
+        trainers_by_speciality = {speciality.pk: [] for speciality in specialities}
+        assignments = []
+        for index, trainer in enumerate(trainers):
+            chosen = {specialities[index % len(specialities)]}
+            if rng.random() < 0.5:
+                chosen.add(rng.choice(specialities))
+            for speciality in chosen:
+                trainers_by_speciality[speciality.pk].append(trainer)
+                assignments.append(Assignment(profile_id=trainer.pk, speciality_id=speciality.pk))
+        Assignment.objects.bulk_create(assignments, batch_size=config.chunk_size)
+        counts['assignments'] = len(assignments)
+        step('assignments', started)
+
+        started = time.perf_counter()
+        courses = Cours.objects.bulk_create([
+            Cours(
+                nom=f"{prefix} {promotion.name} Cours {index + 1}",
+                speciality=promotion.speciality, promotion=promotion,
+                formateur=rng.choice(trainers_by_speciality[promotion.speciality_id] or trainers or [None]),
+                coefficient=Decimal(rng.choice((1, 1, 1, 2, 2, 3))),
+            )
+            for promotion in promotions
+            for index in range(config.courses_per_promotion)
+        ], batch_size=config.chunk_size)
+        counts['courses'] = len(courses)
+        step('courses', started)
+
+        # Notes : les cours de la promotion de chaque étudiant, selon la densité demandée.
+        # Les notes d'un cours sont publiées ensemble, à une date de l'année de la promotion.
+        started = time.perf_counter()
+        valeurs = [connection.ops.adapt_decimalfield_value(valeur, 5, 2) for valeur in _VALEURS]
+        promotion_years = {promotion.pk: promotion.year for promotion in promotions}
+        courses_by_promotion = {}
+        for cours in courses:
+            published = timezone.make_aware(datetime(promotion_years[cours.promotion_id], 1, 1)) + timedelta(
+                minutes=rng.randrange(365 * 24 * 60)
+            )
+            courses_by_promotion.setdefault(cours.promotion_id, []).append((
+                cours.pk,
+                connection.ops.adapt_datetimefield_value(published),
+                cours.formateur_id or (admins[0].pk if admins else None),
+            ))
+
+        def notes():
+            for student in students:
+                for cours_id, published, publie_par_id in courses_by_promotion.get(student.promotion_id, ()):
+                    if rng.random() < config.grade_density:
+                        yield (student.pk, cours_id, valeurs[_random_quarter(rng)], published, publie_par_id)
+
+        counts['notes'] = _insert_notes(notes(), config.chunk_size)
+        step('notes', started)
+
+        if config.aggregates:
+            started = time.perf_counter()
+            stats = compute_course_stats([cours.pk for cours in courses])
+            CourseGradeStats.objects.bulk_create(stats.values(), batch_size=config.chunk_size)
+            counts['course_stats'] = len(stats)
+            step('course_stats', started)
+
+            started = time.perf_counter()
+            for batch in _chunks((student.pk for student in students), 1000):
+                refresh_transcripts(batch)
+            counts['transcripts'] = len(students)
+            step('transcripts', started)
+
+        # bulk_create n'émet pas de signaux : les ETag des listes de référence (et les exports) doivent changer
+        for model in (Speciality, Promotion, Cours, Profile, User, Note):
+            bump_table_version(model)
+
+    return counts
@@ -2,24 +2,32 @@
 
 from rest_framework import serializers
 from django.contrib.auth.models import User # Importe le modèle User par default de Django
-from .models import Profile, Cours, Note, Speciality, Promotion # Importe tous vos modèles
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from rest_framework.reverse import reverse
+from .models import Profile, Cours, Note, Speciality, Promotion, StudentTranscript, ExportJob # Importe tous vos modèles
+from .services import create_notes
+from .fieldsets import SparseFieldsetMixin
 
 
+# Les sérialiseurs de lecture acceptent ?fields= et ?omit= (champs partiels, voir user/fieldsets.py).
+
 # Serializer simple pour le modèle User de Django
 # Utile pour afficher les détails de l'utilisateur lié dans d'autres sérialiseurs (ex: dans ProfileSerializer)
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
 
 # Serializer pour le modèle Speciality
-class SpecialitySerializer(serializers.ModelSerializer):
+class SpecialitySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Speciality
         fields = ['id', 'name', 'description']
 
 # Serializer pour le modèle Promotion
-class PromotionSerializer(serializers.ModelSerializer):
+class PromotionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # Pour afficher le nom de la spécialité liée lors de la lecture (ex: GET /api/promotions/)
     speciality_name = serializers.CharField(source='speciality.name', read_only=True)
     
@@ -34,7 +42,7 @@ class PromotionSerializer(serializers.ModelSerializer):
         }
 
 # Serializer pour le modèle Profile
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # Imbrique le UserSerializer pour afficher les détails de l'utilisateur lié (ex: username, email)
     user = UserSerializer()
 
@@ -70,6 +78,11 @@ class ProfileSerializer(serializers.ModelSerializer):
         # Le champ 'user' est en lecture seule dans ce contexte, car sa modification est gérée dans la méthode update.
         # Pour la création, on utilisera le RegisterSerializer.
         read_only_fields = ['user']
+        # Attributs lus par les champs calculés (réduction du queryset pour ?fields= / ?omit=, voir user/fieldsets.py)
+        field_sources = {
+            'role_display': ('role',),
+            'speciality_name': ('promotion.speciality.name',),
+        }
 
     def get_speciality_name(self, obj):
         # Méthode pour le SerializerMethodField. Retourne le nom de la spécialité via la promotion.
@@ -79,26 +92,38 @@ class ProfileSerializer(serializers.ModelSerializer):
 
     # Surcharge de la méthode 'update' pour gérer la mise à jour des champs du 'User' imbriqué
     # et des relations ManyToMany (assigned_specialities) qui ne sont pas gérées automatiquement par ModelSerializer.
+    # Seuls les champs réellement modifiés sont écrits : aucune requête pour un User ou des spécialités inchangés.
     def update(self, instance, validated_data):
-        # Les données du 'user' ne sont pas dans validated_data car le champ est read_only.
-        # On les récupère depuis les données initiales de la requête.
-        user_data = self.initial_data.get('user', {})
+        # Les données du 'user' sont lues dans les données initiales de la requête
+        # (le sérialiseur imbriqué les valide, mais la mise à jour est faite ici, champ par champ).
+        validated_data.pop('user', None)
+        user_data = self.initial_data.get('user') or {}
         assigned_specialities_data = validated_data.pop('assigned_specialities', None)
 
-        # Met à jour les champs du Profile en utilisant la méthode de la superclasse.
-        # Cela gère automatiquement les champs comme 'role' et 'promotion'.
-        instance = super().update(instance, validated_data)
+        # Met à jour les champs du Profile (ex: 'role' et 'promotion') qui ont changé
+        changed_fields = [field for field, value in validated_data.items() if getattr(instance, field) != value]
+        for field in changed_fields:
+            setattr(instance, field, validated_data[field])
+        if changed_fields:
+            instance.save(update_fields=changed_fields)
 
         # Met à jour les champs du User lié (s'il y en a)
         if user_data:
             user_instance = instance.user
-            user_instance.email = user_data.get('email', user_instance.email)
-            user_instance.first_name = user_data.get('first_name', user_instance.first_name)
-            user_instance.last_name = user_data.get('last_name', user_instance.last_name)
-            user_instance.save()
-        
+            changed_user_fields = [
+                field for field in ('email', 'first_name', 'last_name')
+                if field in user_data and user_data[field] != getattr(user_instance, field)
+            ]
+            for field in changed_user_fields:
+                setattr(user_instance, field, user_data[field])
+            if changed_user_fields:
+                user_instance.save(update_fields=changed_user_fields)
+
         if assigned_specialities_data is not None: # La logique de permission doit être dans la VUE
-            instance.assigned_specialities.set(assigned_specialities_data)
+            # Les spécialités actuelles sont déjà préchargées par la vue (prefetch_related)
+            current_ids = {speciality.pk for speciality in instance.assigned_specialities.all()}
+            if current_ids != {speciality.pk for speciality in assigned_specialities_data}:
+                instance.assigned_specialities.set(assigned_specialities_data)
 
         return instance
 
@@ -148,8 +173,29 @@ class RegisterSerializer(serializers.ModelSerializer):
 
         return user
 
+# Serializer pour une ligne de l'import groupé d'utilisateurs (POST /api/profiles/import/)
+# Mêmes champs que RegisterSerializer, mais sans aucun accès à la base : l'unicité des noms et des e-mails
+# et l'existence des promotions sont vérifiées pour toutes les lignes à la fois (voir user/imports.py).
+class UserImportRowSerializer(serializers.Serializer):
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    email = serializers.EmailField()
+    password = serializers.CharField(trim_whitespace=False)
+    role = serializers.ChoiceField(choices=Profile.Roles.choices)
+    first_name = serializers.CharField(max_length=150, required=False, allow_blank=True)
+    last_name = serializers.CharField(max_length=150, required=False, allow_blank=True)
+    promotion_id = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+
+# Serializer pour le relevé de notes précalculé d'un étudiant (GET /api/profiles/{id}/transcript/)
+class StudentTranscriptSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    etudiant_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = StudentTranscript
+        fields = ['etudiant_id', 'grades', 'overall_average', 'coefficient_total', 'speciality_averages', 'updated_at']
+        read_only_fields = fields
+
 # Serializer pour le modèle Cours
-class CoursSerializer(serializers.ModelSerializer):
+class CoursSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # Affiche le nom d'utilisateur du formateur lié pour la lecture
     formateur_username = serializers.CharField(source='formateur.user.username', read_only=True)
     # Champ en écriture seule pour l'ID du formateur (permet de lier un formateur existant lors de POST/PUT)
@@ -176,7 +222,8 @@ class CoursSerializer(serializers.ModelSerializer):
             'id', 'nom', 'description',
             'formateur_username', 'formateur_id', # Inclure les champs lecture et écriture
             'speciality_name', 'speciality_id',
-            'promotion_name', 'promotion_id'
+            'promotion_name', 'promotion_id',
+            'coefficient'
         ]
         # Ces champs sont définis en lecture seule car ils sont gérés via leurs ID respectifs pour la modification
         extra_kwargs = {
@@ -185,19 +232,85 @@ class CoursSerializer(serializers.ModelSerializer):
             'promotion': {'read_only': True},
         }
 
+# Message d'erreur commun aux créations de notes en double (contrainte d'unicité étudiant + cours)
+DUPLICATE_NOTE_MESSAGE = "Cet étudiant a déjà une note pour ce cours."
+
+
+def _pk_values(items, field_name):
+    # Identifiants entiers présents dans les données brutes (les valeurs invalides sont signalées par le champ)
+    values = set()
+    for item in items:
+        value = item.get(field_name) if isinstance(item, dict) else None
+        if isinstance(value, bool):
+            continue
+        try:
+            values.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    return values
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField qui cherche d'abord l'objet parmi ceux préchargés par un sérialiseur
+    de liste (attribut `preloaded` du sérialiseur parent, indexé par nom de champ puis par clé primaire) :
+    aucune requête par ligne. Sans préchargement, comportement identique à PrimaryKeyRelatedField.
+    """
+    def to_internal_value(self, data):
+        preloaded = getattr(self.parent, 'preloaded', None)
+        if preloaded is None or self.field_name not in preloaded:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return preloaded[self.field_name][pk]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+
+# Serializer de liste des notes (POST /api/grades/ avec une liste JSON).
+# Les étudiants, les cours et les notes déjà existantes de tout le lot sont lus en trois requêtes,
+# quel que soit le nombre de notes, puis les notes sont créées avec bulk_create (user/services.py).
+class NoteListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            etudiant_ids = _pk_values(data, 'etudiant_id')
+            cours_ids = _pk_values(data, 'cours_id')
+            self.child.preloaded = {
+                # select_related('user') : etudiant_username est lu dans la réponse
+                'etudiant_id': self.child.fields['etudiant_id'].get_queryset().select_related('user').in_bulk(etudiant_ids),
+                'cours_id': self.child.fields['cours_id'].get_queryset().in_bulk(cours_ids),
+            }
+            self.child.existing_pairs = set(
+                Note.objects.filter(etudiant_id__in=etudiant_ids, cours_id__in=cours_ids).values_list('etudiant_id', 'cours_id')
+            )
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        try:
+            return create_notes(validated_data)
+        except IntegrityError: # Note créée entre la validation et l'insertion
+            raise serializers.ValidationError({"non_field_errors": [DUPLICATE_NOTE_MESSAGE]})
+
+
 # Serializer pour le modèle Note
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # Affiche le nom d'utilisateur de l'étudiant, le nom du cours et le nom de celui qui a publié la note
     etudiant_username = serializers.CharField(source='etudiant.user.username', read_only=True)
     cours_nom = serializers.CharField(source='cours.nom', read_only=True)
     publie_par_username = serializers.CharField(source='publie_par.user.username', read_only=True)
 
     # Champs en écriture seule pour les IDs des relations (ce que le frontend enverra)
-    etudiant_id = serializers.PrimaryKeyRelatedField(
+    # Pour une liste de notes, les objets sont préchargés par NoteListSerializer
+    etudiant_id = PreloadedPrimaryKeyRelatedField(
         queryset=Profile.objects.filter(role='etudiant'), # Limite les choix aux profils d'étudiants
         source='etudiant', write_only=True
     )
-    cours_id = serializers.PrimaryKeyRelatedField(
+    cours_id = PreloadedPrimaryKeyRelatedField(
         queryset=Cours.objects.all(), # Tous les cours
         source='cours', write_only=True
     )
@@ -210,16 +323,74 @@ class NoteSerializer(serializers.ModelSerializer):
             'date_publication', 'publie_par_username' # publie_par_username est en lecture seule, publie_par est rempli par la vue
         ]
         read_only_fields = ['date_publication', 'publie_par_username'] # Ces champs sont gérés par le backend
+        list_serializer_class = NoteListSerializer
+        # Pas de UniqueTogetherValidator (une requête exists() par note) : voir validate, create et update
+        validators = []
 
-    # Validation personnalisée pour s'assurer qu'un étudiant n'a pas deux notes pour le même cours
+    # Un étudiant n'a qu'une note par cours. Pour une seule note, c'est la contrainte d'unicité de la base
+    # qui le garantit (voir create/update) : une vérification préalable serait une requête de plus, et
+    # ne protégerait pas contre deux créations simultanées. Pour une liste, les paires existantes sont lues
+    # en une fois par NoteListSerializer, ce qui permet de signaler chaque ligne en double.
     def validate(self, data):
-        # Cette validation s'applique seulement lors de la création d'une nouvelle note (pas lors de la modification)
-        if self.instance is None: # `self.instance` est None lors d'une création
-            etudiant = data.get('etudiant')
-            cours = data.get('cours')
-            # Vérifie si une note existe déjà pour cet étudiant et ce cours
-            if etudiant and cours and Note.objects.filter(etudiant=etudiant, cours=cours).exists():
-                raise serializers.ValidationError(
-                    {"non_field_errors": ["Cet étudiant a déjà une note pour ce cours."]}
-                )
-        return data
\ No newline at end of file
+        existing_pairs = getattr(self, 'existing_pairs', None)
+        if self.instance is None and existing_pairs is not None:
+            pair = (data['etudiant'].pk, data['cours'].pk)
+            if pair in existing_pairs:
+                raise serializers.ValidationError({"non_field_errors": [DUPLICATE_NOTE_MESSAGE]})
+            existing_pairs.add(pair) # Une seconde ligne pour la même paire dans le lot est aussi un doublon
+        return data
+
+    def create(self, validated_data):
+        try:
+            # Point de sauvegarde : la transaction en cours reste utilisable après la violation de contrainte
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError({"non_field_errors": [DUPLICATE_NOTE_MESSAGE]})
+
+    def update(self, instance, validated_data):
+        # Seul un changement d'étudiant ou de cours peut violer la contrainte (cas rare : pas de point
+        # de sauvegarde pour une simple correction de la valeur)
+        if all(validated_data.get(field, getattr(instance, field)) == getattr(instance, field) for field in ('etudiant', 'cours')):
+            return super().update(instance, validated_data)
+        try:
+            with transaction.atomic():
+                return super().update(instance, validated_data)
+        except IntegrityError: # La nouvelle paire (etudiant, cours) a déjà une note
+            raise serializers.ValidationError({"non_field_errors": [DUPLICATE_NOTE_MESSAGE]})
+
+# Serializers pour la saisie groupée des notes d'un cours (POST /api/grades/bulk/)
+# Une ligne du lot : l'étudiant et sa note. Aucune requête n'est faite ici,
+# l'existence des étudiants est vérifiée en une seule fois par la vue.
+class NoteBulkItemSerializer(serializers.Serializer):
+    etudiant_id = serializers.IntegerField()
+    valeur = serializers.DecimalField(max_digits=5, decimal_places=2)
+
+
+class NoteBulkSerializer(serializers.Serializer):
+    cours_id = serializers.PrimaryKeyRelatedField(
+        queryset=Cours.objects.select_related('speciality'), source='cours'
+    )
+    # Les lignes sont validées individuellement par la vue pour pouvoir renvoyer
+    # des erreurs ligne par ligne sans faire échouer tout le lot.
+    notes = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+
+# Serializer pour les exports de notes en arrière-plan (POST /api/grades/exports/, voir user/export_jobs.py)
+# Le client interroge status_url jusqu'au statut 'done', puis télécharge download_url.
+class ExportJobSerializer(serializers.ModelSerializer):
+    status_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = ['id', 'status', 'row_count', 'error', 'created_at', 'started_at', 'finished_at', 'status_url', 'download_url']
+        read_only_fields = fields
+
+    def get_status_url(self, obj):
+        return reverse('grade-export-detail', kwargs={'job_id': obj.pk}, request=self.context.get('request'))
+
+    def get_download_url(self, obj):
+        if obj.status != ExportJob.Status.DONE:
+            return None
+        return reverse('grade-export-download', kwargs={'job_id': obj.pk}, request=self.context.get('request'))
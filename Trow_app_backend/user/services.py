@@ -0,0 +1,95 @@
+# user/services.py
+
+# Opérations d'écriture groupées sur les notes, partagées par les différentes vues
+# (saisie groupée, import de fichiers...). Elles évitent une requête par note.
+
+from django.db import transaction
+from django.utils import timezone
+
+from .aggregates import apply_grade_changes, refresh_transcripts
+from .live import publish_grades_on_commit
+from .models import Note
+from .versioning import bump_table_version
+
+
+def upsert_notes(rows, publie_par, statuses=None):
+    """
+    Crée ou met à jour des notes en une seule transaction.
+
+    `rows` est une liste de tuples (etudiant_id, cours_id, valeur) dont les paires
+    (etudiant_id, cours_id) sont uniques. Les notes existantes sont mises à jour
+    (seule la valeur change, comme avec perform_update), les autres sont créées avec
+    `publie_par` comme auteur. Retourne un dictionnaire avec les compteurs
+    'created', 'updated' et 'unchanged'. Si `statuses` est une liste, elle reçoit le
+    statut de chaque ligne ('created', 'updated' ou 'unchanged'), dans l'ordre de `rows`.
+    """
+    counts = {'created': 0, 'updated': 0, 'unchanged': 0}
+    if not rows:
+        return counts
+
+    etudiant_ids = {etudiant_id for etudiant_id, _, _ in rows}
+    cours_ids = {cours_id for _, cours_id, _ in rows}
+
+    with transaction.atomic():
+        # Une seule requête pour récupérer toutes les notes déjà existantes du lot.
+        # select_for_update() verrouille ces lignes jusqu'à la fin de la transaction.
+        existing = {
+            (note.etudiant_id, note.cours_id): note
+            for note in Note.objects.select_for_update().filter(
+                etudiant_id__in=etudiant_ids, cours_id__in=cours_ids
+            ).only('id', 'etudiant_id', 'cours_id', 'valeur')
+        }
+
+        to_create, to_update = [], []
+        changes = [] # (cours_id, ancienne valeur, nouvelle valeur) pour les agrégats
+        for etudiant_id, cours_id, valeur in rows:
+            note = existing.get((etudiant_id, cours_id))
+            if note is None:
+                to_create.append(Note(etudiant_id=etudiant_id, cours_id=cours_id, valeur=valeur, publie_par=publie_par))
+                changes.append((cours_id, None, valeur))
+                status = 'created'
+            elif note.valeur != valeur:
+                changes.append((cours_id, note.valeur, valeur))
+                note.valeur = valeur
+                to_update.append(note)
+                status = 'updated'
+            else:
+                counts['unchanged'] += 1
+                status = 'unchanged'
+            if statuses is not None:
+                statuses.append(status)
+
+        Note.objects.bulk_create(to_create, batch_size=500)
+        # bulk_update ne renseigne pas les champs auto_now : updated_at est fixé ici (flux de synchronisation)
+        now = timezone.now()
+        for note in to_update:
+            note.updated_at = now
+        Note.objects.bulk_update(to_update, ['valeur', 'updated_at'], batch_size=500)
+        # bulk_create/bulk_update n'émettent pas de signaux : les agrégats et la version de la table sont mis à jour ici
+        apply_grade_changes(changes)
+        refresh_transcripts({note.etudiant_id for note in to_create + to_update})
+        if changes:
+            bump_table_version(Note)
+        publish_grades_on_commit(to_create, created=True)
+        publish_grades_on_commit(to_update, created=False)
+
+    counts['created'] = len(to_create)
+    counts['updated'] = len(to_update)
+    return counts
+
+
+def create_notes(notes_data, batch_size=500):
+    """
+    Crée des notes en une seule transaction, avec bulk_create. `notes_data` est une liste de dictionnaires
+    de champs de Note (ex: validated_data d'un NoteListSerializer). Retourne les notes créées.
+    Une paire (etudiant, cours) déjà notée lève IntegrityError et rien n'est créé.
+    """
+    notes = [Note(**data) for data in notes_data]
+    with transaction.atomic():
+        Note.objects.bulk_create(notes, batch_size=batch_size)
+        # bulk_create n'émet pas de signaux : les agrégats et la version de la table sont mis à jour ici
+        apply_grade_changes([(note.cours_id, None, note.valeur) for note in notes])
+        refresh_transcripts({note.etudiant_id for note in notes})
+        bump_table_version(Note)
+        publish_grades_on_commit(notes, created=True)
+    return notes
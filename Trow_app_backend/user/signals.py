@@ -0,0 +1,232 @@
+# user/signals.py
+
+# Récepteurs de signaux qui maintiennent les tables d'agrégats et les versions de tables à jour.
+# Ils sont connectés dans UserConfig.ready() (voir apps.py).
+# Les écritures groupées (bulk_create/bulk_update) n'émettent pas de signaux :
+# elles appellent directement les fonctions de user/aggregates.py.
+
+from django.contrib.auth.models import User
+from django.db.models import Q, QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .aggregates import apply_grade_changes, refresh_course_stats, refresh_transcripts
+from .live import publish_grades_on_commit
+from .models import Cours, Note, Profile, Promotion, Speciality
+from .sync import (
+    COURS_TOMBSTONE_COLUMNS, retire_cours_visibility, tombstone_cours_rows, tombstone_note_rows, tombstone_notes, touch_rows,
+)
+from .versioning import bump_table_version
+
+# Tables dont les ETag (voir user/conditional.py) et les exports en arrière-plan (voir user/export_jobs.py)
+# dépendent : toute écriture incrémente leur version
+VERSIONED_MODELS = (Speciality, Promotion, Cours, Profile, User, Note)
+
+# Champs d'un cours recopiés dans les relevés de notes
+TRANSCRIPT_COURS_FIELDS = ('nom', 'coefficient', 'speciality_id')
+# Champs d'un cours qui décident de qui le voit (user/visibility.py) : un changement écrit des traces (user/sync.py)
+VISIBILITY_COURS_FIELDS = ('formateur_id', 'speciality_id', 'promotion_id')
+
+
+def _deleted_directly(origin, model):
+    # Suppression demandée sur l'objet lui-même (ou un queryset du modèle), et non par une cascade
+    return origin is None or isinstance(origin, model) or (isinstance(origin, QuerySet) and origin.model is model)
+
+
+def _deleted_with(origin, *models):
+    # Suppression demandée sur un objet (ou un queryset) de l'un de ces modèles : la note part par cascade
+    return isinstance(origin, models) or (isinstance(origin, QuerySet) and issubclass(origin.model, models))
+
+
+def _note_tombstone_row(note_id, etudiant_id, publie_par_id, cours_id):
+    formateur_id, speciality_id = Cours.objects.filter(pk=cours_id).values_list('formateur_id', 'speciality_id').first() or (None, None)
+    return note_id, etudiant_id, publie_par_id, formateur_id, speciality_id
+
+
+@receiver(post_save, sender=Note)
+def note_saved(sender, instance, created, raw=False, **kwargs):
+    if raw: # Chargement de fixtures (loaddata) : les agrégats sont reconstruits par la commande dédiée
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+
+    if created:
+        apply_grade_changes([(instance.cours_id, None, instance.valeur)])
+    elif 'cours_id' in loaded and 'valeur' in loaded:
+        old_cours_id, old_valeur = loaded['cours_id'], loaded['valeur']
+        if old_cours_id == instance.cours_id:
+            if old_valeur != instance.valeur:
+                apply_grade_changes([(instance.cours_id, old_valeur, instance.valeur)])
+        else:
+            # La note a changé de cours
+            apply_grade_changes([(old_cours_id, old_valeur, None), (instance.cours_id, None, instance.valeur)])
+    else:
+        # Ancienne valeur inconnue (instance construite sans passer par la base) : recalcul complet du cours
+        refresh_course_stats(instance.cours_id)
+
+    # L'ancien étudiant est aussi recalculé si la note a changé d'étudiant
+    refresh_transcripts({instance.etudiant_id, loaded.get('etudiant_id', instance.etudiant_id)})
+
+    # Changement d'étudiant ou de cours : ceux qui voyaient la note à son ancienne place reçoivent sa suppression
+    old_etudiant_id, old_cours_id = loaded.get('etudiant_id', instance.etudiant_id), loaded.get('cours_id', instance.cours_id)
+    if not created and (old_etudiant_id, old_cours_id) != (instance.etudiant_id, instance.cours_id):
+        tombstone_note_rows([_note_tombstone_row(instance.pk, old_etudiant_id, loaded.get('publie_par_id', instance.publie_par_id), old_cours_id)])
+
+    # Notification en direct de l'étudiant (flux SSE, user/live.py), après la validation de la transaction
+    publish_grades_on_commit([instance], created)
+
+    # Les valeurs enregistrées deviennent la référence pour la prochaine modification
+    instance._loaded_values = {
+        **loaded, 'etudiant_id': instance.etudiant_id, 'cours_id': instance.cours_id, 'valeur': instance.valeur
+    }
+
+
+@receiver(post_delete, sender=Note)
+def note_deleted(sender, instance, origin=None, **kwargs):
+    loaded = getattr(instance, '_loaded_values', {})
+    # Cascade d'un cours : ses statistiques disparaissent avec lui, et les relevés de ses étudiants sont
+    # recalculés une seule fois après sa suppression (cours_deleted), et non une fois par note
+    if not _deleted_with(origin, Cours):
+        apply_grade_changes([(loaded.get('cours_id', instance.cours_id), loaded.get('valeur', instance.valeur), None)])
+    # Inutile de recalculer le relevé d'un étudiant dont le profil est en cours de suppression
+    if not _deleted_with(origin, Cours, Profile, User):
+        refresh_transcripts([loaded.get('etudiant_id', instance.etudiant_id)])
+    # Les suppressions par cascade (cours, profil) ont déjà leurs traces (récepteurs pre_delete ci-dessous)
+    if _deleted_directly(origin, Note):
+        tombstone_note_rows([_note_tombstone_row(instance.pk, instance.etudiant_id, instance.publie_par_id, instance.cours_id)])
+
+
+@receiver(post_save, sender=Cours)
+def cours_saved(sender, instance, created, raw=False, **kwargs):
+    loaded = getattr(instance, '_loaded_values', None)
+    if raw:
+        return
+    if created:
+        # Valeurs de référence pour la prochaine modification de cette instance
+        instance._loaded_values = {field: getattr(instance, field) for field in TRANSCRIPT_COURS_FIELDS + VISIBILITY_COURS_FIELDS}
+        return
+    # Le nom, le coefficient ou la spécialité d'un cours figurent dans les relevés de ses étudiants
+    if loaded is None or any(loaded.get(field) != getattr(instance, field) for field in TRANSCRIPT_COURS_FIELDS):
+        refresh_transcripts(instance.notes_du_cours.values_list('etudiant_id', flat=True))
+    # Le nom du cours est recopié dans ses notes (cours_nom) : le flux de synchronisation doit les renvoyer
+    if loaded is not None and 'nom' in loaded and loaded['nom'] != instance.nom:
+        touch_rows(notes=instance.notes_du_cours.all())
+    # Nouveau formateur, spécialité ou promotion : traces pour ceux qui voyaient le cours et ses notes
+    if loaded is not None and all(field in loaded for field in VISIBILITY_COURS_FIELDS) and any(
+        loaded[field] != getattr(instance, field) for field in VISIBILITY_COURS_FIELDS
+    ):
+        retire_cours_visibility([(instance.pk, *(loaded[field] for field in VISIBILITY_COURS_FIELDS))], touch_cours=False)
+    instance._loaded_values = {
+        **(loaded or {}), **{field: getattr(instance, field) for field in TRANSCRIPT_COURS_FIELDS + VISIBILITY_COURS_FIELDS}
+    }
+
+
+@receiver(post_save, sender=Speciality)
+def speciality_saved(sender, instance, created, raw=False, **kwargs):
+    # Le nom de la spécialité figure dans les relevés (rare : quelques fois par an)
+    if raw or created:
+        return
+    refresh_transcripts(Note.objects.filter(cours__speciality=instance).values_list('etudiant_id', flat=True).distinct())
+    touch_rows(cours=Cours.objects.filter(speciality=instance)) # speciality_name des cours synchronisés
+
+
+@receiver(post_save, sender=Promotion)
+def promotion_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    touch_rows(cours=Cours.objects.filter(promotion=instance)) # promotion_name des cours synchronisés
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Ancien nom d'utilisateur, comparé après l'enregistrement (user_saved)
+    if raw or instance.pk is None or (update_fields is not None and 'username' not in update_fields):
+        return
+    instance._saved_username = User.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    old_username = vars(instance).pop('_saved_username', None)
+    if raw or created or old_username is None or old_username == instance.username:
+        return
+    # Le nom d'utilisateur est recopié dans les notes (etudiant_username, publie_par_username) et les cours
+    # (formateur_username) : le flux de synchronisation doit les renvoyer
+    touch_rows(
+        notes=Note.objects.filter(Q(etudiant__user=instance) | Q(publie_par__user=instance)),
+        cours=Cours.objects.filter(formateur__user=instance),
+    )
+
+
+def versioned_model_saved(sender, update_fields=None, **kwargs):
+    # La connexion d'un utilisateur ne met à jour que last_login, qui n'apparaît dans aucune réponse
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    bump_table_version(sender)
+
+
+def versioned_model_deleted(sender, origin=None, **kwargs):
+    # Notes supprimées par la cascade d'un cours : une seule incrémentation, dans cours_deleted
+    if sender is Note and _deleted_with(origin, Cours):
+        return
+    bump_table_version(sender)
+
+
+for versioned_model in VERSIONED_MODELS:
+    post_save.connect(versioned_model_saved, sender=versioned_model, dispatch_uid=f'version_save_{versioned_model._meta.label_lower}')
+    post_delete.connect(versioned_model_deleted, sender=versioned_model, dispatch_uid=f'version_delete_{versioned_model._meta.label_lower}')
+
+
+@receiver(m2m_changed, sender=Profile.assigned_specialities.through)
+def assigned_specialities_changed(sender, action, **kwargs):
+    # Les spécialités assignées d'un formateur changent les cours qu'il voit
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_table_version(Profile)
+
+
+# Traces de suppression pour le flux de synchronisation (user/sync.py). Les cascades sont tracées avant la
+# suppression, en une requête groupée par objet supprimé (et non une par note supprimée par la cascade).
+
+@receiver(pre_delete, sender=Cours)
+def cours_deleting(sender, instance, **kwargs):
+    rows = tombstone_notes(Note.objects.filter(cours_id=instance.pk)) # Supprimées par cascade
+    instance._transcript_etudiant_ids = {etudiant_id for _, etudiant_id, *_ in rows}
+
+
+@receiver(post_delete, sender=Cours)
+def cours_deleted(sender, instance, **kwargs):
+    tombstone_cours_rows([(instance.pk, instance.formateur_id, instance.speciality_id, instance.promotion_id)])
+    # Relevés des étudiants notés dans ce cours, en une fois (voir note_deleted et versioned_model_deleted)
+    etudiant_ids = getattr(instance, '_transcript_etudiant_ids', ())
+    if etudiant_ids:
+        bump_table_version(Note)
+        refresh_transcripts(etudiant_ids)
+
+
+@receiver(pre_delete, sender=Profile)
+def profile_deleting(sender, instance, **kwargs):
+    tombstone_notes(Note.objects.filter(etudiant_id=instance.pk)) # Notes reçues : supprimées par cascade
+    # Cours enseignés : le formateur devient NULL, ceux qui les voyaient par lui ne les voient plus
+    retire_cours_visibility(list(Cours.objects.filter(formateur_id=instance.pk).values_list(*COURS_TOMBSTONE_COLUMNS)))
+    # Notes publiées : l'auteur devient NULL (publie_par_username change)
+    if Note.objects.filter(publie_par_id=instance.pk).update(updated_at=timezone.now()):
+        bump_table_version(Note)
+
+
+@receiver(pre_delete, sender=Speciality)
+def speciality_deleting(sender, instance, **kwargs):
+    retire_cours_visibility(list(Cours.objects.filter(speciality_id=instance.pk).values_list(*COURS_TOMBSTONE_COLUMNS)))
+    # Les cours restent (spécialité mise à NULL) : le nom de la spécialité est retiré des relevés après la suppression
+    instance._transcript_etudiant_ids = set(
+        Note.objects.filter(cours__speciality_id=instance.pk).order_by().values_list('etudiant_id', flat=True).distinct()
+    )
+
+
+@receiver(post_delete, sender=Speciality)
+def speciality_deleted(sender, instance, **kwargs):
+    refresh_transcripts(getattr(instance, '_transcript_etudiant_ids', ()))
+
+
+@receiver(pre_delete, sender=Promotion)
+def promotion_deleting(sender, instance, **kwargs):
+    retire_cours_visibility(list(Cours.objects.filter(promotion_id=instance.pk).values_list(*COURS_TOMBSTONE_COLUMNS)))
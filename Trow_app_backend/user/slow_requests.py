@@ -0,0 +1,176 @@
+# user/slow_requests.py
+
+# Journal des requêtes lentes (SLOW_REQUEST_LOG = True dans settings.py). Toute requête plus longue que
+# SLOW_REQUEST_THRESHOLD_MS est retenue (avec la probabilité SLOW_REQUEST_SAMPLE_RATE, pour borner le volume
+# les jours de forte charge) avec sa vue, son action, le rôle de l'appelant, ses requêtes SQL et le plan
+# d'exécution (EXPLAIN) de la plus lente. Les mesures viennent du middleware de user/profiling.py.
+#
+# Une ligne JSON par requête, ajoutée à SLOW_REQUEST_LOG_FILE (fichier tournant : SLOW_REQUEST_LOG_MAX_BYTES,
+# SLOW_REQUEST_LOG_BACKUPS anciens fichiers). Le plan est calculé et la ligne écrite par un thread dédié,
+# après la réponse : la requête lente ne l'est pas davantage. Le plan est celui d'EXPLAIN ANALYZE sur
+# PostgreSQL pour une lecture (une écriture n'est pas réexécutée : EXPLAIN seul), EXPLAIN QUERY PLAN sur SQLite.
+# Les paramètres des requêtes SQL servent au plan mais ne sont pas écrits dans le journal (données personnelles,
+# mots de passe chiffrés) : le journal contient le texte des requêtes avec leurs marqueurs %s.
+# Synthèse : python manage.py slow_requests_report
+#
+# Chaque processus écrit dans son propre gestionnaire : avec plusieurs processus, donner à chacun son fichier
+# (la rotation n'est pas coordonnée entre processus).
+
+import json
+import logging
+import random
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+# Requêtes SQL écrites dans une ligne du journal (les plus lentes), en plus du nombre total
+LOGGED_STATEMENTS = 20
+# Verrous de ligne (select_for_update) : la requête est expliquée sans ANALYZE, qui poserait les verrous
+LOCKING_CLAUSE = re.compile(r'\bFOR\s+(?:NO\s+KEY\s+)?UPDATE\b|\bFOR\s+(?:KEY\s+)?SHARE\b')
+
+_logger = None
+_executor = None
+_pending = []
+_pending_lock = threading.Lock()
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        path = Path(settings.SLOW_REQUEST_LOG_FILE)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            path, maxBytes=settings.SLOW_REQUEST_LOG_MAX_BYTES, backupCount=settings.SLOW_REQUEST_LOG_BACKUPS,
+            encoding='utf-8',
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger = logging.getLogger('trow.slow_requests')
+        logger.setLevel(logging.INFO)
+        logger.propagate = False # Pas de JSON dans les journaux de la console
+        logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+def close_log():
+    """Ferme le fichier du journal (changement de SLOW_REQUEST_LOG_FILE, tests)."""
+    global _logger
+    if _logger is not None:
+        for handler in list(_logger.handlers):
+            _logger.removeHandler(handler)
+            handler.close()
+        _logger = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-requests')
+    return _executor
+
+
+def wait_for_pending():
+    """Attend l'écriture des lignes en cours (tests, arrêt du processus)."""
+    with _pending_lock:
+        pending = list(_pending)
+    for future in pending:
+        future.result()
+
+
+def normalize_sql(sql):
+    """Forme générique d'une requête : listes IN réduites, nombres remplacés, espaces normalisés."""
+    sql = re.sub(r'IN \((?:%s(?:, )?)+\)', 'IN (...)', sql)
+    sql = re.sub(r'\b\d+\b', '?', sql)
+    return ' '.join(sql.split())
+
+
+def is_read_only(sql):
+    """Lecture sans verrou : SELECT (ou WITH) sans FOR UPDATE / FOR SHARE, que ANALYZE peut réexécuter."""
+    sql = sql.lstrip().upper()
+    return sql.startswith(('SELECT', 'WITH')) and not LOCKING_CLAUSE.search(sql)
+
+
+def explain(statement):
+    """(préfixe, lignes du plan) de l'instruction (durée, sql, paramètres, alias, executemany)."""
+    _, sql, params, alias, many = statement
+    connection = connections[alias]
+    if many or not connection.features.supports_explaining_query_execution:
+        return None, []
+    # ANALYZE réexécute l'instruction : seulement pour une lecture, et sur PostgreSQL (SQLite ne l'a pas)
+    options = {'analyze': True} if is_read_only(sql) and connection.vendor == 'postgresql' else {}
+    prefix = connection.ops.explain_query_prefix(**options)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}', params)
+        # Une ligne de texte par nœud sur PostgreSQL ; (id, parent, -, détail) sur SQLite
+        return prefix, [str(row[-1]) for row in cursor.fetchall()]
+
+
+def build_entry(request, response, profile, view_name, total):
+    view, _, action = view_name.partition('.')
+    statements = sorted(profile.statements, key=lambda statement: statement[0], reverse=True)
+    return {
+        'time': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': view,
+        'action': action or None,
+        'role': profile.role,
+        'status': response.status_code,
+        'duration_ms': round(total * 1000, 2),
+        'sql_count': profile.sql_count,
+        'sql_ms': round(profile.phases['sql'] * 1000, 2),
+        'phases_ms': {phase: round(seconds * 1000, 2) for phase, seconds in profile.phases.items() if phase != 'sql'},
+        'statements': [
+            {'sql': sql, 'duration_ms': round(elapsed * 1000, 2)} for elapsed, sql, _, _, _ in statements[:LOGGED_STATEMENTS]
+        ],
+    }
+
+
+def write_entry(entry, slowest):
+    """Ajoute le plan de la requête SQL la plus lente et écrit la ligne (thread du journal)."""
+    try:
+        if slowest is not None:
+            elapsed, sql = slowest[0], slowest[1]
+            entry['slowest'] = {'sql': sql, 'duration_ms': round(elapsed * 1000, 2)}
+            try:
+                entry['slowest']['explain'], entry['slowest']['plan'] = explain(slowest)
+            except Exception as error: # Table supprimée depuis, paramètres non réutilisables...
+                entry['slowest']['plan_error'] = f"{type(error).__name__}: {error}"
+        _get_logger().info(json.dumps(entry, ensure_ascii=False, default=str))
+    finally:
+        connections.close_all() # Connexions propres à ce thread : elles ne sont fermées par aucun cycle de requête
+
+
+def sample_request(request, response, profile, view_name, total):
+    """Appelé par ProfilingMiddleware à la fin de chaque requête : retient les requêtes lentes échantillonnées."""
+    if total * 1000 < settings.SLOW_REQUEST_THRESHOLD_MS or random.random() >= settings.SLOW_REQUEST_SAMPLE_RATE:
+        return
+    entry = build_entry(request, response, profile, view_name, total)
+    future = _get_executor().submit(write_entry, entry, profile.slowest)
+    with _pending_lock:
+        _pending[:] = [pending for pending in _pending if not pending.done()] + [future]
+
+
+def read_entries(path):
+    """Lignes du journal et de ses anciens fichiers (path.1, path.2...), des plus anciennes aux plus récentes."""
+    path = Path(path)
+    backups = [backup for backup in path.parent.glob(path.name + '.*') if backup.suffix[1:].isdigit()]
+    # RotatingFileHandler : path.1 est le plus récent des anciens fichiers
+    backups.sort(key=lambda backup: int(backup.suffix[1:]), reverse=True)
+    for file_path in [*backups, path]:
+        if not file_path.exists():
+            continue
+        with open(file_path, encoding='utf-8') as log_file:
+            for line in log_file:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue # Ligne tronquée (processus arrêté pendant l'écriture)
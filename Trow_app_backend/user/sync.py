@@ -0,0 +1,256 @@
+# user/sync.py
+
+# Flux de synchronisation incrémentale pour l'application mobile : GET /api/sync/?since=<jeton> renvoie
+# les notes et les cours créés, modifiés ou supprimés depuis le jeton, dans le périmètre de visibilité de
+# l'appelant (user/visibility.py), avec un nouveau jeton. Sans jeton (ou si le jeton ne peut plus servir),
+# la réponse contient toutes les lignes visibles et reset = true : le client remplace ses données.
+#
+# Les lignes créées ou modifiées sont envoyées par pages de SYNC_PAGE_SIZE (par table, dans l'ordre des
+# identifiants) : tant que has_more = true, le jeton renvoyé est un jeton de suite, à renvoyer tel quel pour
+# la page suivante. Les suppressions sont toutes dans la première page. Pour une synchronisation complète,
+# reset = true n'est indiqué que sur la première page : le client vide ses données puis applique chaque page.
+#
+# Le jeton est signé (django.core.signing, SECRET_KEY) : un jeton modifié ou forgé est refusé. Il contient :
+# - l'instant de la synchronisation : les lignes suivantes sont celles dont updated_at (ou deleted_at pour
+#   les traces de suppression) est postérieur, moins SYNC_OVERLAP_SECONDS. Une transaction en cours au
+#   moment de la lecture peut être validée plus tard avec un updated_at antérieur : la marge la rattrape
+#   au passage suivant. Une ligne peut donc être renvoyée deux fois : le client l'applique par identifiant ;
+# - les versions des tables Note et Cours (user/versioning.py) : si aucune n'a changé, rien n'a changé,
+#   et la réponse est construite sans lire d'autre table (une requête de clé primaire sur TableVersion) ;
+# - une empreinte du périmètre de visibilité : si l'appelant voit d'autres lignes qu'avant (nouvelle
+#   spécialité assignée, changement de promotion), la synchronisation repart de zéro ;
+# - pour un jeton de suite : le début de la fenêtre (ou rien pour une synchronisation complète) et les
+#   derniers identifiants de note et de cours envoyés. L'instant et les versions sont ceux de la première
+#   page : une ligne modifiée pendant la pagination est renvoyée au passage suivant.
+#
+# Suppressions : une trace (Tombstone) est écrite pour chaque note ou cours supprimé, y compris par
+# cascade (suppression d'un cours ou d'un profil), et pour chaque ligne qui sort du périmètre de certains
+# appelants (cours changé de spécialité, note changée d'étudiant...) : ces appelants reçoivent sa suppression,
+# les autres la ligne modifiée. Les traces sont conservées SYNC_TOMBSTONE_RETENTION_DAYS jours
+# (python manage.py purge_tombstones) ; un jeton plus ancien repart de zéro.
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from .models import Cours, Note, Tombstone
+from .versioning import bump_table_version, get_table_versions
+from .visibility import cours_scope, notes_scope, visible_cours, visible_notes, visible_tombstones
+
+# Sel de signature des jetons (distinct des autres usages de SECRET_KEY)
+TOKEN_SALT = 'user.sync.token'
+
+# Tables dont les lignes sont synchronisées : toute écriture (suppressions comprises) incrémente leur version
+SYNC_VERSION_MODELS = (Note, Cours)
+
+# Colonnes de visibilité recopiées sur la trace d'une note (les règles de visible_notes)
+NOTE_TOMBSTONE_COLUMNS = ('id', 'etudiant_id', 'publie_par_id', 'cours__formateur_id', 'cours__speciality_id')
+# Colonnes de visibilité recopiées sur la trace d'un cours (les règles de cours_filter)
+COURS_TOMBSTONE_COLUMNS = ('id', 'formateur_id', 'speciality_id', 'promotion_id')
+
+
+# --- Traces de suppression ---
+
+def _note_tombstones(rows):
+    return [
+        Tombstone(
+            kind=Tombstone.Kinds.NOTE, object_id=note_id, etudiant_id=etudiant_id, publie_par_id=publie_par_id,
+            formateur_id=formateur_id, speciality_id=speciality_id,
+        )
+        for note_id, etudiant_id, publie_par_id, formateur_id, speciality_id in rows
+    ]
+
+
+def _cours_tombstones(rows):
+    return [
+        Tombstone(
+            kind=Tombstone.Kinds.COURS, object_id=cours_id,
+            formateur_id=formateur_id, speciality_id=speciality_id, promotion_id=promotion_id,
+        )
+        for cours_id, formateur_id, speciality_id, promotion_id in rows
+    ]
+
+
+def tombstone_note_rows(rows):
+    """Écrit les traces de notes à partir de lignes NOTE_TOMBSTONE_COLUMNS."""
+    Tombstone.objects.bulk_create(_note_tombstones(rows), batch_size=500)
+
+
+def tombstone_notes(queryset):
+    """
+    Écrit les traces des notes d'un queryset (avant leur suppression) : une lecture et une insertion groupée.
+    Retourne les lignes NOTE_TOMBSTONE_COLUMNS lues.
+    """
+    rows = list(queryset.order_by().values_list(*NOTE_TOMBSTONE_COLUMNS))
+    tombstone_note_rows(rows)
+    return rows
+
+
+def tombstone_cours_rows(rows):
+    """Écrit les traces de cours à partir de lignes COURS_TOMBSTONE_COLUMNS."""
+    Tombstone.objects.bulk_create(_cours_tombstones(rows), batch_size=500)
+
+
+def retire_cours_visibility(rows, touch_cours=True):
+    """
+    Des cours changent de formateur, de spécialité ou de promotion (modification, ou mise à NULL par la
+    suppression de l'objet lié). `rows` : leurs colonnes COURS_TOMBSTONE_COLUMNS AVANT le changement.
+    Les appelants qui voyaient ces cours (et leurs notes) reçoivent leur suppression, les autres les
+    reçoivent comme modifiés : traces avec les anciennes colonnes, puis updated_at mis à jour
+    (`touch_cours` : faux si les cours viennent d'être enregistrés, updated_at est déjà à jour).
+    """
+    old_columns = {cours_id: (formateur_id, speciality_id) for cours_id, formateur_id, speciality_id, _ in rows}
+    if not old_columns:
+        return
+    notes = Note.objects.filter(cours_id__in=old_columns).order_by()
+    note_rows = [
+        (note_id, etudiant_id, publie_par_id, *old_columns[cours_id])
+        for note_id, etudiant_id, publie_par_id, cours_id in notes.values_list('id', 'etudiant_id', 'publie_par_id', 'cours_id')
+    ]
+    Tombstone.objects.bulk_create(_cours_tombstones(rows) + _note_tombstones(note_rows), batch_size=500)
+    # QuerySet.update n'émet pas de signaux : les versions des tables sont incrémentées ici
+    now = timezone.now()
+    if touch_cours:
+        Cours.objects.filter(pk__in=old_columns).update(updated_at=now)
+        bump_table_version(Cours)
+    if note_rows:
+        notes.update(updated_at=now)
+        bump_table_version(Note)
+
+
+def touch_rows(notes=None, cours=None):
+    """
+    Un champ recopié par les sérialiseurs depuis une autre table a changé (nom d'utilisateur, nom du cours,
+    de la spécialité ou de la promotion) : updated_at des notes et des cours concernés est mis à jour et la
+    version de leur table incrémentée, pour que le flux les renvoie.
+    """
+    now = timezone.now()
+    for model, queryset in ((Note, notes), (Cours, cours)):
+        # QuerySet.update n'émet pas de signaux : les versions des tables sont incrémentées ici
+        if queryset is not None and queryset.update(updated_at=now):
+            bump_table_version(model)
+
+
+def purge_tombstones(days=None):
+    """Supprime les traces plus anciennes que la durée de conservation. Retourne le nombre de traces supprimées."""
+    days = settings.SYNC_TOMBSTONE_RETENTION_DAYS if days is None else days
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
+
+
+# --- Jetons ---
+
+class InvalidSyncToken(ValueError):
+    """Le jeton de synchronisation n'a pas été émis par ce serveur (signature invalide) ou est mal formé."""
+
+
+def _scope_fingerprint(principal):
+    payload = json.dumps([notes_scope(principal), cours_scope(principal)], separators=(',', ':'))
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def encode_token(timestamp, versions, scope, page=None):
+    """
+    `versions` : paires (table, version). `page` : (début de la fenêtre ou None, dernière note, dernier cours)
+    pour un jeton de suite.
+    """
+    payload = {'t': timestamp.isoformat(), 'v': [[label, version] for label, version in versions], 's': scope}
+    if page is not None:
+        since, last_note_id, last_cours_id = page
+        payload['p'] = [since.isoformat() if since else None, last_note_id, last_cours_id]
+    return signing.dumps(payload, salt=TOKEN_SALT, compress=True)
+
+
+def _parse_datetime(value):
+    value = datetime.fromisoformat(value)
+    if timezone.is_naive(value):
+        raise ValueError(value)
+    return value
+
+
+def decode_token(token):
+    """Retourne (instant, versions, empreinte du périmètre, page ou None) ; lève InvalidSyncToken."""
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT)
+        timestamp = _parse_datetime(payload['t'])
+        versions = [(label, version) for label, version in payload['v']]
+        scope = payload['s']
+        page = payload.get('p')
+        if page is not None:
+            since, last_note_id, last_cours_id = page
+            page = (None if since is None else _parse_datetime(since), int(last_note_id), int(last_cours_id))
+    except (signing.BadSignature, ValueError, TypeError, KeyError, AttributeError):
+        raise InvalidSyncToken("Jeton de synchronisation invalide.")
+    return timestamp, versions, scope, page
+
+
+# --- Changements ---
+
+def sync_changes(principal, token=None, notes_queryset=None, cours_queryset=None, page_size=None):
+    """
+    Changements visibles par l'appelant depuis `token` (None : synchronisation complète). Retourne un
+    dictionnaire : token, reset, has_more, notes et cours (listes des lignes créées ou modifiées de cette
+    page, ou None si rien n'a changé), deleted_notes et deleted_cours (identifiants). Les querysets de base
+    permettent à la vue de choisir les jointures de ses sérialiseurs.
+    """
+    page_size = settings.SYNC_PAGE_SIZE if page_size is None else page_size
+    now = timezone.now() # Avant toute lecture : une écriture validée pendant la lecture sera revue au passage suivant
+    versions = [(label, version) for label, version, _ in get_table_versions(SYNC_VERSION_MODELS)]
+    scope = _scope_fingerprint(principal)
+
+    since, page = None, None
+    if token:
+        timestamp, token_versions, token_scope, page = decode_token(token)
+        retention_start = now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+        if token_scope != scope or timestamp <= retention_start:
+            page = None
+        elif page is not None:
+            # Jeton de suite : même fenêtre, même instant et mêmes versions que la première page
+            now, versions, since = timestamp, token_versions, page[0]
+        elif token_versions == versions:
+            # Aucune écriture sur les notes ni les cours depuis le jeton
+            return {
+                'token': encode_token(now, versions, scope), 'reset': False, 'has_more': False,
+                'notes': None, 'cours': None, 'deleted_notes': [], 'deleted_cours': [],
+            }
+        else:
+            since = timestamp - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+    last_note_id, last_cours_id = page[1:] if page is not None else (0, 0)
+
+    notes = visible_notes(principal, Note.objects.all() if notes_queryset is None else notes_queryset)
+    cours = visible_cours(principal, Cours.objects.all() if cours_queryset is None else cours_queryset)
+    deleted = {Tombstone.Kinds.NOTE: [], Tombstone.Kinds.COURS: []}
+    if since is not None:
+        notes = notes.filter(updated_at__gte=since)
+        cours = cours.filter(updated_at__gte=since)
+    if since is not None and page is None:
+        tombstones = visible_tombstones(principal, Tombstone.objects.filter(deleted_at__gte=since))
+        for kind, object_id in tombstones.order_by('deleted_at').values_list('kind', 'object_id'):
+            deleted[kind].append(object_id)
+        # Une ligne sortie du périmètre d'autres appelants reste visible pour celui-ci : elle est modifiée, pas supprimée
+        for kind, queryset in ((Tombstone.Kinds.NOTE, notes), (Tombstone.Kinds.COURS, cours)):
+            if deleted[kind]:
+                still_visible = set(queryset.filter(pk__in=deleted[kind]).values_list('pk', flat=True))
+                deleted[kind] = [object_id for object_id in deleted[kind] if object_id not in still_visible]
+
+    # Une ligne de plus que la taille de page permet de savoir s'il reste des lignes
+    notes = list(notes.filter(pk__gt=last_note_id).order_by('pk')[:page_size + 1])
+    cours = list(cours.filter(pk__gt=last_cours_id).order_by('pk')[:page_size + 1])
+    has_more = len(notes) > page_size or len(cours) > page_size
+    notes, cours = notes[:page_size], cours[:page_size]
+    next_page = None
+    if has_more:
+        next_page = (since, notes[-1].pk if notes else last_note_id, cours[-1].pk if cours else last_cours_id)
+    return {
+        'token': encode_token(now, versions, scope, next_page),
+        'reset': since is None and page is None,
+        'has_more': has_more,
+        'notes': notes,
+        'cours': cours,
+        'deleted_notes': list(dict.fromkeys(deleted[Tombstone.Kinds.NOTE])),
+        'deleted_cours': list(dict.fromkeys(deleted[Tombstone.Kinds.COURS])),
+    }
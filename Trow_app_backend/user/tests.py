@@ -1,3 +1,1900 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import json
+import os
+import re
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.db.models import Q
+from django.db.models.query import QuerySet, ValuesListIterable
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import async_views, export_jobs, password_pool
+from .aggregates import compute_course_stats
+from .export_jobs import request_export, run_export_job
+from .exports import CSV_HEADER, iter_notes_csv
+from .live import broker
+from .models import Profile, Cours, CourseGradeStats, ExportJob, Note, Speciality, StudentTranscript, Promotion
+from .pagination import CoursPagination, NotePagination
+from .password_pool import hash_passwords
+from .principal import build_principal
+from .profiling import LatencyHistogram, registry
+from .renderers import ColumnarJSONRenderer, from_columnar, to_columnar
+from .response_cache import get_cache_stats, get_response_cache
+from .services import create_notes, upsert_notes
+from .slow_requests import close_log, is_read_only, read_entries, wait_for_pending
+from .visibility import visible_cours, visible_notes
+
+
+# Jeu de données minimal commun aux tests de l'API
+class ApiTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.speciality = Speciality.objects.create(name='Développement Web')
+        cls.other_speciality = Speciality.objects.create(name='Réseaux')
+        cls.promotion = Promotion.objects.create(name='Promo 2025', year=2025, speciality=cls.speciality)
+
+        cls.admin = cls.create_profile('admin', Profile.Roles.ADMIN)
+        cls.trainer = cls.create_profile('formateur', Profile.Roles.FORMATEUR)
+        cls.trainer.assigned_specialities.add(cls.speciality, cls.other_speciality)
+        cls.students = [
+            cls.create_profile(f'etudiant{i}', Profile.Roles.ETUDIANT, promotion=cls.promotion) for i in range(3)
+        ]
+
+        cls.cours = Cours.objects.create(
+            nom='Django', speciality=cls.speciality, promotion=cls.promotion, formateur=cls.trainer
+        )
+        cls.note = Note.objects.create(etudiant=cls.students[0], cours=cls.cours, valeur=12, publie_par=cls.trainer)
+
+    def setUp(self):
+        # Le cache des réponses survit aux transactions annulées entre les tests
+        get_response_cache().clear()
+
+    @classmethod
+    def create_profile(cls, username, role, **kwargs):
+        user = User.objects.create_user(username, f'{username}@example.com', 'motdepasse')
+        return Profile.objects.create(user=user, role=role, **kwargs)
+
+    def authenticate(self, profile):
+        # Authentification JWT réelle, comme le client Flutter
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(profile.user)}')
+
+
+# Le profil, le rôle et les spécialités de l'appelant sont chargés une seule fois par requête
+# (user/principal.py), quel que soit le nombre de classes de permission et de vérifications.
+class PrincipalQueryCountTests(ApiTestCase):
+    def assert_profile_loaded_once(self, method, url, data=None, expected_status=200):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertEqual(response.status_code, expected_status, response.content)
+        profile_queries = [q['sql'] for q in context.captured_queries if 'FROM "user_profile"' in q['sql']]
+        speciality_queries = [q['sql'] for q in context.captured_queries if 'FROM "user_speciality"' in q['sql']]
+        self.assertEqual(len(profile_queries), 1, profile_queries)
+        self.assertEqual(len([q for q in speciality_queries if 'user_profile_assigned_specialities' in q]), 0)
+        return context
+
+    def test_trainer_course_update(self):
+        self.authenticate(self.trainer)
+        # Avant : 13 requêtes (profil relu par la permission, spécialités assignées relues deux fois)
+        # dont 1 pour incrémenter la version de la table des cours (ETag).
+        # +4 pour la synchronisation (le cours change de spécialité) : notes du cours, traces de suppression,
+        # updated_at des notes et version de la table des notes
+        with self.assertNumQueries(15):
+            self.assert_profile_loaded_once('patch', f'/api/v1/courses/{self.cours.pk}/', {'speciality_id': self.other_speciality.pk})
+
+    def test_trainer_course_create(self):
+        self.authenticate(self.trainer)
+        # Avant : 6 requêtes, sans la version de la table des cours
+        with self.assertNumQueries(6):
+            self.assert_profile_loaded_once('post', '/api/v1/courses/', {'nom': 'Flutter', 'speciality_id': self.speciality.pk}, 201)
+
+    def test_trainer_note_update(self):
+        self.authenticate(self.trainer)
+        # Avant : 17 requêtes (dont la maintenance des agrégats de notes) ; +1 pour la version de la table des notes
+        with self.assertNumQueries(15):
+            self.assert_profile_loaded_once('patch', f'/api/v1/grades/{self.note.pk}/', {'valeur': '15'})
+
+    def test_trainer_lists(self):
+        self.authenticate(self.trainer)
+        # Utilisateur, principal, liste : les spécialités ne sont plus une sous-requête de la liste
+        # (+ les versions des tables pour l'ETag des cours)
+        with self.assertNumQueries(4):
+            self.assert_profile_loaded_once('get', '/api/v1/courses/')
+        with self.assertNumQueries(3):
+            self.assert_profile_loaded_once('get', '/api/v1/grades/')
+
+    def test_read_only_endpoint_does_not_load_profile(self):
+        self.authenticate(self.admin)
+        # IsAuthenticated n'a pas besoin du profil : le principal n'est construit qu'à la demande
+        # Utilisateur, version de la table (ETag), liste
+        with self.assertNumQueries(3):
+            self.client.get('/api/v1/specialities/')
+
+
+
+
+# Liste et mise à jour des profils : nombre de requêtes fixe, aucune écriture inutile
+class ProfileQueryTests(ApiTestCase):
+    def add_profiles(self, count):
+        for i in range(count):
+            trainer = self.create_profile(f'formateur{self.id_offset + i}', Profile.Roles.FORMATEUR)
+            trainer.assigned_specialities.add(self.speciality)
+            self.create_profile(f'etudiant_promo{self.id_offset + i}', Profile.Roles.ETUDIANT, promotion=self.promotion)
+        self.id_offset += count
+
+    def setUp(self):
+        super().setUp()
+        self.id_offset = 0
+        self.authenticate(self.admin)
+
+    def test_list_query_count_does_not_grow(self):
+        self.add_profiles(2)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/api/v1/profiles/')
+        self.add_profiles(10)
+        # Utilisateur, principal, profils (avec utilisateur, promotion, spécialité), spécialités assignées
+        with self.assertNumQueries(len(small.captured_queries)):
+            response = self.client.get('/api/v1/profiles/')
+        self.assertEqual(len(small.captured_queries), 4)
+        self.assertEqual(len(response.json()['results']), 29)
+
+    def test_unchanged_update_writes_nothing(self):
+        data = {
+            'user': {'email': 'formateur@example.com'},
+            'assigned_specialities_ids': [self.speciality.pk, self.other_speciality.pk],
+        }
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(f'/api/v1/profiles/{self.trainer.pk}/', data, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        writes = [q['sql'] for q in context.captured_queries if not q['sql'].startswith('SELECT')]
+        self.assertEqual(writes, [])
+
+    def test_update_writes_changed_columns_only(self):
+        data = {'user': {'first_name': 'Alice'}, 'assigned_specialities_ids': [self.speciality.pk]}
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(f'/api/v1/profiles/{self.trainer.pk}/', data, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        user_updates = [q['sql'] for q in context.captured_queries if q['sql'].startswith('UPDATE "auth_user"')]
+        self.assertEqual(len(user_updates), 1)
+        self.assertNotIn('"email"', user_updates[0])
+        self.assertEqual([s['id'] for s in response.json()['assigned_specialities']], [self.speciality.pk])
+
+
+
+# Import groupé d'utilisateurs (user/imports.py)
+class UserImportTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.authenticate(self.admin)
+
+    def test_csv_import(self):
+        content = (
+            'username,email,password,role,first_name,last_name,promotion_id\n'
+            + ''.join(f'nouveau{i},nouveau{i}@example.com,secret{i},etudiant,Prénom,Nom,{self.promotion.pk}\n' for i in range(20))
+            + 'formateur2,formateur2@example.com,secret,formateur,,,\n'
+        )
+        upload = SimpleUploadedFile('rentree.csv', content.encode('utf-8-sig'), content_type='text/csv')
+        # Utilisateur, principal, unicité, promotions, insertion des utilisateurs, des profils, versions des tables
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/v1/profiles/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['created'], 21)
+        self.assertLess(len(context.captured_queries), 15)
+
+        student = Profile.objects.select_related('user').get(user__username='nouveau3')
+        self.assertEqual((student.role, student.promotion_id, student.user.first_name), ('etudiant', self.promotion.pk, 'Prénom'))
+        self.assertTrue(student.user.check_password('secret3'))
+        self.assertIsNone(Profile.objects.get(user__username='formateur2').promotion_id)
+
+    def test_all_rows_validated_before_any_write(self):
+        users = [
+            {'username': 'ok1', 'email': 'ok1@example.com', 'password': 'x', 'role': 'etudiant'},
+            {'username': 'etudiant0', 'email': 'autre@example.com', 'password': 'x', 'role': 'etudiant'}, # Existe déjà
+            {'username': 'ok2', 'email': 'ETUDIANT1@example.com', 'password': 'x', 'role': 'etudiant'}, # E-mail existant
+            {'username': 'ok1', 'email': 'ok3@example.com', 'password': 'x', 'role': 'etudiant'}, # Doublon du fichier
+            {'username': 'ok4', 'email': 'ok4@example.com', 'password': 'x', 'role': 'formateur', 'promotion_id': self.promotion.pk},
+            {'username': 'ok5', 'email': 'ok5@example.com', 'password': 'x', 'role': 'etudiant', 'promotion_id': 999999},
+            {'username': 'ok6', 'email': 'pas-un-email', 'password': 'x', 'role': 'etudiant'},
+        ]
+        response = self.client.post('/api/v1/profiles/import/', {'users': users}, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = {error['index']: set(error['errors']) for error in response.json()['errors']}
+        self.assertEqual(errors, {1: {'username'}, 2: {'email'}, 3: {'username'}, 4: {'promotion_id'}, 5: {'promotion_id'}, 6: {'email'}})
+        self.assertFalse(User.objects.filter(username='ok1').exists())
+
+    def test_admin_only(self):
+        self.authenticate(self.trainer)
+        response = self.client.post('/api/v1/profiles/import/', {'users': []}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(PASSWORD_HASH_WORKERS=2)
+    def test_parallel_hashing(self):
+        self.addCleanup(password_pool.shutdown_pool)
+        hashes = hash_passwords([f'secret{i}' for i in range(10)])
+        self.assertEqual(len(set(hashes)), 10)
+        user = User(username='verif', password=hashes[7])
+        self.assertTrue(user.check_password('secret7'))
+        # Le pool (et Django chargé dans chaque fils) sert aux imports suivants
+        pool = password_pool._pool
+        hash_passwords([f'autre{i}' for i in range(10)])
+        self.assertIs(password_pool._pool, pool)
+
+    @override_settings(USER_IMPORT_MAX_ROWS=2)
+    def test_row_limit(self):
+        users = [{'username': f'u{i}', 'email': f'u{i}@example.com', 'password': 'x', 'role': 'etudiant'} for i in range(3)]
+        response = self.client.post('/api/v1/profiles/import/', {'users': users}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'detail': "Un import est limité à 2 utilisateurs."})
+
+
+# Création de notes : contrainte d'unicité pour une note, validation groupée pour une liste
+class NoteCreateTests(ApiTestCase):
+    def exists_queries(self, context):
+        return [q['sql'] for q in context.captured_queries if q['sql'].startswith('SELECT 1 AS "a" FROM "user_note"')]
+
+    def test_single_create_relies_on_the_unique_constraint(self):
+        self.authenticate(self.trainer)
+        data = {'etudiant_id': self.students[1].pk, 'cours_id': self.cours.pk, 'valeur': '11.00'}
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.post('/api/v1/grades/', data, format='json').status_code, 201)
+        self.assertEqual(self.exists_queries(context), []) # Aucune vérification préalable de doublon
+
+        response = self.client.post('/api/v1/grades/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'non_field_errors': ["Cet étudiant a déjà une note pour ce cours."]})
+        self.assertEqual(Note.objects.filter(etudiant=self.students[1]).count(), 1)
+
+    def test_list_create_in_a_fixed_number_of_queries(self):
+        courses = Cours.objects.bulk_create([
+            Cours(nom=f'Module {i}', speciality=self.speciality, promotion=self.promotion) for i in range(10)
+        ])
+
+        def create(cours_list):
+            payload = [
+                {'etudiant_id': student.pk, 'cours_id': cours.pk, 'valeur': '10.00'}
+                for cours in cours_list for student in self.students
+            ]
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post('/api/v1/grades/', payload, format='json')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.json()), len(payload))
+            self.assertEqual(response.json()[0]['etudiant_username'], self.students[0].user.username)
+            return len(context.captured_queries)
+
+        self.authenticate(self.trainer)
+        self.assertEqual(create(courses[:1]), create(courses[1:2]))
+        # Le nombre de requêtes ne dépend que du nombre de cours (statistiques), pas du nombre de notes
+        self.assertEqual(create(courses[2:4]) - create(courses[4:5]), create(courses[5:7]) - create(courses[7:8]))
+        self.assertEqual(Note.objects.filter(cours__in=courses).count(), 8 * len(self.students))
+
+    def test_list_create_reports_each_invalid_item(self):
+        self.authenticate(self.trainer)
+        payload = [
+            {'etudiant_id': self.students[0].pk, 'cours_id': self.cours.pk, 'valeur': '10.00'}, # Note déjà existante
+            {'etudiant_id': self.students[1].pk, 'cours_id': self.cours.pk, 'valeur': '10.00'},
+            {'etudiant_id': self.students[1].pk, 'cours_id': self.cours.pk, 'valeur': '12.00'}, # Doublon dans le lot
+            {'etudiant_id': self.trainer.pk, 'cours_id': self.cours.pk, 'valeur': '10.00'}, # Pas un étudiant
+        ]
+        response = self.client.post('/api/v1/grades/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        # Erreurs indexées par position dans la liste (les éléments valides n'y figurent pas)
+        errors = {int(index): list(error) for index, error in response.json().items()}
+        self.assertEqual(errors, {0: ['non_field_errors'], 2: ['non_field_errors'], 3: ['etudiant_id']})
+        self.assertFalse(Note.objects.filter(etudiant=self.students[1]).exists())
+
+
+# Export CSV en flux des notes (user/exports.py)
+class CsvExportTests(ApiTestCase):
+    def test_header_and_rows(self):
+        orphan_cours = Cours.objects.create(nom='Anglais') # Sans spécialité
+        student = self.create_profile('sans_promo', Profile.Roles.ETUDIANT) # Sans promotion
+        Note.objects.create(etudiant=student, cours=orphan_cours, valeur=Decimal('9.5'), publie_par=None)
+        rows = list(csv.reader(iter_notes_csv(Note.objects.order_by('id'))))
+
+        self.assertEqual(rows[0], CSV_HEADER)
+        date = self.note.date_publication.strftime('%Y-%m-%d %H:%M:%S')
+        self.assertEqual(rows[1], ['etudiant0', 'Django', '12.00', date, 'formateur', 'Développement Web', 'Promo 2025', 'Développement Web'])
+        self.assertEqual(rows[2][:3], ['sans_promo', 'Anglais', '9.50'])
+        self.assertEqual(rows[2][4:], ['N/A'] * 4)
+
+    def test_rows_are_streamed_as_tuples(self):
+        with mock.patch.object(QuerySet, 'iterator', autospec=True, side_effect=QuerySet.iterator) as iterator, \
+                mock.patch.object(Note, 'from_db', side_effect=AssertionError("Modèle instancié")), \
+                CaptureQueriesContext(connection) as context:
+            lines = iter_notes_csv(Note.objects.select_related('cours'), chunk_size=10)
+            next(lines) # L'en-tête part avant toute requête
+            self.assertEqual(len(context.captured_queries), 0)
+            self.assertEqual(len(list(lines)), 1)
+        [(queryset,), kwargs] = iterator.call_args
+        self.assertEqual(kwargs, {'chunk_size': 10})
+        self.assertIs(queryset._iterable_class, ValuesListIterable) # Tuples plats, jointures dans la même requête
+        self.assertEqual(len(context.captured_queries), 1)
+
+
+# Saisie groupée des notes d'un cours (POST /api/v1/grades/bulk/, user/services.py)
+class NoteBulkTests(ApiTestCase):
+    def bulk(self, notes, cours=None, profile=None):
+        self.authenticate(profile or self.trainer)
+        data = {'cours_id': (cours or self.cours).pk, 'notes': notes}
+        return self.client.post('/api/v1/grades/bulk/', data, format='json')
+
+    def test_created_updated_and_unchanged_counts(self):
+        response = self.bulk([
+            {'etudiant_id': self.students[0].pk, 'valeur': '15.50'}, # Note existante modifiée
+            {'etudiant_id': self.students[1].pk, 'valeur': '10'},
+        ])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json(), {'cours_id': self.cours.pk, 'created': 1, 'updated': 1, 'unchanged': 0, 'errors': []})
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.valeur, Decimal('15.50'))
+        created = Note.objects.get(etudiant=self.students[1], cours=self.cours)
+        self.assertEqual((created.valeur, created.publie_par_id), (Decimal('10'), self.trainer.pk))
+
+        response = self.bulk([{'etudiant_id': self.students[0].pk, 'valeur': '15.5'}])
+        self.assertEqual((response.json()['updated'], response.json()['unchanged']), (0, 1))
+
+    def test_partial_success_reports_each_invalid_row(self):
+        response = self.bulk([
+            {'etudiant_id': self.students[1].pk, 'valeur': '11'},
+            {'etudiant_id': self.students[2].pk, 'valeur': 'abc'},
+            {'etudiant_id': self.trainer.pk, 'valeur': '11'}, # Pas un étudiant
+            {'valeur': '11'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['created'], 1)
+        self.assertEqual([(error['index'], list(error['errors'])) for error in body['errors']], [
+            (1, ['valeur']), (2, ['etudiant_id']), (3, ['etudiant_id']),
+        ])
+        self.assertFalse(Note.objects.filter(etudiant=self.students[2]).exists())
+
+    def test_every_row_invalid_is_a_bad_request(self):
+        response = self.bulk([{'etudiant_id': 999999, 'valeur': '11'}, {'etudiant_id': self.students[1].pk, 'valeur': '25000'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [0, 1])
+        self.assertEqual(Note.objects.count(), 1)
+
+    def test_duplicate_student_in_batch(self):
+        response = self.bulk([
+            {'etudiant_id': self.students[1].pk, 'valeur': '11'},
+            {'etudiant_id': self.students[1].pk, 'valeur': '13'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        [error] = response.json()['errors']
+        self.assertEqual((error['index'], list(error['errors'])), (1, ['etudiant_id']))
+        # La première occurrence est enregistrée
+        self.assertEqual(Note.objects.get(etudiant=self.students[1]).valeur, Decimal('11'))
+
+    def test_trainer_outside_course_scope(self):
+        design = Speciality.objects.create(name='Design')
+        other_cours = Cours.objects.create(nom='Illustrator', speciality=design)
+        response = self.bulk([{'etudiant_id': self.students[1].pk, 'valeur': '11'}], cours=other_cours)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Note.objects.filter(cours=other_cours).exists())
+        # Le même cours devient accessible quand le formateur l'enseigne
+        other_cours.formateur = self.trainer
+        other_cours.save()
+        response = self.bulk([{'etudiant_id': self.students[1].pk, 'valeur': '11'}], cours=other_cours)
+        self.assertEqual(response.status_code, 200)
+        # Saisie réservée aux formateurs
+        self.assertEqual(self.bulk([], profile=self.admin).status_code, 403)
+
+
+# Statistiques des cours tenues à jour à chaque écriture de note (user/aggregates.py)
+class GradeStatsTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.python = Cours.objects.create(nom='Python', speciality=cls.speciality)
+
+    def assert_stats_match_notes(self):
+        # Mêmes champs que rebuild_grade_stats --check ; une ligne vide équivaut à une ligne absente
+        fields = ('count', 'total', 'total_squares', 'min_valeur', 'max_valeur', 'histogram')
+        expected = {cours_id: [getattr(stats, field) for field in fields] for cours_id, stats in compute_course_stats().items()}
+        stored = {stats.cours_id: [getattr(stats, field) for field in fields] for stats in CourseGradeStats.objects.filter(count__gt=0)}
+        self.assertEqual(stored, expected)
+
+    def test_single_writes(self):
+        low = Note.objects.create(etudiant=self.students[1], cours=self.cours, valeur=3, publie_par=self.trainer)
+        high = Note.objects.create(etudiant=self.students[2], cours=self.cours, valeur=19.5, publie_par=self.trainer)
+        self.assert_stats_match_notes()
+        low.valeur = 7
+        low.save()
+        self.assert_stats_match_notes()
+        high.cours = self.python # Changement de cours
+        high.save()
+        self.assert_stats_match_notes()
+        # Suppression du minimum puis du maximum : bornes relues en base
+        low.delete()
+        self.assert_stats_match_notes()
+        Note.objects.get(pk=self.note.pk).delete()
+        self.assert_stats_match_notes()
+        self.assertEqual(CourseGradeStats.objects.get(cours=self.cours).count, 0)
+
+    def test_bulk_writes(self):
+        upsert_notes([
+            (self.students[0].pk, self.cours.pk, Decimal('18')), # Mise à jour
+            (self.students[1].pk, self.cours.pk, Decimal('4.25')),
+            (self.students[1].pk, self.python.pk, Decimal('11')),
+        ], self.trainer)
+        self.assert_stats_match_notes()
+        create_notes([{'etudiant': self.students[2], 'cours': self.python, 'valeur': Decimal('20'), 'publie_par': self.trainer}])
+        self.assert_stats_match_notes()
+        Note.objects.filter(valeur__gte=18).delete() # Suppression par queryset (signal par note)
+        self.assert_stats_match_notes()
+
+    def test_cascade_deletes(self):
+        Note.objects.create(etudiant=self.students[1], cours=self.python, valeur=9, publie_par=self.trainer)
+        Note.objects.create(etudiant=self.students[1], cours=self.cours, valeur=2, publie_par=self.trainer)
+        self.students[1].delete() # Ses notes sont supprimées par cascade
+        self.assert_stats_match_notes()
+        self.python.delete()
+        self.assertFalse(CourseGradeStats.objects.filter(cours_id=self.python.pk).exists())
+        self.assert_stats_match_notes()
+
+    def test_check_reports_drift(self):
+        out = StringIO()
+        call_command('rebuild_grade_stats', check=True, stdout=out)
+        self.assertIn('Aucune dérive', out.getvalue())
+
+        CourseGradeStats.objects.filter(cours=self.cours).update(count=5)
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, '1 cours ont des statistiques incorrectes.'):
+            call_command('rebuild_grade_stats', check=True, stdout=out)
+        self.assertIn(f'Dérive détectée pour le cours {self.cours.pk}', out.getvalue())
+
+        # Sans --check, la table est reconstruite
+        call_command('rebuild_grade_stats', stdout=StringIO())
+        self.assert_stats_match_notes()
+        call_command('rebuild_grade_stats', check=True, stdout=StringIO())
+
+
+# Relevés de notes précalculés, recalculés à chaque écriture de note ou de cours (user/aggregates.py)
+class TranscriptTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.python = Cours.objects.create(nom='Python', speciality=cls.other_speciality, coefficient=3)
+
+    def transcript(self, student):
+        transcript = StudentTranscript.objects.filter(etudiant=student).first()
+        if transcript is None:
+            return None
+        return {
+            'grades': [(grade['cours_nom'], grade['coefficient'], grade['valeur']) for grade in transcript.grades],
+            'average': transcript.overall_average,
+            'specialities': {row['speciality_name']: row['average'] for row in transcript.speciality_averages},
+        }
+
+    def test_note_writes(self):
+        self.assertEqual(self.transcript(self.students[0]), {
+            'grades': [('Django', '1.00', '12.00')], 'average': Decimal('12.00'), 'specialities': {'Développement Web': '12.00'},
+        })
+        note = Note.objects.create(etudiant=self.students[0], cours=self.python, valeur=8, publie_par=self.trainer)
+        # (12 × 1 + 8 × 3) / 4
+        self.assertEqual(self.transcript(self.students[0])['average'], Decimal('9.00'))
+        note.valeur = 16
+        note.save()
+        self.assertEqual(self.transcript(self.students[0])['grades'], [('Django', '1.00', '12.00'), ('Python', '3.00', '16.00')])
+        self.assertEqual(self.transcript(self.students[0])['specialities'], {'Développement Web': '12.00', 'Réseaux': '16.00'})
+
+        # Changement d'étudiant : les deux relevés sont recalculés
+        note.etudiant = self.students[1]
+        note.save()
+        self.assertEqual(self.transcript(self.students[0])['average'], Decimal('12.00'))
+        self.assertEqual(self.transcript(self.students[1])['grades'], [('Python', '3.00', '16.00')])
+
+        note.delete()
+        self.assertIsNone(self.transcript(self.students[1])) # Plus aucune note : plus de relevé
+
+    def test_bulk_writes(self):
+        upsert_notes([(self.students[0].pk, self.python.pk, Decimal('10')), (self.students[1].pk, self.cours.pk, Decimal('14'))], self.trainer)
+        self.assertEqual(self.transcript(self.students[0])['average'], Decimal('10.50'))
+        self.assertEqual(self.transcript(self.students[1])['average'], Decimal('14.00'))
+
+    def test_course_changes(self):
+        Note.objects.create(etudiant=self.students[0], cours=self.python, valeur=8, publie_par=self.trainer)
+        self.cours.nom = 'Django avancé'
+        self.cours.coefficient = 3
+        self.cours.save()
+        transcript = self.transcript(self.students[0])
+        self.assertEqual(transcript['grades'], [('Django avancé', '3.00', '12.00'), ('Python', '3.00', '8.00')])
+        self.assertEqual(transcript['average'], Decimal('10.00'))
+
+        # Le cours change de spécialité
+        self.cours.speciality = self.other_speciality
+        self.cours.save()
+        self.assertEqual(self.transcript(self.students[0])['specialities'], {'Réseaux': '10.00'})
+
+        self.other_speciality.name = 'Réseaux et télécoms'
+        self.other_speciality.save()
+        self.assertEqual(self.transcript(self.students[0])['specialities'], {'Réseaux et télécoms': '10.00'})
+
+    def test_course_deletion(self):
+        Note.objects.create(etudiant=self.students[0], cours=self.python, valeur=8, publie_par=self.trainer)
+        self.python.delete()
+        self.assertEqual(self.transcript(self.students[0])['grades'], [('Django', '1.00', '12.00')])
+        self.assertFalse(CourseGradeStats.objects.filter(cours_id=self.python.pk).exists())
+
+        # La suppression d'un cours recalcule les relevés une seule fois, quel que soit le nombre de notes
+        for student in self.students[1:]:
+            Note.objects.create(etudiant=student, cours=self.cours, valeur=10, publie_par=self.trainer)
+
+        def delete_course(students):
+            cours = Cours.objects.create(nom='Réseaux', speciality=self.other_speciality)
+            for student in students:
+                Note.objects.create(etudiant=student, cours=cours, valeur=10, publie_par=self.trainer)
+            with CaptureQueriesContext(connection) as queries:
+                cours.delete()
+            return len(queries)
+
+        self.assertEqual(delete_course(self.students[:1]), delete_course(self.students))
+
+    def test_speciality_deletion(self):
+        Note.objects.create(etudiant=self.students[0], cours=self.python, valeur=8, publie_par=self.trainer)
+        self.other_speciality.delete()
+        # Le cours reste, sans spécialité
+        transcript = self.transcript(self.students[0])
+        self.assertEqual(transcript['grades'], [('Django', '1.00', '12.00'), ('Python', '3.00', '8.00')])
+        self.assertEqual(transcript['specialities'], {'Développement Web': '12.00', None: '8.00'})
+
+
+# Import des notes depuis un tableur (user/grade_imports.py)
+class GradeImportTests(ApiTestCase):
+    def upload(self, content, profile=None):
+        self.authenticate(profile or self.trainer)
+        upload = SimpleUploadedFile('notes.csv', content.encode('utf-8-sig'), content_type='text/csv')
+        return self.client.post('/api/v1/grades/import/', {'file': upload}, format='multipart')
+
+    def test_export_layout_round_trip(self):
+        self.authenticate(self.trainer)
+        exported = b''.join(self.client.get('/api/v1/grades/export_csv/').streaming_content).decode()
+        # La note existante est corrigée dans le tableur, une ligne est ajoutée pour un autre étudiant
+        edited = exported.replace(',12.00,', ',14.50,') + f'etudiant1,Django,9.75,,,,,\r\n'
+        response = self.upload(edited)
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual((report['layout'], report['created'], report['updated'], report['errors']), ('export', 1, 1, []))
+        self.assertEqual([row['status'] for row in report['results']], ['updated', 'created'])
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.valeur, Decimal('14.50'))
+
+    def test_simple_layout_from_a_french_spreadsheet(self):
+        response = self.upload('username;course;grade\r\netudiant1;Django;13,5\r\n;;\r\n')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(Note.objects.get(etudiant=self.students[1]).valeur, Decimal('13.50'))
+
+    def test_per_row_report(self):
+        other = Speciality.objects.create(name='Design')
+        Cours.objects.create(nom='Illustrator', speciality=other)
+        response = self.upload(
+            'username,course,grade\n'
+            'etudiant1,Django,11\n'
+            'inconnu,Django,11\n'
+            'etudiant2,Inconnu,11\n'
+            'etudiant2,Django,abc\n'
+            'etudiant1,Django,12\n'
+            'etudiant2,Illustrator,10\n'
+        )
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(
+            [(row['line'], row['status']) for row in report['results']],
+            [(2, 'created'), (3, 'error'), (4, 'error'), (5, 'error'), (6, 'error'), (7, 'error')],
+        )
+        self.assertEqual([list(error['errors']) for error in report['errors']], [['username'], ['course'], ['grade'], ['username'], ['course']])
+
+    def test_invalid_files(self):
+        self.assertEqual(self.upload('nom,valeur\nx,1\n').status_code, 400)
+        self.assertEqual(self.upload('username,course,grade\ninconnu,Django,11\n').status_code, 400)
+        self.assertEqual(self.upload('username,course,grade\netudiant1,Django,11\n', profile=self.admin).status_code, 403)
+
+    def test_query_count_does_not_depend_on_row_count(self):
+        users = User.objects.bulk_create([User(username=f'lot{i}') for i in range(30)])
+        Profile.objects.bulk_create([
+            Profile(user=user, role=Profile.Roles.ETUDIANT, promotion=self.promotion) for user in users
+        ])
+
+        def count_queries(usernames):
+            content = 'username,course,grade\n' + ''.join(f'{username},Django,10\n' for username in usernames)
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.upload(content).json()['created'], len(usernames))
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries(['lot0', 'lot1']), count_queries([f'lot{i}' for i in range(2, 30)]))
+
+
+# ?fields= et ?omit= réduisent la réponse et la requête SQL (user/fieldsets.py)
+class SparseFieldsetTests(ApiTestCase):
+    def main_query(self, context, table):
+        return next(q['sql'] for q in context.captured_queries if q['sql'].startswith('SELECT') and f'FROM "{table}"' in q['sql'])
+
+    def test_fields_limits_keys_columns_and_joins(self):
+        self.authenticate(self.admin)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/v1/courses/?fields=id,nom')
+        self.assertEqual(response.json()['results'], [{'id': self.cours.pk, 'nom': 'Django'}])
+        sql = self.main_query(context, 'user_cours')
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('"description"', sql)
+
+    def test_omit_drops_unneeded_joins(self):
+        self.authenticate(self.admin)
+        full = self.client.get('/api/v1/grades/').json()['results'][0]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/v1/grades/?omit=etudiant_username,cours_nom,publie_par_username')
+        row = response.json()['results'][0]
+        self.assertEqual(set(full) - set(row), {'etudiant_username', 'cours_nom', 'publie_par_username'})
+        self.assertEqual(row['valeur'], full['valeur'])
+        self.assertNotIn('"auth_user"', self.main_query(context, 'user_note'))
+
+    def test_nested_fields_skip_unused_prefetch(self):
+        self.authenticate(self.admin)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/v1/profiles/?fields=id,user.username')
+        self.assertEqual(response.json()['results'][0], {'id': self.admin.pk, 'user': {'username': 'admin'}})
+        # Les spécialités assignées (préchargement) ne sont plus lues ; le Principal ne lit que leurs identifiants
+        self.assertFalse([q for q in context.captured_queries if 'FROM "user_speciality"' in q['sql']])
+
+    def test_without_parameters_response_is_unchanged(self):
+        self.authenticate(self.admin)
+        response = self.client.get(f'/api/v1/grades/{self.note.pk}/')
+        self.assertIn('etudiant_username', response.json())
+        self.assertEqual(self.client.get(f'/api/v1/grades/{self.note.pk}/?fields=').json(), response.json())
+
+    def test_unknown_fields_are_ignored(self):
+        self.authenticate(self.admin)
+        full = self.client.get(f'/api/v1/grades/{self.note.pk}/').json()
+        self.assertEqual(self.client.get(f'/api/v1/grades/{self.note.pk}/?fields=nope').json(), full)
+        self.assertEqual(self.client.get(f'/api/v1/grades/{self.note.pk}/?fields=id,nope').json(), {'id': self.note.pk})
+        response = self.client.get('/api/v1/profiles/?fields=id,user.nope')
+        self.assertIn('username', response.json()['results'][0]['user'])
+
+
+# GET conditionnels : ETag / Last-Modified calculés à partir des versions des tables (user/conditional.py)
+class ConditionalGetTests(ApiTestCase):
+    def test_not_modified_before_any_query_on_the_table(self):
+        self.authenticate(self.trainer)
+        response = self.client.get('/api/v1/specialities/')
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        # Utilisateur (JWT) et versions des tables : la table des spécialités n'est pas lue
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/v1/specialities/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertFalse([q for q in context.captured_queries if 'FROM "user_speciality"' in q['sql']])
+
+        last_modified = self.client.get('/api/v1/specialities/')['Last-Modified']
+        self.assertEqual(self.client.get('/api/v1/specialities/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_write_changes_etag(self):
+        self.authenticate(self.admin)
+        etag = self.client.get('/api/v1/promotions/')['ETag']
+        # Le nom de la spécialité apparaît dans les promotions
+        self.speciality.name = 'Développement Mobile'
+        self.speciality.save()
+        response = self.client.get('/api/v1/promotions/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_course_etag_depends_on_visibility_scope(self):
+        self.authenticate(self.trainer)
+        trainer_etag = self.client.get('/api/v1/courses/')['ETag']
+        self.authenticate(self.students[0])
+        self.assertEqual(self.client.get('/api/v1/courses/', HTTP_IF_NONE_MATCH=trainer_etag).status_code, 200)
+
+        # Retirer une spécialité au formateur change les cours qu'il voit
+        self.authenticate(self.trainer)
+        self.assertEqual(self.client.get('/api/v1/courses/', HTTP_IF_NONE_MATCH=trainer_etag).status_code, 304)
+        self.trainer.assigned_specialities.remove(self.other_speciality)
+        self.assertEqual(self.client.get('/api/v1/courses/', HTTP_IF_NONE_MATCH=trainer_etag).status_code, 200)
+
+    def test_etag_depends_on_url_and_media_type(self):
+        self.authenticate(self.admin)
+        etag = self.client.get('/api/v1/courses/')['ETag']
+        self.assertNotEqual(self.client.get('/api/v1/courses/?page_size=1')['ETag'], etag)
+        self.assertNotEqual(self.client.get('/api/v1/courses/', HTTP_ACCEPT='text/html')['ETag'], etag)
+        self.assertNotEqual(self.client.get(f'/api/v1/courses/{self.cours.pk}/')['ETag'], etag)
+
+
+
+# Cache partagé des réponses des listes de référence (user/response_cache.py)
+class ResponseCacheTests(ApiTestCase):
+    def test_hit_serves_rendered_bytes_without_reading_the_table(self):
+        self.authenticate(self.students[0])
+        miss = self.client.get('/api/v1/promotions/')
+        self.assertEqual(miss['X-Cache'], 'MISS')
+
+        with CaptureQueriesContext(connection) as context:
+            hit = self.client.get('/api/v1/promotions/')
+        self.assertEqual(hit['X-Cache'], 'HIT')
+        self.assertEqual(hit.content, miss.content)
+        self.assertEqual(hit['ETag'], miss['ETag'])
+        self.assertEqual(len(context.captured_queries), 2) # Utilisateur (JWT) et versions des tables
+        self.assertEqual(get_cache_stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_missing_counter_does_not_fail_the_request(self):
+        self.authenticate(self.students[0])
+        # Compteur évincé ou supprimé par un autre processus entre deux appels
+        with mock.patch.object(type(get_response_cache()), 'incr', side_effect=ValueError):
+            self.assertEqual(self.client.get('/api/v1/promotions/').status_code, 200)
+            self.assertEqual(self.client.get('/api/v1/promotions/').status_code, 200)
+        self.assertEqual(get_cache_stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_write_invalidates(self):
+        self.authenticate(self.admin)
+        self.client.get('/api/v1/specialities/')
+        self.client.post('/api/v1/specialities/', {'name': 'Data Science'}, format='json')
+        response = self.client.get('/api/v1/specialities/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('Data Science', [row['name'] for row in response.json()['results']])
+
+    @override_settings(ALLOWED_HOSTS=['api.example.com', 'testserver'])
+    def test_pagination_links_follow_the_request_host_and_scheme(self):
+        Promotion.objects.create(name='Promo 2026', year=2026, speciality=self.speciality)
+        self.authenticate(self.admin)
+        self.client.get('/api/v1/promotions/?page_size=1') # Mis en cache pour http://testserver
+        for extra in ({'HTTP_HOST': 'api.example.com'}, {'secure': True}):
+            response = self.client.get('/api/v1/promotions/?page_size=1', **extra)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            expected = 'https://testserver/' if extra.get('secure') else 'http://api.example.com/'
+            self.assertTrue(response.json()['next'].startswith(expected), response.json()['next'])
+        self.assertEqual(self.client.get('/api/v1/promotions/?page_size=1', HTTP_HOST='api.example.com')['X-Cache'], 'HIT')
+
+    def test_browsable_api_is_not_cached(self):
+        self.authenticate(self.admin)
+        self.assertFalse(self.client.get('/api/v1/specialities/', HTTP_ACCEPT='text/html').has_header('X-Cache'))
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_response_cache', iterations=3, stdout=out)
+        self.assertIn('avec cache', out.getvalue())
+
+
+# Lectures asynchrones des notes et des cours, servies par l'application ASGI (user/async_views.py)
+@override_settings(ROOT_URLCONF=settings.ASGI_ROOT_URLCONF)
+class AsyncReadTests(ApiTestCase):
+    def async_request(self, method, path, profile=None, headers=None, **extra):
+        headers = dict(headers or {})
+        if profile is not None:
+            headers['Authorization'] = f'Bearer {AccessToken.for_user(profile.user)}'
+        return async_to_sync(getattr(AsyncClient(), method))(path, headers=headers, **extra)
+
+    def sync_get(self, path, profile=None, **extra):
+        # Chemin WSGI : ROOT_URLCONF d'origine
+        with override_settings(ROOT_URLCONF='config.urls'):
+            if profile is not None:
+                self.authenticate(profile)
+            return self.client.get(path, **extra)
+
+    def test_reads_are_async_and_match_wsgi(self):
+        other_note = Note.objects.create(etudiant=self.students[1], cours=self.cours, valeur=8, publie_par=self.trainer)
+        self.assertIs(resolve('/api/v1/grades/').func, async_views.note_list)
+        paths = [
+            '/api/v1/grades/', f'/api/v1/grades/{self.note.pk}/', f'/api/v1/grades/{other_note.pk}/',
+            '/api/v1/grades/?page_size=1', '/api/v1/courses/', f'/api/v1/courses/{self.cours.pk}/',
+        ]
+        for profile in (self.admin, self.trainer, self.students[0]):
+            for path in paths:
+                expected = self.sync_get(path, profile)
+                response = self.async_request('get', path, profile)
+                self.assertEqual(response.status_code, expected.status_code, path)
+                self.assertEqual(response.json(), expected.json(), path)
+                self.assertEqual(response['Allow'], expected['Allow'], path)
+
+    def test_authentication_errors_match_wsgi(self):
+        for headers in ({}, {'Authorization': 'Bearer invalide'}):
+            expected = self.sync_get('/api/v1/grades/', headers=headers)
+            response = self.async_request('get', '/api/v1/grades/', headers=headers)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response.json(), expected.json())
+            self.assertEqual(response['WWW-Authenticate'], expected['WWW-Authenticate'])
+
+    def test_course_conditional_get(self):
+        etag = self.sync_get('/api/v1/courses/', self.trainer)['ETag']
+        response = self.async_request('get', '/api/v1/courses/', self.trainer, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_writes_and_browsable_api_use_the_sync_view(self):
+        response = self.async_request(
+            'post', '/api/v1/grades/', self.trainer, content_type='application/json',
+            data={'etudiant_id': self.students[2].pk, 'cours_id': self.cours.pk, 'valeur': '15.00'},
+        )
+        self.assertEqual(response.status_code, 201)
+        response = self.async_request('get', '/api/v1/grades/', self.admin, headers={'Accept': 'text/html'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('text/html', response['Content-Type'])
+
+    def test_columnar_format_is_served_async(self):
+        expected = self.sync_get('/api/v1/grades/?format=columnar', self.admin)
+        response = self.async_request('get', '/api/v1/grades/?format=columnar', self.admin)
+        self.assertEqual(response['Content-Type'], 'application/vnd.trow.columnar+json')
+        self.assertEqual(response.content, expected.content)
+
+
+# Flux SSE des notes de l'étudiant connecté (user/live.py), servi par l'application ASGI
+@override_settings(ROOT_URLCONF=settings.ASGI_ROOT_URLCONF)
+class GradeStreamTests(ApiTestCase):
+    def open_stream(self, profile):
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(profile.user)}'} if profile else {}
+        return AsyncClient().get('/api/v1/grades/stream/', headers=headers)
+
+    def read_events(self, publish, count):
+        # Ouvre le flux, déclenche les écritures (transaction validée), puis lit `count` événements après "ready"
+        async def scenario():
+            response = await self.open_stream(self.students[0])
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            content = aiter(response.streaming_content)
+            try:
+                self.assertIn(b'event: ready', await anext(content))
+                await sync_to_async(publish)()
+                return [await asyncio.wait_for(anext(content), 5) for _ in range(count)]
+            finally:
+                await content.aclose()
+
+        return async_to_sync(scenario)()
+
+    def test_student_receives_only_own_grades(self):
+        def publish():
+            with self.captureOnCommitCallbacks(execute=True):
+                Note.objects.create(etudiant=self.students[1], cours=self.cours, valeur=9, publie_par=self.trainer)
+                self.note.valeur = 14
+                self.note.save()
+
+        [event] = self.read_events(publish, 1)
+        self.assertEqual(event.decode().splitlines()[:2], [
+            'event: grade', f'data: {{"id":{self.note.pk},"cours_id":{self.cours.pk},"created":false,"valeur":"14.00"}}',
+        ])
+        self.assertEqual(broker.connection_count(), 0)
+
+    def test_bulk_writes_are_published(self):
+        other_cours = Cours.objects.create(nom='Flutter', speciality=self.speciality, formateur=self.trainer)
+
+        def publish():
+            with self.captureOnCommitCallbacks(execute=True):
+                upsert_notes([(self.students[0].pk, self.cours.pk, Decimal('11')), (self.students[0].pk, other_cours.pk, Decimal('16'))], self.trainer)
+
+        events = [json.loads(event.decode().splitlines()[1][len('data: '):]) for event in self.read_events(publish, 2)]
+        self.assertEqual({(event['cours_id'], event['created']) for event in events}, {(self.cours.pk, False), (other_cours.pk, True)})
+
+    def test_stream_is_for_authenticated_students(self):
+        self.assertEqual(async_to_sync(self.open_stream)(None).status_code, 401)
+        self.assertEqual(async_to_sync(self.open_stream)(self.trainer).status_code, 403)
+        self.assertEqual(broker.connection_count(), 0)
+
+
+# Flux SSE ouverts dans l'application ASGI (config/asgi.py) : threads et connexions à la base occupés
+class GradeStreamResourceTests(TransactionTestCase):
+    streams = 10
+
+    def scope(self, token):
+        path = '/api/v1/grades/stream/'
+        return {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())],
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+        }
+
+    def test_idle_streams_hold_no_thread_nor_connection(self):
+        from config.asgi import application
+
+        user = User.objects.create_user('etudiant_flux')
+        Profile.objects.create(user=user, role=Profile.Roles.ETUDIANT)
+        token = str(AccessToken.for_user(user))
+        open_connections = {} # Connexion -> ouverte ?
+        wrapper_class = type(connections['default'])
+        close = wrapper_class.close
+
+        def track_close(wrapper):
+            open_connections[id(wrapper)] = False
+            return close(wrapper)
+
+        def track_open(sender, connection, **kwargs):
+            open_connections[id(connection)] = True
+
+        async def scenario():
+            disconnect, ready, statuses = asyncio.Event(), asyncio.Semaphore(0), []
+
+            async def stream():
+                sent = []
+
+                async def receive():
+                    if not sent:
+                        sent.append(True)
+                        return {'type': 'http.request', 'body': b'', 'more_body': False}
+                    await disconnect.wait()
+                    return {'type': 'http.disconnect'}
+
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        statuses.append(message['status'])
+                    elif b'event: ready' in message.get('body', b''):
+                        ready.release()
+
+                await application(self.scope(token), receive, send)
+
+            threads = threading.active_count()
+            tasks = [asyncio.create_task(stream()) for _ in range(self.streams)]
+            for _ in tasks:
+                await asyncio.wait_for(ready.acquire(), 10)
+            measured = threading.active_count() - threads, sum(open_connections.values())
+            disconnect.set()
+            await asyncio.gather(*tasks)
+            return statuses, measured
+
+        # Boucle d'événements dans un autre thread, comme sous un serveur ASGI (pas d'async_to_sync englobant)
+        connection_created.connect(track_open)
+        try:
+            with mock.patch.object(wrapper_class, 'close', track_close), ThreadPoolExecutor(1) as executor:
+                statuses, (new_threads, still_open) = executor.submit(asyncio.run, scenario()).result()
+        finally:
+            connection_created.disconnect(track_open)
+        self.assertEqual(statuses, [200] * self.streams)
+        # Au plus le thread partagé d'asgiref (s'il n'existait pas encore), et aucune connexion restée ouverte
+        self.assertLessEqual(new_threads, 1)
+        self.assertEqual(still_open, 0)
+        self.assertEqual(broker.connection_count(), 0)
+
+
+# Profilage des requêtes : en-têtes Server-Timing et métriques Prometheus (user/profiling.py)
+@override_settings(REQUEST_PROFILING=True)
+class ProfilingTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def server_timing(self, response):
+        return dict(re.findall(r'(\w+);(?:desc="[^"]*";)?dur=([\d.]+)', response['Server-Timing']))
+
+    def test_server_timing_counts_sql(self):
+        self.authenticate(self.trainer)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/grades/')
+        self.assertEqual(set(self.server_timing(response)), {'auth', 'permissions', 'sql', 'serialize', 'render', 'total'})
+        self.assertIn(f'sql;desc="{len(queries)} SQL"', response['Server-Timing'])
+
+    def test_metrics_endpoint(self):
+        self.authenticate(self.trainer)
+        self.client.get('/api/v1/grades/')
+        self.assertEqual(self.client.get('/api/v1/_metrics').status_code, 403)
+
+        self.authenticate(self.admin)
+        response = self.client.get('/api/v1/_metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        labels = 'view="NoteViewSet.list",method="GET",status="2xx"'
+        self.assertIn(f'trow_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1', text)
+        self.assertIn(f'trow_request_phase_seconds_count{{{labels},phase="serialize"}} 1', text)
+        # La requête refusée est mesurée avec son action et sa classe de statut
+        self.assertIn('trow_request_sql_queries_count{view="MetricsView.get",method="GET",status="4xx"} 1', text)
+
+    @override_settings(ROOT_URLCONF=settings.ASGI_ROOT_URLCONF)
+    def test_async_reads_are_profiled(self):
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.trainer.user)}'}
+        response = async_to_sync(AsyncClient().get)('/api/v1/grades/', headers=headers)
+        self.assertIn('serialize', self.server_timing(response))
+        self.assertIn('view="NoteViewSet.list"', registry.render_prometheus())
+
+    def test_histogram_relative_error(self):
+        histogram = LatencyHistogram()
+        for value in range(1, 100001):
+            histogram.record(value)
+        for q in (0.5, 0.9, 0.99):
+            self.assertAlmostEqual(histogram.quantile(q) / (q * 100000), 1, delta=1 / LatencyHistogram.SUB_BUCKETS)
+        self.assertLess(len(histogram.counts), 600)
+
+
+class ProfilingDisabledTests(ApiTestCase):
+    def test_no_header_and_no_metrics(self):
+        self.authenticate(self.admin)
+        self.assertNotIn('Server-Timing', self.client.get('/api/v1/grades/'))
+        self.assertEqual(self.client.get('/api/v1/_metrics').status_code, 404)
+
+
+# Journal des requêtes lentes avec le plan de la requête SQL la plus lente (user/slow_requests.py)
+@override_settings(SLOW_REQUEST_LOG=True, SLOW_REQUEST_THRESHOLD_MS=0)
+class SlowRequestLogTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir, ignore_errors=True)
+        self.log_file = Path(log_dir) / 'slow_requests.log'
+        self.enterContext(override_settings(SLOW_REQUEST_LOG_FILE=self.log_file))
+        self.addCleanup(close_log)
+
+    def logged_entries(self):
+        wait_for_pending()
+        return list(read_entries(self.log_file))
+
+    def test_slow_request_is_logged_with_plan(self):
+        self.authenticate(self.trainer)
+        response = self.client.get('/api/v1/grades/')
+        self.assertNotIn('Server-Timing', response) # Métriques désactivées : seul le journal est actif
+        [entry] = self.logged_entries()
+        self.assertEqual((entry['view'], entry['action'], entry['role'], entry['status']), ('NoteViewSet', 'list', 'formateur', 200))
+        self.assertEqual(entry['sql_count'], len(entry['statements']))
+        self.assertEqual(entry['slowest']['explain'], 'EXPLAIN QUERY PLAN')
+        self.assertTrue(entry['slowest']['plan'])
+
+        out = StringIO()
+        call_command('slow_requests_report', file=str(self.log_file), stdout=out)
+        self.assertIn('NoteViewSet.list', out.getvalue())
+        self.assertIn('formateur=1', out.getvalue())
+
+    def test_fast_requests_are_not_logged(self):
+        self.authenticate(self.trainer)
+        with override_settings(SLOW_REQUEST_THRESHOLD_MS=60_000):
+            self.client.get('/api/v1/grades/')
+        self.assertEqual(self.logged_entries(), [])
+
+    def test_locking_reads_are_not_analyzed(self):
+        self.assertTrue(is_read_only('SELECT "user_note"."id" FROM "user_note" WHERE "user_note"."id" = %s'))
+        self.assertTrue(is_read_only('WITH recent AS (SELECT 1) SELECT * FROM recent'))
+        # select_for_update : EXPLAIN ANALYZE poserait les verrous de ligne
+        self.assertFalse(is_read_only('SELECT "user_coursegradestats"."id" FROM "user_coursegradestats" FOR UPDATE'))
+        self.assertFalse(is_read_only('SELECT "user_note"."id" FROM "user_note" FOR NO KEY UPDATE OF "user_note" SKIP LOCKED'))
+        self.assertFalse(is_read_only('SELECT "user_note"."id" FROM "user_note" FOR SHARE'))
+        self.assertFalse(is_read_only('UPDATE "user_note" SET "valeur" = %s'))
+
+
+# Tableau de notes d'une promotion, étudiants × cours (user/gradebook.py)
+class GradebookTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.python = Cours.objects.create(nom='Python', speciality=cls.speciality, coefficient=2) # Cours de la spécialité
+        Cours.objects.create(nom='Cisco', speciality=cls.other_speciality) # Hors de la promotion
+        Note.objects.create(etudiant=cls.students[0], cours=cls.python, valeur=15, publie_par=cls.trainer)
+        Note.objects.create(etudiant=cls.students[1], cours=cls.cours, valeur=8, publie_par=cls.trainer)
+
+    def test_matrix_and_averages(self):
+        self.authenticate(self.admin)
+        data = self.client.get(f'/api/v1/promotions/{self.promotion.pk}/gradebook/').json()
+        self.assertEqual([c['nom'] for c in data['courses']], ['Django', 'Python'])
+        self.assertEqual([(c['average'], c['count']) for c in data['courses']], [('10.00', 2), ('15.00', 1)])
+        self.assertEqual(
+            [(s['username'], s['grades'], s['average']) for s in data['students']],
+            [('etudiant0', ['12.00', '15.00'], '14.00'), ('etudiant1', ['8.00', None], '8.00'), ('etudiant2', [None, None], None)],
+        )
+
+    def test_query_count_does_not_depend_on_promotion_size(self):
+        self.authenticate(self.admin)
+        url = f'/api/v1/promotions/{self.promotion.pk}/gradebook/'
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        for i in range(10):
+            student = self.create_profile(f'nouveau{i}', Profile.Roles.ETUDIANT, promotion=self.promotion)
+            Note.objects.create(etudiant=student, cours=self.python, valeur=10, publie_par=self.trainer)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()['students']), 13)
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+
+    def test_csv_output(self):
+        self.authenticate(self.trainer)
+        response = self.client.get(f'/api/v1/promotions/{self.promotion.pk}/gradebook/', {'output': 'csv'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'Nom Etudiant,Prenom,Nom,Django,Python,Moyenne')
+        self.assertEqual(lines[1], 'etudiant0,,,12.00,15.00,14.00')
+        self.assertEqual(lines[-1], 'Moyenne,,,10.00,15.00,')
+
+    def test_students_are_forbidden(self):
+        self.authenticate(self.students[0])
+        self.assertEqual(self.client.get(f'/api/v1/promotions/{self.promotion.pk}/gradebook/').status_code, 403)
+
+
+# Exports CSV en arrière-plan, écrits par le worker dans le stockage des médias (user/export_jobs.py)
+@override_settings(EXPORT_WORKER='command')
+class ExportJobTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def download(self, job_id):
+        response = self.client.get(f'/api/v1/grades/exports/{job_id}/download/')
+        return response.status_code, b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_identical_requests_share_one_file(self):
+        other_admin = self.create_profile('admin2', Profile.Roles.ADMIN)
+        self.authenticate(self.admin)
+        first = self.client.post('/api/v1/grades/exports/')
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(first.json()['status'], 'pending')
+        self.assertEqual(self.download(first.json()['id'])[0], 409)
+        # Même périmètre (administrateur), mêmes données : même export
+        self.authenticate(other_admin)
+        second = self.client.post('/api/v1/grades/exports/')
+        self.assertEqual((second.status_code, second.json()['id']), (200, first.json()['id']))
+
+        call_command('run_export_worker', once=True, stdout=StringIO())
+        job = self.client.get(first['Location']).json()
+        self.assertEqual((job['status'], job['row_count']), ('done', 1))
+        status_code, content = self.download(job['id'])
+        self.assertEqual(status_code, 200)
+        self.assertEqual(content, b''.join(self.client.get('/api/v1/grades/export_csv/').streaming_content))
+
+    def test_new_data_gets_a_new_export(self):
+        self.authenticate(self.admin)
+        first = self.client.post('/api/v1/grades/exports/').json()
+        Note.objects.create(etudiant=self.students[1], cours=self.cours, valeur=9, publie_par=self.trainer)
+        second = self.client.post('/api/v1/grades/exports/')
+        self.assertEqual(second.status_code, 202)
+        self.assertNotEqual(second.json()['id'], first['id'])
+
+    def test_export_follows_role_scoping(self):
+        Note.objects.create(etudiant=self.students[1], cours=self.cours, valeur=9, publie_par=self.trainer)
+        self.authenticate(self.students[0])
+        job_id = self.client.post('/api/v1/grades/exports/').json()['id']
+        call_command('run_export_worker', once=True, stdout=StringIO())
+        lines = self.download(job_id)[1].decode().splitlines()
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], ['etudiant0'])
+
+        self.authenticate(self.students[1])
+        self.assertEqual(self.client.get(f'/api/v1/grades/exports/{job_id}/').status_code, 404)
+        self.assertNotEqual(self.client.post('/api/v1/grades/exports/').json()['id'], job_id)
+        self.assertEqual(ExportJob.objects.count(), 2)
+
+    def test_thread_mode_resumes_jobs_of_a_restarted_process(self):
+        # Exports laissés par un processus arrêté : l'un en attente, l'autre en cours depuis plus que le délai
+        pending = ExportJob.objects.create(scope=[], fingerprint='a' * 40)
+        stale = ExportJob.objects.create(
+            scope=[], fingerprint='b' * 40, status=ExportJob.Status.RUNNING,
+            started_at=timezone.now() - timedelta(seconds=settings.EXPORT_JOB_TIMEOUT + 1),
+        )
+        executor = mock.Mock()
+        self.authenticate(self.admin)
+        with override_settings(EXPORT_WORKER='thread'), mock.patch('user.export_jobs._get_executor', return_value=executor), \
+                self.captureOnCommitCallbacks(execute=True):
+            job_id = self.client.post('/api/v1/grades/exports/').json()['id']
+            self.client.post('/api/v1/grades/exports/') # Déjà confiés au pool : pas de seconde soumission
+        self.assertEqual([call.args[1] for call in executor.submit.call_args_list], [pending.pk, stale.pk, job_id])
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, ExportJob.Status.PENDING)
+        with mock.patch('user.export_jobs.connection'): # Le thread ferme sa connexion, pas celle du test
+            for call in executor.submit.call_args_list:
+                call.args[0](*call.args[1:])
+        self.assertEqual(export_jobs._submitted, set())
+        self.assertEqual(set(ExportJob.objects.values_list('status', flat=True)), {ExportJob.Status.DONE})
+
+    def test_purge_deletes_old_finished_jobs_and_files(self):
+        self.authenticate(self.admin)
+        old_id = self.client.post('/api/v1/grades/exports/').json()['id']
+        call_command('run_export_worker', once=True, stdout=StringIO())
+        Note.objects.create(etudiant=self.students[1], cours=self.cours, valeur=9, publie_par=self.trainer)
+        recent_id = self.client.post('/api/v1/grades/exports/').json()['id']
+        call_command('run_export_worker', once=True, stdout=StringIO())
+        ExportJob.objects.filter(pk=old_id).update(finished_at=timezone.now() - timedelta(days=settings.EXPORT_RETENTION_DAYS + 1))
+        old_file = ExportJob.objects.get(pk=old_id).file.name
+
+        out = StringIO()
+        call_command('purge_export_jobs', stdout=out)
+        self.assertIn('1 export(s) supprimé(s)', out.getvalue())
+        self.assertEqual(list(ExportJob.objects.values_list('pk', flat=True)), [recent_id])
+        self.assertFalse(default_storage.exists(old_file))
+        self.assertEqual(self.download(recent_id)[0], 200)
+
+    def test_missing_file_is_gone(self):
+        self.authenticate(self.admin)
+        job_id = self.client.post('/api/v1/grades/exports/').json()['id']
+        call_command('run_export_worker', once=True, stdout=StringIO())
+        default_storage.delete(ExportJob.objects.get(pk=job_id).file.name)
+
+        status_code, content = self.download(job_id)
+        self.assertEqual(status_code, 410)
+        self.assertIn('detail', json.loads(content))
+        self.assertEqual(ExportJob.objects.get(pk=job_id).status, ExportJob.Status.FAILED)
+        # Une nouvelle demande relance l'export
+        response = self.client.post('/api/v1/grades/exports/')
+        self.assertEqual(response.status_code, 202)
+        self.assertNotEqual(response.json()['id'], job_id)
+
+
+# Flux de synchronisation incrémentale du client mobile (user/sync.py)
+class SyncTests(ApiTestCase):
+    def sync(self, token=None):
+        response = self.client.get('/api/v1/sync/', {'since': token} if token else {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_full_sync_then_unchanged_poll(self):
+        self.authenticate(self.students[0])
+        full = self.sync()
+        self.assertTrue(full['reset'])
+        self.assertEqual([note['id'] for note in full['grades']['changed']], [self.note.pk])
+        self.assertEqual([cours['id'] for cours in full['courses']['changed']], [self.cours.pk])
+        # Utilisateur, principal, versions des tables : aucune autre lecture si rien n'a changé
+        with self.assertNumQueries(3):
+            poll = self.sync(full['token'])
+        self.assertFalse(poll['reset'])
+        self.assertEqual(poll['grades'], {'changed': [], 'deleted': []})
+
+    def test_renamed_user_reaches_synced_rows(self):
+        self.authenticate(self.students[0])
+        token = self.sync()['token']
+        # Le nom du formateur est recopié dans la note (publie_par_username) et le cours (formateur_username)
+        self.trainer.user.username = 'formateur_renomme'
+        self.trainer.user.save()
+        changes = self.sync(token)
+        self.assertEqual([note['publie_par_username'] for note in changes['grades']['changed']], ['formateur_renomme'])
+        self.assertEqual([cours['formateur_username'] for cours in changes['courses']['changed']], ['formateur_renomme'])
+
+        self.cours.nom = 'Django avancé'
+        self.cours.save()
+        self.assertEqual([note['cours_nom'] for note in self.sync(changes['token'])['grades']['changed']], ['Django avancé'])
+
+    def test_deleted_note_reaches_its_student_only(self):
+        other = Note.objects.create(etudiant=self.students[1], cours=self.cours, valeur=9, publie_par=self.trainer)
+        self.authenticate(self.students[0])
+        token = self.sync()['token']
+        self.authenticate(self.students[1])
+        other_token = self.sync()['token']
+
+        note_id, other_id = self.note.pk, other.pk
+        self.note.delete()
+        other.delete()
+        self.authenticate(self.students[0])
+        self.assertEqual(self.sync(token)['grades']['deleted'], [note_id])
+        self.authenticate(self.students[1])
+        self.assertEqual(self.sync(other_token)['grades']['deleted'], [other_id])
+
+    def test_course_delete_cascades_to_tombstones(self):
+        self.authenticate(self.trainer)
+        token = self.sync()['token']
+        note_id, cours_id = self.note.pk, self.cours.pk
+        self.cours.delete()
+        changes = self.sync(token)
+        self.assertEqual((changes['grades']['deleted'], changes['courses']['deleted']), ([note_id], [cours_id]))
+        self.assertEqual((changes['grades']['changed'], changes['courses']['changed']), ([], []))
+
+    def test_course_leaving_trainer_scope_is_deleted_for_them(self):
+        self.trainer.assigned_specialities.remove(self.other_speciality)
+        self.authenticate(self.trainer)
+        token = self.sync()['token']
+        self.cours.formateur = self.create_profile('formateur2', Profile.Roles.FORMATEUR)
+        self.cours.speciality = self.other_speciality
+        self.cours.save()
+        changes = self.sync(token)
+        self.assertEqual(changes['courses']['deleted'], [self.cours.pk])
+        # La note reste visible (il l'a publiée) : elle est renvoyée comme modifiée
+        self.assertEqual(changes['grades']['deleted'], [])
+        self.assertEqual([note['id'] for note in changes['grades']['changed']], [self.note.pk])
+
+    def test_invalid_token(self):
+        self.authenticate(self.students[0])
+        response = self.client.get('/api/v1/sync/', {'since': 'pas-un-jeton'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('since', response.json())
+
+    def test_tampered_or_unsigned_token_is_rejected(self):
+        self.authenticate(self.students[0])
+        token = self.sync()['token']
+        payload, signature = token.rsplit(':', 1)
+        unsigned = base64.urlsafe_b64encode(json.dumps({'t': timezone.now().isoformat(), 'v': [], 's': 'x'}).encode()).decode()
+        for forged in (f'{payload}:{signature[::-1]}', f'{payload[:-1]}A:{signature}', unsigned):
+            self.assertEqual(self.client.get('/api/v1/sync/', {'since': forged}).status_code, 400)
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_changed_rows_are_paged(self):
+        for student in self.students[1:]:
+            Note.objects.create(etudiant=student, cours=self.cours, valeur=9, publie_par=self.trainer)
+        extra_cours = Cours.objects.create(nom='Réseaux', speciality=self.speciality, promotion=self.promotion, formateur=self.trainer)
+        self.authenticate(self.trainer)
+
+        def sync_all(token=None):
+            pages = [self.sync(token)]
+            while pages[-1]['has_more']:
+                pages.append(self.sync(pages[-1]['token']))
+            return pages
+
+        pages = sync_all()
+        self.assertEqual([len(page['grades']['changed']) for page in pages], [2, 1])
+        self.assertEqual([page['reset'] for page in pages], [True, False])
+        note_ids = [note['id'] for page in pages for note in page['grades']['changed']]
+        self.assertEqual(sorted(note_ids), sorted(Note.objects.values_list('pk', flat=True)))
+        self.assertEqual([cours['id'] for page in pages for cours in page['courses']['changed']], [self.cours.pk, extra_cours.pk])
+
+        # Après la dernière page, le jeton est un jeton ordinaire : rien n'a changé depuis la première page
+        poll = self.sync(pages[-1]['token'])
+        self.assertEqual((poll['reset'], poll['has_more'], poll['grades']['changed']), (False, False, []))
+
+        # Note modifiée pendant la pagination, derrière le curseur : renvoyée au passage suivant
+        first = self.sync()
+        sent = Note.objects.get(pk=first['grades']['changed'][0]['id'])
+        sent.valeur = 15
+        sent.save()
+        pages = sync_all(first['token'])
+        self.assertNotIn(sent.pk, [note['id'] for page in pages for note in page['grades']['changed']])
+        self.assertIn(sent.pk, [note['id'] for page in sync_all(pages[-1]['token']) for note in page['grades']['changed']])
+
+        # Les suppressions sont toutes dans la première page
+        deleted_ids = sorted(Note.objects.values_list('pk', flat=True))[:2]
+        Note.objects.filter(pk__in=deleted_ids).delete()
+        pages = sync_all(pages[-1]['token'])
+        self.assertEqual(sorted(pages[0]['grades']['deleted']), deleted_ids)
+        self.assertTrue(all(not page['grades']['deleted'] for page in pages[1:]))
+
+
+# Format JSON en colonnes pour les grandes listes (user/renderers.py)
+class ColumnarRendererTests(ApiTestCase):
+    def test_list_round_trips_to_the_json_results(self):
+        Note.objects.create(etudiant=self.students[1], cours=self.cours, valeur=8, publie_par=self.trainer)
+        self.authenticate(self.admin)
+        expected = self.client.get('/api/v1/grades/').json()
+        for params, headers in (({'format': 'columnar'}, {}), ({}, {'HTTP_ACCEPT': 'application/vnd.trow.columnar+json'})):
+            response = self.client.get('/api/v1/grades/', params, **headers)
+            self.assertEqual(response['Content-Type'], 'application/vnd.trow.columnar+json')
+            table = response.json()['results']
+            self.assertEqual(table['dictionaries']['cours_nom'], ['Django']) # Répété sur les deux lignes
+            self.assertEqual(from_columnar(table), expected['results'])
+
+    def test_single_object_and_empty_list_are_unchanged(self):
+        self.authenticate(self.admin)
+        detail = self.client.get(f'/api/v1/grades/{self.note.pk}/', {'format': 'columnar'})
+        self.assertEqual(detail.json(), self.client.get(f'/api/v1/grades/{self.note.pk}/').json())
+        self.assertEqual(to_columnar([]), {'columns': [], 'dictionaries': {}, 'rows': []})
+
+    def test_error_responses_are_unchanged(self):
+        # Erreurs d'un POST en liste au format liste (LIST_SERIALIZER_ERRORS_AS_DICT=False) : une liste d'objets
+        errors = [{}, {'valeur': ['Ce champ est obligatoire.']}]
+        renderer = ColumnarJSONRenderer()
+        self.assertEqual(json.loads(renderer.render(errors, renderer_context={'response': Response(errors, status=400)})), errors)
+        self.assertEqual(json.loads(renderer.render(errors, renderer_context={'response': Response(errors)})), to_columnar(errors))
+
+        self.authenticate(self.trainer)
+        payload = [{'etudiant_id': self.students[1].pk, 'cours_id': self.cours.pk}]
+        response = self.client.post('/api/v1/grades/?format=columnar', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), self.client.post('/api/v1/grades/', payload, format='json').json())
+        self.assertEqual(self.client.get('/api/v1/grades/?format=columnar&cursor=nope').json(), {'detail': 'Curseur invalide.'})
+
+    def test_unique_strings_and_nulls_are_not_encoded(self):
+        table = to_columnar([{'nom': 'a', 'groupe': 'x'}, {'nom': 'b', 'groupe': None}, {'nom': 'c', 'groupe': 'x'}])
+        self.assertEqual(table['dictionaries'], {'groupe': ['x']})
+        self.assertEqual(table['rows'], [['a', 0], ['b', None], ['c', 0]])
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_renderers', rows=[1], iterations=1, stdout=out)
+        self.assertIn('colonnes', out.getvalue())
+
+
+# Pagination par curseur (keyset) des listes
+class KeysetPaginationTests(ApiTestCase):
+    def collect(self, url):
+        ids, pages = [], []
+        while url:
+            body = self.client.get(url).json()
+            pages.append(body)
+            ids += [row['id'] for row in body['results']]
+            url = body['next']
+        return ids, pages
+
+    def test_walks_every_note_once_in_order(self):
+        for student in self.students[1:]:
+            Note.objects.create(etudiant=student, cours=self.cours, valeur=10, publie_par=self.trainer)
+        self.authenticate(self.admin)
+        ids, pages = self.collect('/api/v1/grades/?page_size=2')
+        expected = list(Note.objects.order_by('-date_publication', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        # Le lien "previous" de la dernière page ramène exactement la page précédente
+        previous = self.client.get(pages[-1]['previous']).json()
+        self.assertEqual(previous['results'], pages[-2]['results'])
+
+    def test_insert_during_scroll_does_not_shift_pages(self):
+        last = Cours.objects.create(nom='Flutter')
+        self.authenticate(self.admin)
+        first = self.client.get('/api/v1/courses/?page_size=1').json()
+        Cours.objects.create(nom='Algorithmique') # Trié avant la page déjà lue
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['id'] for row in second['results']], [last.pk])
+        self.assertIsNone(second['next'])
+
+    def test_invalid_cursor(self):
+        self.authenticate(self.admin)
+        self.assertEqual(self.client.get('/api/v1/grades/?cursor=invalide').status_code, 404)
+
+    def cursor(self, position, reverse=0):
+        payload = json.dumps({'p': position, 'r': reverse}).encode()
+        return base64.urlsafe_b64encode(payload).decode()
+
+    def test_cursor_values_of_the_wrong_type(self):
+        self.authenticate(self.admin)
+        cases = [
+            ('/api/v1/grades/', ['abc', 1]), ('/api/v1/grades/', [[1], {}]), ('/api/v1/grades/', ['2025-01-01T00:00:00', True]),
+            ('/api/v1/grades/', [None, 1]), ('/api/v1/courses/', ['a', 'zz']), ('/api/v1/profiles/', ['admin', '1.5']),
+        ]
+        for url, position in cases:
+            with self.subTest(url=url, position=position):
+                response = self.client.get(url, {'cursor': self.cursor(position)})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {'detail': 'Curseur invalide.'})
+        # Les valeurs converties restent utilisables : identifiant sous forme de texte
+        response = self.client.get('/api/v1/courses/', {'cursor': self.cursor(['A', str(self.cours.pk)])})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.cours.pk])
+
+    @override_settings(ROOT_URLCONF=settings.ASGI_ROOT_URLCONF)
+    def test_async_list_rejects_wrongly_typed_cursor(self):
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.admin.user)}'}
+        response = async_to_sync(AsyncClient().get)('/api/v1/grades/', {'cursor': self.cursor(['abc', 1])}, headers=headers)
+        self.assertEqual(response.status_code, 404)
+
+
+
+# Générateur de jeu de données synthétique (user/seeding.py, commande seed_scale)
+class SeedScaleTests(TestCase):
+    options = {
+        'specialities': 2, 'years': 1, 'promotions_per_year': 2, 'students_per_promotion': 5,
+        'courses_per_promotion': 3, 'trainers': 3, 'admins': 1, 'grade_density': 0.8, 'seed': 7,
+    }
+
+    def seed(self, prefix):
+        call_command('seed_scale', prefix=prefix, stdout=StringIO(), **self.options)
+        notes = Note.objects.filter(etudiant__user__username__startswith=f'{prefix}_').order_by('id')
+        return list(notes.values_list('valeur', 'cours__coefficient', 'date_publication'))
+
+    def test_counts_and_aggregates(self):
+        self.seed('a')
+        self.assertEqual(Profile.objects.filter(user__username__startswith='a_', role=Profile.Roles.ETUDIANT).count(), 10)
+        self.assertEqual(Cours.objects.filter(nom__startswith='a ').count(), 6)
+        # Les statistiques et relevés sont cohérents avec les notes insérées sans signaux
+        call_command('rebuild_grade_stats', check=True, stdout=StringIO())
+        student = Profile.objects.filter(user__username='a_etudiant1').get()
+        self.assertEqual(len(student.transcript.grades), student.notes_recues.count())
+
+    def test_same_seed_same_data(self):
+        self.assertEqual(self.seed('a'), self.seed('b'))
+
+    def test_password_hashed_once(self):
+        self.seed('a')
+        hashes = set(User.objects.filter(username__startswith='a_').values_list('password', flat=True))
+        self.assertEqual(len(hashes), 1)
+        self.assertTrue(User.objects.get(username='a_etudiant1').check_password('motdepasse'))
+
+
+# Jeu de données pour les tests de plans d'exécution et les budgets des endpoints.
+# 2000 notes par défaut (chaque sous-classe recrée le jeu de données) ; TROW_EXPLAIN_NOTES l'agrandit
+# à la demande (ex: 20000 pour les budgets de durée, 1000000 pour reproduire la production).
+class SeededDatasetTestCase(TestCase):
+    notes_count = int(os.getenv('TROW_EXPLAIN_NOTES', '2000'))
+    courses_count = 40
+    specialities_count = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        specialities = Speciality.objects.bulk_create(
+            [Speciality(name=f'Spécialité {i}') for i in range(cls.specialities_count)]
+        )
+        promotions = Promotion.objects.bulk_create(
+            [Promotion(name=f'Promo {i}', year=2025, speciality=specialities[i % len(specialities)]) for i in range(10)]
+        )
+        students_count = max(1, cls.notes_count // cls.courses_count)
+        users = User.objects.bulk_create(
+            [User(username=f'etudiant{i}') for i in range(students_count)] +
+            [User(username=f'formateur{i}') for i in range(20)] + [User(username='admin')],
+            batch_size=5000
+        )
+        profiles = Profile.objects.bulk_create(
+            [Profile(user=user, role=Profile.Roles.ETUDIANT, promotion=promotions[i % len(promotions)])
+             for i, user in enumerate(users[:students_count])] +
+            [Profile(user=user, role=Profile.Roles.FORMATEUR) for user in users[students_count:-1]] +
+            [Profile(user=users[-1], role=Profile.Roles.ADMIN)],
+            batch_size=5000
+        )
+        cls.students, cls.trainers, cls.admin = profiles[:students_count], profiles[students_count:-1], profiles[-1]
+        cls.trainers[0].assigned_specialities.add(specialities[0])
+        courses = Cours.objects.bulk_create([
+            Cours(nom=f'Cours {i}', speciality=specialities[i % len(specialities)],
+                  promotion=promotions[i % len(promotions)], formateur=cls.trainers[i % len(cls.trainers)])
+            for i in range(cls.courses_count)
+        ])
+        batch = []
+        for student in cls.students:
+            for index, cours in enumerate(courses):
+                batch.append(Note(etudiant=student, cours=cours, valeur=index % 20, publie_par=cls.trainers[index % len(cls.trainers)]))
+                if len(batch) >= 10000:
+                    Note.objects.bulk_create(batch)
+                    batch = []
+        Note.objects.bulk_create(batch)
+        # Statistiques à jour pour le planificateur (comme après un VACUUM ANALYZE en production)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def sequential_scans(self, queryset, table):
+        """Lignes du plan qui parcourent toute la table (sans index)."""
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            return [line for line in plan.splitlines() if f'Seq Scan on {table}' in line]
+        # SQLite : "SCAN table" sans "USING ... INDEX" est un parcours complet
+        return [line for line in plan.splitlines() if re.search(rf'SCAN {table}\b(?! USING)', line)]
+
+    def assert_uses_indexes(self, queryset, table='user_note'):
+        self.assertEqual(self.sequential_scans(queryset, table), [], queryset.explain())
+
+
+# Les filtres de visibilité par rôle n'utilisent ni jointure multi-valuée ni DISTINCT,
+# et chaque branche s'appuie sur un index (user/visibility.py).
+class VisibilityQueryPlanTests(SeededDatasetTestCase):
+    def first_page(self, queryset, pagination):
+        return queryset.order_by(*pagination.ordering)[:pagination.page_size + 1]
+
+    def test_trainer_notes(self):
+        principal = build_principal(self.trainers[0].user)
+        queryset = self.first_page(visible_notes(principal), NotePagination)
+        self.assertNotIn('DISTINCT', str(queryset.query))
+        self.assert_uses_indexes(queryset)
+
+    def test_student_notes(self):
+        principal = build_principal(self.students[0].user)
+        queryset = self.first_page(visible_notes(principal), NotePagination)
+        self.assertNotIn('DISTINCT', str(queryset.query))
+        self.assert_uses_indexes(queryset)
+
+    def test_courses(self):
+        for profile in (self.trainers[0], self.students[0]):
+            queryset = self.first_page(visible_cours(build_principal(profile.user)), CoursPagination)
+            self.assertNotIn('DISTINCT', str(queryset.query))
+
+    def test_trainer_sees_same_notes_as_before(self):
+        # Même résultat que l'ancien filtre OR + DISTINCT
+        trainer = self.trainers[0]
+        principal = build_principal(trainer.user)
+        legacy = Note.objects.filter(
+            Q(cours__formateur=trainer) | Q(cours__speciality__in=trainer.assigned_specialities.all()) | Q(publie_par=trainer)
+        ).distinct()
+        self.assertEqual(
+            set(visible_notes(principal).values_list('id', flat=True)), set(legacy.values_list('id', flat=True))
+        )
+
+
+# Régression des plans d'exécution : chaque liste et chaque détail de l'API, pour chaque rôle,
+# n'exécute que des requêtes indexées sur user_note (index composites de la migration 0005).
+class EndpointQueryPlanTests(SeededDatasetTestCase):
+    def explain_sql(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'EXPLAIN {sql}')
+                return '\n'.join(row[0] for row in cursor.fetchall())
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def assert_endpoint_uses_indexes(self, profile, url):
+        client = APIClient()
+        client.force_authenticate(profile.user)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or 'user_note' not in sql:
+                continue
+            plan = self.explain_sql(sql)
+            if connection.vendor == 'postgresql':
+                scans = re.findall(r'Seq Scan on user_note\b', plan)
+            else:
+                scans = re.findall(r'SCAN user_note\b(?! USING)', plan)
+            self.assertEqual(scans, [], f'{url} ({profile.role})\n{sql}\n{plan}')
+
+    def test_note_endpoints(self):
+        note = Note.objects.filter(etudiant=self.students[0]).first()
+        for profile in (self.admin, self.trainers[0], self.students[0]):
+            self.assert_endpoint_uses_indexes(profile, '/api/v1/grades/')
+            self.assert_endpoint_uses_indexes(profile, '/api/v1/grades/?page_size=200')
+        for profile in (self.admin, self.students[0]):
+            self.assert_endpoint_uses_indexes(profile, f'/api/v1/grades/{note.pk}/')
+
+    def test_course_endpoints(self):
+        cours = Cours.objects.filter(promotion=self.students[0].promotion).first()
+        for profile in (self.admin, self.trainers[0], self.students[0]):
+            self.assert_endpoint_uses_indexes(profile, '/api/v1/courses/')
+            self.assert_endpoint_uses_indexes(profile, f'/api/v1/courses/{cours.pk}/')
+            self.assert_endpoint_uses_indexes(profile, f'/api/v1/courses/{cours.pk}/stats/')
+
+    def test_profile_and_reference_endpoints(self):
+        student = self.students[0]
+        for url in ('/api/v1/profiles/', f'/api/v1/profiles/{student.pk}/', f'/api/v1/profiles/{student.pk}/transcript/',
+                    '/api/v1/specialities/', '/api/v1/promotions/'):
+            self.assert_endpoint_uses_indexes(self.admin, url)
+        self.assert_endpoint_uses_indexes(student, f'/api/v1/profiles/{student.pk}/transcript/')
+
+
+
+# Budgets de performance par endpoint : nombre maximal de requêtes SQL et durée maximale (ms),
+# pour chaque rôle et chaque action. Chaque entrée : (action, méthode, url, {rôle: (statut attendu, requêtes max)},
+# durée max[, options]). Options : 'data' (corps JSON), 'file' (contenu d'un fichier CSV envoyé en multipart),
+# 'auth' (False : sans jeton, ex: obtention du jeton), 'settings' (réglages appliqués pendant l'appel).
+# L'url et les données sont complétées avant chaque appel, hors mesure : identifiants du jeu de données
+# ({note}, {cours}, {etudiant}...), objet neuf pour les {fresh_*} (suppressions et créations répétées)
+# et numéro unique pour {n} (noms d'utilisateur, de cours...).
+# Une régression (select_related oublié, requête par ligne) fait échouer le test de l'endpoint concerné.
+# Les durées supposent un hachage de mot de passe rapide (MD5, voir EndpointBudgetTests) : avec PBKDF2
+# (~0,5 s par mot de passe), le jeton, l'inscription et l'import seraient dominés par le hachage.
+ANONYMOUS = {'auth': False}
+ENDPOINT_BUDGETS = (
+    ('token', 'post', '/api/v1/token/', {'admin': (200, 1), 'formateur': (200, 1), 'etudiant': (200, 1)}, 100,
+     {**ANONYMOUS, 'data': {'username': '{username}', 'password': '{password}'}}),
+    ('token-refresh', 'post', '/api/v1/token/refresh/', {'admin': (200, 1), 'formateur': (200, 1), 'etudiant': (200, 1)}, 100,
+     {**ANONYMOUS, 'data': {'refresh': '{fresh_refresh_token}'}}),
+
+    ('profiles-list', 'get', '/api/v1/profiles/', {'admin': (200, 4), 'formateur': (403, 2), 'etudiant': (403, 2)}, 150),
+    ('profiles-retrieve', 'get', '/api/v1/profiles/{self}/', {'admin': (200, 4), 'formateur': (200, 4), 'etudiant': (200, 4)}, 100),
+    ('profiles-create', 'post', '/api/v1/profiles/', {'admin': (201, 8), 'formateur': (403, 2), 'etudiant': (403, 2)}, 200,
+     {'data': {'username': 'nouveau{n}', 'email': 'nouveau{n}@example.com', 'password': 'motdepasse', 'role': 'etudiant', 'promotion_id': '{promotion}'}}),
+    ('profiles-update', 'put', '/api/v1/profiles/{fresh_profile}/', {'admin': (200, 9), 'formateur': (403, 2), 'etudiant': (403, 2)}, 100,
+     {'data': {'user': {'username': 'renomme{n}', 'email': 'renomme{n}@example.com'}, 'role': 'etudiant', 'promotion_id': '{promotion}'}}),
+    ('profiles-partial-update', 'patch', '/api/v1/profiles/{fresh_profile}/', {'admin': (200, 7), 'formateur': (403, 2), 'etudiant': (403, 2)}, 100,
+     {'data': {'user': {'first_name': 'Camille'}}}),
+    ('profiles-destroy', 'delete', '/api/v1/profiles/{fresh_profile}/', {'admin': (204, 15), 'formateur': (403, 2), 'etudiant': (403, 2)}, 100),
+    ('profiles-register', 'post', '/api/v1/profiles/register/', {'admin': (201, 6), 'formateur': (201, 6), 'etudiant': (201, 6)}, 200,
+     {**ANONYMOUS, 'data': {'username': 'inscrit{n}', 'email': 'inscrit{n}@example.com', 'password': 'motdepasse', 'role': 'etudiant', 'promotion_id': '{promotion}'}}),
+    ('profiles-import', 'post', '/api/v1/profiles/import/', {'admin': (201, 9), 'formateur': (403, 2), 'etudiant': (403, 2)}, 300,
+     {'data': {'users': [{'username': f'importe{{n}}_{i}', 'email': f'importe{{n}}_{i}@example.com', 'password': 'x', 'role': 'etudiant'} for i in range(20)]}}),
+    ('profiles-transcript', 'get', '/api/v1/profiles/{etudiant}/transcript/', {'admin': (200, 4), 'formateur': (403, 2), 'etudiant': (200, 4)}, 100),
+
+    ('courses-list', 'get', '/api/v1/courses/', {'admin': (200, 4), 'formateur': (200, 4), 'etudiant': (200, 4)}, 150),
+    ('courses-retrieve', 'get', '/api/v1/courses/{cours}/', {'admin': (200, 4), 'formateur': (200, 4), 'etudiant': (200, 4)}, 100),
+    ('courses-create', 'post', '/api/v1/courses/', {'admin': (201, 10), 'formateur': (201, 6), 'etudiant': (403, 2)}, 100,
+     {'data': {'nom': 'Budget {n}', 'speciality_id': '{trainer_speciality}'}}),
+    ('courses-update', 'put', '/api/v1/courses/{fresh_cours}/', {'admin': (200, 9), 'formateur': (200, 9), 'etudiant': (403, 2)}, 100,
+     {'data': {'nom': 'Renommé {n}', 'speciality_id': '{trainer_speciality}', 'coefficient': '2'}}),
+    ('courses-partial-update', 'patch', '/api/v1/courses/{fresh_cours}/', {'admin': (200, 5), 'formateur': (200, 5), 'etudiant': (403, 2)}, 100,
+     {'data': {'description': 'Mise à jour {n}'}}),
+    ('courses-destroy', 'delete', '/api/v1/courses/{fresh_cours}/', {'admin': (204, 9), 'formateur': (204, 9), 'etudiant': (403, 2)}, 100),
+    ('courses-stats', 'get', '/api/v1/courses/{cours}/stats/', {'admin': (200, 4), 'formateur': (200, 4), 'etudiant': (200, 4)}, 100),
+
+    ('grades-list', 'get', '/api/v1/grades/', {'admin': (200, 3), 'formateur': (200, 3), 'etudiant': (200, 3)}, 200),
+    ('grades-retrieve', 'get', '/api/v1/grades/{note}/', {'admin': (200, 3), 'formateur': (200, 3), 'etudiant': (200, 3)}, 100),
+    ('grades-create', 'post', '/api/v1/grades/', {'admin': (403, 2), 'formateur': (201, 22), 'etudiant': (403, 2)}, 100,
+     {'data': {'etudiant_id': '{etudiant}', 'cours_id': '{fresh_cours}', 'valeur': '12.50'}}),
+    ('grades-update', 'put', '/api/v1/grades/{note}/', {'admin': (200, 18), 'formateur': (200, 18), 'etudiant': (403, 2)}, 100,
+     {'data': {'etudiant_id': '{etudiant}', 'cours_id': '{note_cours}', 'valeur': '{valeur}'}}),
+    ('grades-partial-update', 'patch', '/api/v1/grades/{note}/', {'admin': (200, 15), 'formateur': (200, 15), 'etudiant': (403, 2)}, 100,
+     {'data': {'valeur': '{valeur}'}}),
+    ('grades-destroy', 'delete', '/api/v1/grades/{fresh_note}/', {'admin': (204, 15), 'formateur': (204, 15), 'etudiant': (403, 2)}, 100),
+    ('grades-bulk', 'post', '/api/v1/grades/bulk/', {'admin': (403, 2), 'formateur': (200, 20), 'etudiant': (403, 2)}, 200,
+     {'data': {'cours_id': '{note_cours}', 'notes': [{'etudiant_id': '{etudiant}', 'valeur': '{valeur}'}, {'etudiant_id': '{etudiant2}', 'valeur': '9'}]}}),
+    ('grades-import', 'post', '/api/v1/grades/import/', {'admin': (403, 2), 'formateur': (200, 19), 'etudiant': (403, 2)}, 200,
+     {'file': 'username,course,grade\n{etudiant_username},{note_cours_nom},{valeur}\n{etudiant2_username},{note_cours_nom},8\n'}),
+    ('grades-export-csv', 'get', '/api/v1/grades/export_csv/', {'admin': (200, 4), 'formateur': (200, 4), 'etudiant': (200, 4)}, 3000),
+    # 202 au premier appel, puis 200 : l'export identique est réutilisé
+    ('grades-exports', 'post', '/api/v1/grades/exports/', {'admin': (200, 7), 'formateur': (200, 7), 'etudiant': (200, 7)}, 100),
+    ('grades-export-detail', 'get', '/api/v1/grades/exports/{done_export}/', {'admin': (200, 3), 'formateur': (200, 3), 'etudiant': (200, 3)}, 100),
+    ('grades-export-download', 'get', '/api/v1/grades/exports/{done_export}/download/', {'admin': (200, 3), 'formateur': (200, 3), 'etudiant': (200, 3)}, 1000),
+
+    ('specialities-list', 'get', '/api/v1/specialities/', {'admin': (200, 3), 'formateur': (200, 3), 'etudiant': (200, 3)}, 100),
+    ('specialities-retrieve', 'get', '/api/v1/specialities/{speciality}/', {'admin': (200, 3), 'formateur': (200, 3), 'etudiant': (200, 3)}, 100),
+    ('specialities-create', 'post', '/api/v1/specialities/', {'admin': (201, 9), 'formateur': (403, 2), 'etudiant': (403, 2)}, 100,
+     {'data': {'name': 'Budget {n}'}}),
+    ('specialities-update', 'put', '/api/v1/specialities/{fresh_speciality}/', {'admin': (200, 8), 'formateur': (403, 2), 'etudiant': (403, 2)}, 100,
+     {'data': {'name': 'Renommée {n}', 'description': 'Mise à jour'}}),
+    ('specialities-partial-update', 'patch', '/api/v1/specialities/{fresh_speciality}/', {'admin': (200, 7), 'formateur': (403, 2), 'etudiant': (403, 2)}, 100,
+     {'data': {'description': 'Mise à jour {n}'}}),
+    ('specialities-destroy', 'delete', '/api/v1/specialities/{fresh_speciality}/', {'admin': (204, 10), 'formateur': (403, 2), 'etudiant': (403, 2)}, 100),
+
+    ('promotions-list', 'get', '/api/v1/promotions/', {'admin': (200, 3), 'formateur': (200, 3), 'etudiant': (200, 3)}, 100),
+    ('promotions-retrieve', 'get', '/api/v1/promotions/{promotion}/', {'admin': (200, 3), 'formateur': (200, 3), 'etudiant': (200, 3)}, 100),
+    ('promotions-create', 'post', '/api/v1/promotions/', {'admin': (201, 10), 'formateur': (403, 2), 'etudiant': (403, 2)}, 100,
+     {'data': {'name': 'Budget {n}', 'year': 2030, 'speciality': '{speciality}'}}),
+    ('promotions-update', 'put', '/api/v1/promotions/{fresh_promotion}/', {'admin': (200, 8), 'formateur': (403, 2), 'etudiant': (403, 2)}, 100,
+     {'data': {'name': 'Renommée {n}', 'year': 2031, 'speciality': '{speciality}'}}),
+    ('promotions-partial-update', 'patch', '/api/v1/promotions/{fresh_promotion}/', {'admin': (200, 6), 'formateur': (403, 2), 'etudiant': (403, 2)}, 100,
+     {'data': {'year': 2032}}),
+    ('promotions-destroy', 'delete', '/api/v1/promotions/{fresh_promotion}/', {'admin': (204, 8), 'formateur': (403, 2), 'etudiant': (403, 2)}, 100),
+    ('promotions-gradebook', 'get', '/api/v1/promotions/{promotion}/gradebook/', {'admin': (200, 5), 'formateur': (200, 5), 'etudiant': (403, 2)}, 1000),
+
+    ('sync', 'get', '/api/v1/sync/', {'admin': (200, 5), 'formateur': (200, 5), 'etudiant': (200, 5)}, 300), # Première page d'une synchronisation complète (SYNC_PAGE_SIZE lignes)
+    ('metrics', 'get', '/api/v1/_metrics', {'admin': (200, 2), 'formateur': (403, 2), 'etudiant': (403, 2)}, 100,
+     {'settings': {'REQUEST_PROFILING': True}}),
+)
+
+
+class BudgetPlaceholders(dict):
+    """Valeurs des {champs} d'une entrée de ENDPOINT_BUDGETS ; les autres sont créées à la première lecture."""
+    def __init__(self, factory, values):
+        super().__init__(values)
+        self.factory = factory
+
+    def __missing__(self, key):
+        self[key] = value = self.factory(key)
+        return value
+
+
+# Harnais de budgets de performance : chaque endpoint du routeur est appelé pour chaque rôle sur le
+# jeu de données (TROW_EXPLAIN_NOTES notes), avec une authentification JWT réelle.
+# Les nombres de requêtes sont toujours vérifiés. Les durées (médiane de TROW_PERF_REPEAT appels, 3 par défaut)
+# ne le sont qu'avec TROW_PERF_BUDGET_FACTOR, qui multiplie les budgets de durée (1 : budgets tels quels,
+# 2 : machine deux fois plus lente) : sur une machine d'intégration partagée, une durée n'est pas reproductible.
+# Avec TROW_PERF_RESULTS (chemin d'un fichier, ou 1 pour
+# var/perf/endpoint-budgets-<date>.json), les mesures sont écrites en JSON pour comparer les exécutions entre elles.
+# Fonctionne sur SQLite sans service externe : DB_ENGINE=sqlite TROW_EXPLAIN_NOTES=20000 TROW_PERF_BUDGET_FACTOR=1 python manage.py test user
+# Mots de passe hachés en MD5, dans le processus (PASSWORD_HASH_WORKERS=1) : le coût de PBKDF2 est voulu
+# en production et ne dit rien des requêtes de l'endpoint.
+@override_settings(
+    EXPORT_WORKER='command', PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], PASSWORD_HASH_WORKERS=1,
+)
+class EndpointBudgetTests(SeededDatasetTestCase):
+    password = 'motdepasse-perf'
+    repeat = max(1, int(os.getenv('TROW_PERF_REPEAT', '3')))
+    budget_factor = float(os.getenv('TROW_PERF_BUDGET_FACTOR') or 0) # 0 : durées mesurées, non vérifiées
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.profiles = {'admin': cls.admin, 'formateur': cls.trainers[0], 'etudiant': cls.students[0]}
+        for profile in cls.profiles.values():
+            profile.user.set_password(cls.password)
+            profile.user.save(update_fields=['password'])
+
+    @classmethod
+    def setUpClass(cls):
+        # Hors de setUpTestData : les attributs qui y sont créés sont copiés pour chaque test
+        cls.results = []
+        cls.counter = iter(range(10 ** 9))
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.write_results()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp() # Fichiers des exports
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    @classmethod
+    def write_results(cls):
+        path = os.getenv('TROW_PERF_RESULTS')
+        if not path or not cls.results:
+            return
+        if path == '1':
+            path = str(Path(settings.BASE_DIR) / 'var' / 'perf' / f"endpoint-budgets-{datetime.now():%Y%m%d-%H%M%S}.json")
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        report = {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'notes': cls.notes_count,
+            'repeat': cls.repeat,
+            'results': cls.results,
+        }
+        Path(path).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    def placeholders(self, role):
+        student, other_student = self.profiles['etudiant'], self.students[1]
+        cours = Cours.objects.filter(promotion_id=student.promotion_id).first()
+        note = (Note.objects.filter(etudiant=student, cours__formateur=self.trainers[0]).select_related('cours').first()
+                or Note.objects.filter(etudiant=student).select_related('cours').first())
+        n = next(self.counter)
+        values = {
+            'n': n,
+            'valeur': str(10 + n % 10), # Change à chaque appel : la mise à jour n'est jamais un no-op
+            'self': self.profiles[role].pk,
+            'username': self.profiles[role].user.username,
+            'password': self.password,
+            'etudiant': student.pk,
+            'etudiant_username': student.user.username,
+            'etudiant2': other_student.pk,
+            'etudiant2_username': other_student.user.username,
+            'cours': cours.pk,
+            'note': note.pk,
+            'note_cours': note.cours_id,
+            'note_cours_nom': note.cours.nom,
+            'speciality': cours.speciality_id,
+            'trainer_speciality': self.trainers[0].assigned_specialities.get().pk,
+            'promotion': student.promotion_id,
+        }
+        return BudgetPlaceholders(lambda key: self.create_fixture(key, role, values), values)
+
+    def create_fixture(self, key, role, values):
+        # Objet créé pour un seul appel (hors mesure) : il peut être modifié ou supprimé sans gêner les suivants
+        n, trainer = values['n'], self.trainers[0]
+        if key == 'fresh_cours':
+            return Cours.objects.create(
+                nom=f'Budget {n}', speciality_id=values['trainer_speciality'], promotion_id=values['promotion'], formateur=trainer,
+            ).pk
+        if key == 'fresh_note':
+            cours = Cours.objects.create(nom=f'Budget note {n}', speciality_id=values['trainer_speciality'], formateur=trainer)
+            return Note.objects.create(etudiant_id=values['etudiant'], cours=cours, valeur=10, publie_par=trainer).pk
+        if key == 'fresh_profile':
+            user = User.objects.create_user(f'budget{n}', f'budget{n}@example.com')
+            return Profile.objects.create(user=user, role=Profile.Roles.ETUDIANT, promotion_id=values['promotion']).pk
+        if key == 'fresh_speciality':
+            return Speciality.objects.create(name=f'Budget {n}').pk
+        if key == 'fresh_promotion':
+            return Promotion.objects.create(name=f'Budget {n}', year=2030, speciality_id=values['speciality']).pk
+        if key == 'fresh_refresh_token':
+            return str(RefreshToken.for_user(self.profiles[role].user))
+        if key == 'done_export':
+            job, _ = request_export(build_principal(self.profiles[role].user))
+            run_export_job(job.pk)
+            return job.pk
+        raise KeyError(key)
+
+    def fill(self, data, values):
+        if isinstance(data, str):
+            return data.format_map(values)
+        if isinstance(data, dict):
+            return {key: self.fill(value, values) for key, value in data.items()}
+        if isinstance(data, list):
+            return [self.fill(value, values) for value in data]
+        return data
+
+    def call(self, role, method, url, options, values):
+        client = APIClient()
+        if options.get('auth', True):
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.profiles[role].user)}')
+        if 'file' in options:
+            upload = SimpleUploadedFile('notes.csv', options['file'].format_map(values).encode(), content_type='text/csv')
+            response = getattr(client, method)(url, {'file': upload}, format='multipart')
+        else:
+            response = getattr(client, method)(url, options.get('data'), format='json')
+        if response.streaming: # Les exports CSV ne sont lus (et mesurés) qu'en consommant le flux
+            b''.join(response.streaming_content)
+        return response
+
+    def measure(self, action, method, url_template, roles, max_ms, options):
+        for role, (expected_status, max_queries) in roles.items():
+            timings, queries = [], 0
+            for _ in range(self.repeat):
+                get_response_cache().clear() # Mesure du chemin complet, pas d'un succès du cache
+                values = self.placeholders(role)
+                url = url_template.format_map(values)
+                call_options = {**options, 'data': self.fill(options.get('data'), values)}
+                with override_settings(**options.get('settings', {})), CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    response = self.call(role, method, url, call_options, values)
+                    timings.append((time.perf_counter() - start) * 1000)
+                queries = max(queries, len(context.captured_queries))
+            duration = statistics.median(timings)
+            budget_ms = max_ms * self.budget_factor if self.budget_factor else None
+            self.results.append({
+                'action': action, 'role': role, 'method': method.upper(), 'url': url,
+                'status': response.status_code, 'queries': queries, 'max_queries': max_queries,
+                'ms': round(duration, 3), 'max_ms': budget_ms,
+            })
+            with self.subTest(action=action, role=role):
+                self.assertEqual(response.status_code, expected_status, f'{url} {getattr(response, "data", "")}')
+                self.assertLessEqual(queries, max_queries, [q['sql'] for q in context.captured_queries])
+                if budget_ms is not None:
+                    self.assertLessEqual(duration, budget_ms, f"{action} ({role}) : {duration:.1f} ms")
+
+    def test_endpoint_budgets(self):
+        for action, method, url, roles, max_ms, *options in ENDPOINT_BUDGETS:
+            self.measure(action, method, url, roles, max_ms, options[0] if options else {})
@@ -4,7 +4,7 @@ from rest_framework.routers import DefaultRouter
 from django.urls import path, include
 from .views import (
     UserProfileViewSet, CoursViewSet, NoteViewSet,
-    SpecialityViewSet, PromotionViewSet
+    SpecialityViewSet, PromotionViewSet, SyncViewSet, MetricsView
 )
 
 # DefaultRouter génère automatiquement les URLs pour les opérations CRUD (list, retrieve, create, update, delete)
@@ -19,10 +19,13 @@ router.register(r'courses', CoursViewSet, basename='course')
 router.register(r'grades', NoteViewSet, basename='grade')
 router.register(r'specialities', SpecialityViewSet, basename='speciality')
 router.register(r'promotions', PromotionViewSet, basename='promotion')
+router.register(r'sync', SyncViewSet, basename='sync') # Flux de synchronisation incrémentale (notes et cours)
 
 urlpatterns = [
     # Inclut toutes les URLs générées par le routeur
     path('', include(router.urls)),
+    # Histogrammes de latence au format Prometheus (user/profiling.py), réservé aux administrateurs
+    path('_metrics', MetricsView.as_view(), name='metrics'),
     # L'action personnalisée 'register' du UserProfileViewSet est accessible via /api/profiles/register/
     # (Pas besoin de la lister explicitement ici car @action la gère)
 ]
\ No newline at end of file
@@ -0,0 +1,54 @@
+# user/versioning.py
+
+# Compteurs de version par table pour les GET conditionnels (voir user/conditional.py).
+# Chaque écriture sur une table versionnée incrémente son compteur dans la même transaction
+# (récepteurs dans user/signals.py) : une réponse gardée par le client reste valide tant que
+# les compteurs des tables qu'elle a lues n'ont pas changé.
+# Les écritures qui n'émettent pas de signaux (QuerySet.update, bulk_create) doivent appeler
+# bump_table_version elles-mêmes.
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import TableVersion
+
+
+def table_label(model):
+    """Libellé d'un modèle dans TableVersion (ex: 'user.cours')."""
+    return model._meta.label_lower
+
+
+def bump_table_version(model):
+    """Incrémente la version de la table d'un modèle (la ligne est créée à la première écriture)."""
+    label = table_label(model)
+    now = timezone.now()
+    if TableVersion.objects.filter(table=label).update(version=F('version') + 1, updated_at=now):
+        return
+    _, created = TableVersion.objects.get_or_create(table=label, defaults={'version': 1, 'updated_at': now})
+    if not created:
+        # Ligne créée entre-temps par une autre transaction : l'incrément ne doit pas être perdu
+        TableVersion.objects.filter(table=label).update(version=F('version') + 1, updated_at=now)
+
+
+def _table_versions_queryset(labels):
+    return TableVersion.objects.filter(table__in=labels).values_list('table', 'version', 'updated_at')
+
+
+def _table_versions(labels, rows):
+    found = {table: (version, updated_at) for table, version, updated_at in rows}
+    return [(label, *found.get(label, (0, None))) for label in labels]
+
+
+def get_table_versions(models):
+    """
+    Retourne [(libellé, version, updated_at), ...] pour les modèles donnés, en une requête.
+    Une table jamais modifiée depuis la création des compteurs a la version 0 et updated_at None.
+    """
+    labels = [table_label(model) for model in models]
+    return _table_versions(labels, _table_versions_queryset(labels))
+
+
+async def aget_table_versions(models):
+    """Version asynchrone de get_table_versions (vues asynchrones, voir user/async_views.py)."""
+    labels = [table_label(model) for model in models]
+    return _table_versions(labels, [row async for row in _table_versions_queryset(labels)])
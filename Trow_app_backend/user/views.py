@@ -1,23 +1,46 @@
 # user/views.py
 
 from rest_framework import viewsets, status, permissions
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action # Permet d'ajouter des actions personnalisées aux ViewSets
-from django.db.models import Q # Pour construire des requêtes complexes avec des conditions OR
-from django.http import HttpResponse # Pour générer des réponses HTTP pour les fichiers (CSV)
-import csv # Bibliothèque Python pour lire et écrire des fichiers CSV
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError # PermissionDenied : erreur 403 levée par les vérifications de permission des formateurs
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from django.http import StreamingHttpResponse # Pour envoyer les fichiers (CSV) en flux
 from datetime import datetime # Pour générer des noms de fichiers basés sur la date/heure
-from django.http import Http404
+from django.http import FileResponse, Http404
+from django.db.models import Prefetch
+from django.contrib.auth.models import User
 
-from .models import Profile, Cours, Note, Speciality, Promotion
+from .models import Profile, Cours, Note, Speciality, Promotion, CourseGradeStats, StudentTranscript, ExportJob
 from .serializers import (
     ProfileSerializer, RegisterSerializer, UserSerializer, CoursSerializer, NoteSerializer,
-    SpecialitySerializer, PromotionSerializer
+    SpecialitySerializer, PromotionSerializer, NoteBulkSerializer, NoteBulkItemSerializer,
+    StudentTranscriptSerializer, ExportJobSerializer
 )
+from .pagination import (
+    NotePagination, CoursPagination, ProfilePagination, SpecialityPagination, PromotionPagination
+)
+from .principal import get_principal
+from .visibility import cours_scope, visible_cours, visible_notes
+from .conditional import ConditionalGetMixin
+from .response_cache import ResponseCacheMixin
+from .fieldsets import SparseFieldsetViewMixin
+from .profiling import ProfiledViewMixin, profiling_enabled, registry
+from .renderers import PrometheusTextRenderer
+from .services import upsert_notes
+from .exports import iter_notes_csv
+from .export_jobs import can_access_export, request_export
+from .sync import InvalidSyncToken, sync_changes
+from .gradebook import build_gradebook, iter_gradebook_csv
+from .imports import ImportFormatError, create_users, get_request_rows, validate_rows
+from .grade_imports import import_grades
 
 # --- Classes de Permissions Personnalisées ---
 # DRF utilise des classes de permission pour contrôler l'accès aux API.
 # Ces classes définissent qui peut faire quoi en fonction de leur rôle.
+# Le rôle est lu sur le Principal de la requête (voir user/principal.py), construit une seule fois
+# même si plusieurs classes de permission sont évaluées.
 
 class IsAdmin(permissions.BasePermission):
     """
@@ -26,9 +49,8 @@ class IsAdmin(permissions.BasePermission):
     message = "Seuls les administrateurs ont la permission d'effectuer cette action."
     def has_permission(self, request, view):
         # Vérifie si l'utilisateur est authentifié et si son profil a le rôle 'admin'
-        return request.user.is_authenticated and \
-               hasattr(request.user, 'profile') and \
-               request.user.profile.role == Profile.Roles.ADMIN
+        principal = get_principal(request)
+        return principal is not None and principal.is_admin
 
 class IsTrainer(permissions.BasePermission):
     """
@@ -36,9 +58,8 @@ class IsTrainer(permissions.BasePermission):
     """
     message = "Seuls les formateurs ont la permission d'effectuer cette action."
     def has_permission(self, request, view):
-        return request.user.is_authenticated and \
-               hasattr(request.user, 'profile') and \
-               request.user.profile.role == Profile.Roles.FORMATEUR
+        principal = get_principal(request)
+        return principal is not None and principal.is_trainer
 
 class IsAdminOrTrainer(permissions.BasePermission):
     """
@@ -46,16 +67,17 @@ class IsAdminOrTrainer(permissions.BasePermission):
     """
     message = "Seuls les administrateurs ou les formateurs ont la permission d'effectuer cette action."
     def has_permission(self, request, view):
-        return request.user.is_authenticated and \
-               hasattr(request.user, 'profile') and \
-               request.user.profile.role in [Profile.Roles.ADMIN, Profile.Roles.FORMATEUR]
+        principal = get_principal(request)
+        return principal is not None and (principal.is_admin or principal.is_trainer)
 
 # --- ViewSets pour les entités Spécialité, Promotion, Profil, Cours, Note ---
 
-class AdminWriteIsAuthenticatedReadViewSet(viewsets.ModelViewSet):
+class AdminWriteIsAuthenticatedReadViewSet(ProfiledViewMixin, SparseFieldsetViewMixin, ResponseCacheMixin, viewsets.ModelViewSet):
     """
     Un ViewSet de base qui autorise la lecture pour tout utilisateur authentifié
     et l'écriture uniquement pour les administrateurs.
+    Les lectures portent un ETag et un Last-Modified (voir user/conditional.py) et sont servies
+    depuis le cache partagé des réponses (voir user/response_cache.py).
     """
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -68,24 +90,65 @@ class AdminWriteIsAuthenticatedReadViewSet(viewsets.ModelViewSet):
 class SpecialityViewSet(AdminWriteIsAuthenticatedReadViewSet):
     queryset = Speciality.objects.all() # Requête de base pour récupérer toutes les spécialités
     serializer_class = SpecialitySerializer # Sérialiseur à utiliser pour cette vue
+    pagination_class = SpecialityPagination # Pagination par curseur sur le nom
+    version_models = (Speciality,) # Tables lues par la réponse (ETag)
 
 # ViewSet pour la gestion des Promotions (/api/promotions/)
 class PromotionViewSet(AdminWriteIsAuthenticatedReadViewSet):
-    queryset = Promotion.objects.all()
+    queryset = Promotion.objects.select_related('speciality') # speciality_name sans une requête par promotion
     serializer_class = PromotionSerializer
+    pagination_class = PromotionPagination
+    version_models = (Promotion, Speciality) # speciality_name est lu sur la spécialité
+
+    def get_permissions(self):
+        if self.action == 'gradebook':
+            return [IsAdminOrTrainer()]
+        return super().get_permissions()
+
+    # Action personnalisée pour le tableau de notes d'une promotion (une ligne par étudiant, une colonne par cours,
+    # moyennes par ligne et par colonne). Accessible via GET /api/promotions/{id}/gradebook/ (JSON) ou
+    # GET /api/promotions/{id}/gradebook/?output=csv (CSV en flux). Un formateur ne voit que les colonnes de ses cours visibles.
+    # Le nombre de requêtes est constant, quelle que soit la taille de la promotion (voir user/gradebook.py).
+    @action(detail=True, methods=['get'])
+    def gradebook(self, request, pk=None):
+        promotion = self.get_object()
+        principal = get_principal(request)
+        if request.query_params.get('output') == 'csv':
+            response = StreamingHttpResponse(iter_gradebook_csv(promotion, principal), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = f'attachment; filename="notes_promotion_{promotion.pk}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
+            return response
+        return Response(build_gradebook(promotion, principal))
 
 # ViewSet pour la gestion des Profils utilisateurs (/api/profiles/)
-class UserProfileViewSet(viewsets.ModelViewSet):
+class UserProfileViewSet(ProfiledViewMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Profile.objects.all()
     serializer_class = ProfileSerializer
+    pagination_class = ProfilePagination
+
+    # Le sérialiseur lit l'utilisateur, la promotion, la spécialité de la promotion et les spécialités
+    # assignées : tout est chargé en un nombre fixe de requêtes par page (jointures + une requête
+    # groupée pour la relation many-to-many), quel que soit le nombre de profils.
+    def get_queryset(self):
+        return Profile.objects.select_related('user', 'promotion__speciality').only(
+            'id', 'role', 'user_id', 'promotion_id',
+            # Colonnes de UserSerializer
+            'user__id', 'user__username', 'user__email', 'user__first_name', 'user__last_name',
+            # promotion_name et speciality_name
+            'promotion__id', 'promotion__name', 'promotion__speciality_id',
+            'promotion__speciality__id', 'promotion__speciality__name',
+        ).prefetch_related(
+            # Colonnes de SpecialitySerializer
+            Prefetch('assigned_specialities', queryset=Speciality.objects.only('id', 'name', 'description'))
+        )
 
     def get_permissions(self):
         # La permission varie selon l'action demandée
         if self.action == 'register':
             # L'inscription est accessible à tous (même non authentifiés)
             permission_classes = [permissions.AllowAny]
-        elif self.action in ['list', 'create', 'update', 'partial_update', 'destroy']:
-            # Seuls les administrateurs peuvent lister tous les profils, créer d'autres rôles, les modifier ou les supprimer.
+        elif self.action in ['list', 'create', 'update', 'partial_update', 'destroy', 'import_users']:
+            # Seuls les administrateurs peuvent lister tous les profils, créer d'autres rôles (un par un ou par import),
+            # les modifier ou les supprimer.
             permission_classes = [IsAdmin]
         elif self.action == 'retrieve':
             # Voir un profil spécifique : tout utilisateur authentifié peut le faire, la logique de restriction est dans `retrieve`
@@ -113,13 +176,58 @@ class UserProfileViewSet(viewsets.ModelViewSet):
             return Response({"detail": "Profil non trouvé."}, status=status.HTTP_404_NOT_FOUND)
 
         # Si l'utilisateur est admin, ou si c'est son propre profil, alors il peut le voir
-        if request.user.profile.role == Profile.Roles.ADMIN or profile == request.user.profile:
+        principal = get_principal(request)
+        if principal.is_admin or profile.pk == principal.profile_id:
             serializer = self.get_serializer(profile)
             return Response(serializer.data)
         
         # Sinon, accès refusé
         return Response({"detail": "Vous n'avez pas la permission de voir ce profil."}, status=status.HTTP_403_FORBIDDEN)
 
+    # Action personnalisée pour le relevé de notes d'un étudiant (notes par cours, moyennes générale et par spécialité)
+    # Accessible via GET /api/profiles/{id}/transcript/
+    # Le relevé est précalculé (StudentTranscript) : une seule lecture par clé primaire.
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def transcript(self, request, pk=None):
+        if not str(pk).isdigit():
+            return Response({"detail": "Profil non trouvé."}, status=status.HTTP_404_NOT_FOUND)
+        principal = get_principal(request)
+        # Même règle que retrieve : un utilisateur ne voit que son propre relevé, sauf les administrateurs
+        if not principal.is_admin and str(principal.profile_id) != str(pk):
+            return Response({"detail": "Vous n'avez pas la permission de voir ce relevé."}, status=status.HTTP_403_FORBIDDEN)
+
+        transcript = StudentTranscript.objects.filter(etudiant_id=pk).first()
+        if transcript is None:
+            # Pas encore de note : relevé vide, si le profil existe
+            if not Profile.objects.filter(pk=pk).exists():
+                return Response({"detail": "Profil non trouvé."}, status=status.HTTP_404_NOT_FOUND)
+            transcript = StudentTranscript(etudiant_id=int(pk))
+        return Response(StudentTranscriptSerializer(transcript, context={'request': request}).data) # request : ?fields= / ?omit=
+
+    # Action personnalisée pour l'import groupé d'utilisateurs (rentrée d'une promotion, nouveaux formateurs)
+    # Accessible via POST /api/profiles/import/ avec un fichier CSV (champ 'file', colonnes username, email,
+    # password, role, first_name, last_name, promotion_id) ou du JSON ({"users": [{...}, ...]}).
+    # L'import est tout ou rien : si une ligne est invalide, aucune n'est créée et toutes les erreurs sont renvoyées.
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[JSONParser, MultiPartParser, FormParser])
+    def import_users(self, request):
+        try:
+            rows = get_request_rows(request)
+        except ImportFormatError as error:
+            return Response({"detail": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        valid_rows, errors = validate_rows(rows)
+        if errors:
+            return Response({'created': 0, 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        profiles = create_users(valid_rows)
+        return Response({
+            'created': len(profiles),
+            'users': [
+                {'id': profile.user.pk, 'profile_id': profile.pk, 'username': profile.user.username, 'role': profile.role}
+                for profile in profiles
+            ],
+        }, status=status.HTTP_201_CREATED)
+
     # Surcharge de la méthode 'create' (pour les admins uniquement) pour utiliser le RegisterSerializer
     # Un admin peut créer n'importe quel type d'utilisateur
     def create(self, request, *args, **kwargs):
@@ -129,35 +237,27 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         return Response(UserSerializer(user).data, status=status.HTTP_201_CREATED)
 
 # ViewSet pour la gestion des Cours (/api/courses/)
-class CoursViewSet(viewsets.ModelViewSet):
+class CoursViewSet(ProfiledViewMixin, SparseFieldsetViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Cours.objects.all()
     serializer_class = CoursSerializer
+    pagination_class = CoursPagination
+    # Tables lues par la réponse : le cours, sa spécialité, sa promotion et le nom d'utilisateur du formateur.
+    # Profile est inclus car les spécialités assignées d'un formateur changent les cours qu'il voit.
+    version_models = (Cours, Speciality, Promotion, Profile, User)
+
+    def get_version_scope(self):
+        # Deux appelants ne reçoivent pas la même liste de cours : leur périmètre entre dans l'ETag
+        return cours_scope(get_principal(self.request))
 
     # Surcharge de get_queryset pour filtrer les cours visibles en fonction du rôle de l'utilisateur.
     # C'est une logique d'autorisation au niveau de l'objet.
     def get_queryset(self):
-        user_profile = self.request.user.profile
+        # Les règles par rôle sont dans user/visibility.py :
+        # - formateur : les cours qu'il enseigne OU ceux de ses spécialités assignées
+        # - étudiant : les cours de SA promotion OU de SA spécialité
+        # - administrateur : tous les cours
         queryset = Cours.objects.select_related('formateur__user', 'speciality', 'promotion')
-
-        if user_profile.role == Profile.Roles.FORMATEUR:
-            # Un formateur peut voir :
-            # 1. Les cours qu'il est désigné comme formateur principal (`formateur=user_profile`)
-            # OU
-            # 2. Les cours qui appartiennent à n'importe quelle spécialité à laquelle il est assigné (`speciality__in=user_profile.assigned_specialities.all()`)
-            return queryset.filter(
-                Q(formateur=user_profile) | Q(speciality__in=user_profile.assigned_specialities.all())
-            ).distinct() # `distinct()` pour éviter les doublons si un cours correspond aux deux conditions
-        elif user_profile.role == Profile.Roles.ETUDIANT:
-            # Un étudiant ne peut voir que les cours de SA promotion OU de SA spécialité
-            if user_profile.promotion:
-                return queryset.filter(
-                    Q(promotion=user_profile.promotion) | Q(speciality=user_profile.promotion.speciality)
-                ).distinct()
-            return Cours.objects.none()
-        elif user_profile.role == Profile.Roles.ADMIN:
-            # Un administrateur voit tous les cours
-            return queryset.all()
-        return Cours.objects.none() # Si le rôle n'est pas reconnu (ou pas authentifié), retourne un queryset vide
+        return visible_cours(get_principal(self.request), queryset)
 
     def get_permissions(self):
         # Définition des permissions par action
@@ -169,95 +269,98 @@ class CoursViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.IsAuthenticated] # Default
         return [permission() for permission in permission_classes]
 
-    def _check_trainer_course_permission(self, user_profile, course):
+    def _check_trainer_course_permission(self, principal, course):
         """Vérifie si un formateur a la permission de modifier/supprimer un cours."""
-        is_main_trainer = course.formateur == user_profile
-        is_in_assigned_speciality = (
-            course.speciality and
-            course.speciality in user_profile.assigned_specialities.all()
-        )
-        if not (is_main_trainer or is_in_assigned_speciality):
-            raise permissions.PermissionDenied("Vous ne pouvez agir que sur les cours que vous enseignez ou ceux de vos spécialités assignées.")
+        if not principal.manages_cours(course):
+            raise PermissionDenied("Vous ne pouvez agir que sur les cours que vous enseignez ou ceux de vos spécialités assignées.")
 
     # Logique exécutée juste avant la sauvegarde lors de la création d'un cours
     def perform_create(self, serializer):
-        user_profile = self.request.user.profile
+        principal = get_principal(self.request)
 
-        if user_profile.role == Profile.Roles.FORMATEUR:
+        if principal.is_trainer:
             # Si c'est un formateur qui crée le cours, il est automatiquement assigné comme formateur du cours.
             # ET on vérifie que la `speciality` spécifiée pour le cours est bien parmi les `assigned_specialities` du formateur.
             speciality_for_course = serializer.validated_data.get('speciality')
-            if speciality_for_course and speciality_for_course not in user_profile.assigned_specialities.all():
-                raise permissions.PermissionDenied("Vous ne pouvez créer de cours que pour les spécialités auxquelles vous êtes assigné en tant que formateur.")
-            serializer.save(formateur=user_profile) # Assigne le formateur connecté comme formateur du cours
-        elif user_profile.role == Profile.Roles.ADMIN:
+            if speciality_for_course and speciality_for_course.pk not in principal.speciality_ids:
+                raise PermissionDenied("Vous ne pouvez créer de cours que pour les spécialités auxquelles vous êtes assigné en tant que formateur.")
+            serializer.save(formateur=principal.profile) # Assigne le formateur connecté comme formateur du cours
+        elif principal.is_admin:
             # Un admin peut créer un cours sans restriction et peut spécifier n'importe quel formateur (ou aucun)
             serializer.save()
         else:
             # Cette branche ne devrait normalement pas être atteinte si les permissions sont bien configurées
-            raise permissions.PermissionDenied("Vous n'êtes pas autorisé à créer des cours.")
+            raise PermissionDenied("Vous n'êtes pas autorisé à créer des cours.")
 
     # Logique exécutée juste avant la sauvegarde lors de la mise à jour d'un cours
     def perform_update(self, serializer):
-        instance = self.get_object() # Le cours que l'on tente de modifier
-        user_profile = self.request.user.profile
+        instance = serializer.instance # Le cours que l'on tente de modifier (déjà chargé par get_object)
+        principal = get_principal(self.request)
 
-        if user_profile.role == Profile.Roles.FORMATEUR:
-            self._check_trainer_course_permission(user_profile, instance)
+        if principal.is_trainer:
+            self._check_trainer_course_permission(principal, instance)
 
             # Si le formateur essaie de changer la spécialité ou la promotion d'un cours existant,
             # on s'assure que la nouvelle spécialité fait toujours partie de ses spécialités assignées.
             new_speciality = serializer.validated_data.get('speciality')
-            if new_speciality and new_speciality != instance.speciality and new_speciality not in user_profile.assigned_specialities.all():
-                 raise permissions.PermissionDenied("Vous ne pouvez modifier un cours pour une spécialité qui ne vous est pas assignée.")
+            if new_speciality and new_speciality.pk != instance.speciality_id and new_speciality.pk not in principal.speciality_ids:
+                 raise PermissionDenied("Vous ne pouvez modifier un cours pour une spécialité qui ne vous est pas assignée.")
 
         serializer.save()
 
     # Logique exécutée juste avant la suppression d'un cours
     def perform_destroy(self, instance):
-        user_profile = self.request.user.profile
-        if user_profile.role == Profile.Roles.FORMATEUR:
-            self._check_trainer_course_permission(user_profile, instance)
+        principal = get_principal(self.request)
+        if principal.is_trainer:
+            self._check_trainer_course_permission(principal, instance)
         instance.delete()
 
+    # Action personnalisée pour les statistiques des notes d'un cours
+    # Accessible via GET /api/courses/{id}/stats/
+    # Les valeurs sont lues dans la table CourseGradeStats, maintenue à chaque écriture de note :
+    # aucune note du cours n'est parcourue.
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        cours_obj = self.get_object() # Applique les règles de visibilité de get_queryset
+        stats = CourseGradeStats.objects.filter(cours=cours_obj).first() or CourseGradeStats(cours=cours_obj)
+
+        width = CourseGradeStats.HISTOGRAM_BUCKET_WIDTH
+        histogram = stats.histogram or [0] * CourseGradeStats.HISTOGRAM_BUCKETS
+        return Response({
+            'cours_id': cours_obj.pk,
+            'count': stats.count,
+            'mean': round(float(stats.mean), 2) if stats.count else None,
+            'min': stats.min_valeur,
+            'max': stats.max_valeur,
+            'stddev': round(float(stats.stddev), 2) if stats.count else None,
+            'histogram': [
+                {'min': index * width, 'max': (index + 1) * width, 'count': count}
+                for index, count in enumerate(histogram)
+            ],
+        })
+
 
 # ViewSet pour la gestion des Notes (/api/grades/)
-class NoteViewSet(viewsets.ModelViewSet):
+class NoteViewSet(ProfiledViewMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Note.objects.all()
     serializer_class = NoteSerializer
+    pagination_class = NotePagination # Pagination par curseur sur (date_publication, id)
 
     # Surcharge de get_queryset pour filtrer les notes visibles en fonction du rôle de l'utilisateur.
     def get_queryset(self):
-        user_profile = self.request.user.profile
+        # Les règles par rôle sont dans user/visibility.py :
+        # - étudiant : SES propres notes
+        # - formateur : les notes des cours qu'il enseigne ou de ses spécialités assignées, et celles qu'il a publiées
+        # - administrateur : toutes les notes
         queryset = Note.objects.select_related(
             'etudiant__user', 'cours', 'publie_par__user', 'cours__speciality'
         )
-
-        if user_profile.role == Profile.Roles.ETUDIANT:
-            # Un étudiant ne voit que SES propres notes.
-            return queryset.filter(etudiant=user_profile)
-        elif user_profile.role == Profile.Roles.FORMATEUR:
-            # Un formateur peut voir :
-            # 1. Les notes des cours qu'il enseigne (`cours__formateur=user_profile`)
-            # OU
-            # 2. Les notes des cours qui appartiennent à ses spécialités assignées (`cours__speciality__in=user_profile.assigned_specialities.all()`)
-            # OU
-            # 3. Les notes qu'il a publiées lui-même (`publie_par=user_profile`)
-            return queryset.filter(
-                Q(cours__formateur=user_profile) |
-                Q(cours__speciality__in=user_profile.assigned_specialities.all()) |
-                Q(publie_par=user_profile)
-            ).distinct()
-        elif user_profile.role == Profile.Roles.ADMIN:
-            # Un administrateur voit toutes les notes.
-            return queryset.all()
-
-        return Note.objects.none() # Par défaut, aucun accès
+        return visible_notes(get_principal(self.request), queryset)
 
     def get_permissions(self):
         # Définition des permissions par action
-        if self.action == 'create':
-            permission_classes = [IsTrainer] # Seuls les formateurs peuvent créer des notes
+        if self.action in ['create', 'bulk', 'import_csv']:
+            permission_classes = [IsTrainer] # Seuls les formateurs peuvent créer des notes (une par une, par lot ou par fichier)
         elif self.action in ['update', 'partial_update', 'destroy']:
             permission_classes = [IsAdminOrTrainer] # Admins et formateurs peuvent modifier/supprimer
         elif self.action in ['list', 'retrieve']:
@@ -269,88 +372,219 @@ class NoteViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.IsAuthenticated] # Default
         return [permission() for permission in permission_classes]
 
-    def _check_trainer_note_permission(self, user_profile, note):
+    def _check_trainer_note_permission(self, principal, note):
         """Vérifie si un formateur a la permission de modifier/supprimer une note."""
-        cours_obj = note.cours
-        is_main_trainer = cours_obj.formateur == user_profile
-        is_in_assigned_speciality = (
-            cours_obj.speciality and
-            cours_obj.speciality in user_profile.assigned_specialities.all()
-        )
-        if not (is_main_trainer or is_in_assigned_speciality):
-            raise permissions.PermissionDenied("Vous ne pouvez agir que sur les notes des cours que vous enseignez ou de vos spécialités assignées.")
+        if not principal.manages_cours(note.cours):
+            raise PermissionDenied("Vous ne pouvez agir que sur les notes des cours que vous enseignez ou de vos spécialités assignées.")
 
-    # Logique exécutée juste avant la sauvegarde lors de la création d'une note
+    # Création d'une note, ou de plusieurs avec une liste JSON ([{...}, {...}]) : la liste est validée
+    # en un nombre fixe de requêtes (NoteListSerializer) et les notes sont créées ensemble, ou aucune.
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=isinstance(request.data, list))
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    # Logique exécutée juste avant la sauvegarde lors de la création d'une note (ou d'une liste de notes)
     def perform_create(self, serializer):
-        cours_obj = serializer.validated_data['cours'] # Le cours pour lequel la note est attribuée
-        user_profile = self.request.user.profile
+        items = serializer.validated_data if isinstance(serializer.validated_data, list) else [serializer.validated_data]
+        principal = get_principal(self.request)
 
-        if user_profile.role == Profile.Roles.FORMATEUR:
-            self._check_trainer_note_permission(user_profile, Note(cours=cours_obj))
+        if principal.is_trainer:
+            # La permission est vérifiée une fois par cours (le cours pour lequel chaque note est attribuée)
+            for cours_obj in {item['cours'].pk: item['cours'] for item in items}.values():
+                self._check_trainer_note_permission(principal, Note(cours=cours_obj))
 
         # Le formateur connecté (ou l'admin) est automatiquement défini comme 'publie_par'
-        serializer.save(publie_par=user_profile)
+        serializer.save(publie_par=principal.profile)
 
     # Logique exécutée juste avant la sauvegarde lors de la mise à jour d'une note
     def perform_update(self, serializer):
-        instance = self.get_object() # La note que l'on tente de modifier
-        if self.request.user.profile.role == Profile.Roles.FORMATEUR:
-            self._check_trainer_note_permission(self.request.user.profile, instance)
+        instance = serializer.instance # La note que l'on tente de modifier (déjà chargée par get_object)
+        principal = get_principal(self.request)
+        if principal.is_trainer:
+            self._check_trainer_note_permission(principal, instance)
         serializer.save()
 
     # Logique exécutée juste avant la suppression d'une note
     def perform_destroy(self, instance):
-        if self.request.user.profile.role == Profile.Roles.FORMATEUR:
-            self._check_trainer_note_permission(self.request.user.profile, instance)
+        principal = get_principal(self.request)
+        if principal.is_trainer:
+            self._check_trainer_note_permission(principal, instance)
         instance.delete()
 
+    # Action personnalisée pour la saisie groupée des notes d'un cours
+    # Accessible via POST /api/grades/bulk/ avec {"cours_id": 1, "notes": [{"etudiant_id": 5, "valeur": "14.50"}, ...]}
+    # Les notes existantes pour la paire (etudiant, cours) sont mises à jour, les autres sont créées.
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        serializer = NoteBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cours_obj = serializer.validated_data['cours']
+        principal = get_principal(request)
+
+        # La permission est vérifiée une seule fois pour tout le lot (un seul cours)
+        if principal.is_trainer:
+            self._check_trainer_note_permission(principal, Note(cours=cours_obj))
+
+        # Validation de chaque ligne sans accès à la base de données
+        errors = []
+        valid_items = []
+        for index, item in enumerate(serializer.validated_data['notes']):
+            item_serializer = NoteBulkItemSerializer(data=item)
+            if item_serializer.is_valid():
+                valid_items.append((index, item_serializer.validated_data))
+            else:
+                errors.append({'index': index, 'etudiant_id': item.get('etudiant_id'), 'errors': item_serializer.errors})
+
+        # Une seule requête pour vérifier l'existence de tous les étudiants du lot
+        etudiant_ids = {data['etudiant_id'] for _, data in valid_items}
+        known_etudiants = set(
+            Profile.objects.filter(role=Profile.Roles.ETUDIANT, pk__in=etudiant_ids).values_list('pk', flat=True)
+        )
+
+        rows = []
+        seen = set()
+        for index, data in valid_items:
+            etudiant_id = data['etudiant_id']
+            if etudiant_id not in known_etudiants:
+                errors.append({'index': index, 'etudiant_id': etudiant_id, 'errors': {'etudiant_id': ["Étudiant introuvable."]}})
+            elif etudiant_id in seen:
+                errors.append({'index': index, 'etudiant_id': etudiant_id, 'errors': {'etudiant_id': ["Cet étudiant apparaît plusieurs fois dans le lot."]}})
+            else:
+                seen.add(etudiant_id)
+                rows.append((etudiant_id, cours_obj.pk, data['valeur']))
+
+        counts = upsert_notes(rows, publie_par=principal.profile)
+        errors.sort(key=lambda error: error['index'])
+
+        # Le lot n'échoue entièrement que si aucune ligne n'est valide
+        response_status = status.HTTP_400_BAD_REQUEST if errors and not rows else status.HTTP_200_OK
+        return Response({'cours_id': cours_obj.pk, **counts, 'errors': errors}, status=response_status)
+
+    # Action personnalisée pour importer les notes d'un tableur
+    # Accessible via POST /api/grades/import/ avec un fichier CSV (champ 'file') : soit la mise en page de
+    # export_csv (colonnes 'Nom Etudiant', 'Cours', 'Note'), soit les colonnes username, course, grade.
+    # Le fichier est lu en flux et les notes sont écrites par lots (voir user/grade_imports.py).
+    # Comme pour la saisie groupée, les lignes valides sont enregistrées et le rapport donne le statut de chaque ligne.
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def import_csv(self, request):
+        uploaded_file = request.FILES.get('file')
+        if uploaded_file is None:
+            return Response({"detail": "Envoyez un fichier CSV (champ 'file')."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            report = import_grades(uploaded_file, get_principal(request))
+        except ImportFormatError as error:
+            return Response({"detail": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        written = report['created'] + report['updated'] + report['unchanged']
+        response_status = status.HTTP_400_BAD_REQUEST if report['errors'] and not written else status.HTTP_200_OK
+        return Response(report, status=response_status)
+
     # Action personnalisée pour exporter les notes au format CSV
     # Accessible via GET /api/grades/export_csv/
+    # La réponse est envoyée en flux (StreamingHttpResponse) au fur et à mesure de la lecture des notes :
+    # la mémoire utilisée reste constante et le premier octet part immédiatement.
     @action(detail=False, methods=['get'])
     def export_csv(self, request):
-        user_profile = request.user.profile
+        principal = get_principal(request)
 
         # Déterminez le queryset de notes que l'utilisateur a le droit d'exporter
         # On réutilise la logique de get_queryset pour la cohérence
-        notes_to_export = self.get_queryset()
-
-        # Optimisation pour éviter les requêtes N+1 lors de la génération du CSV
-        notes = notes_to_export.select_related(
-            'etudiant__user',
-            'etudiant__promotion__speciality',
-            'cours__speciality',
-            'publie_par__user'
-        )
+        notes = self.get_queryset()
 
-        if not notes.exists() and user_profile.role != Profile.Roles.ADMIN:
+        if not notes.exists() and not principal.is_admin:
              return Response({"detail": "Vous n'êtes pas autorisé à exporter des notes ou il n'y a aucune note à exporter."}, status=status.HTTP_403_FORBIDDEN)
 
-        # Prépare la réponse HTTP pour un fichier CSV
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        # Prépare la réponse HTTP en flux pour un fichier CSV
+        response = StreamingHttpResponse(iter_notes_csv(notes), content_type='text/csv; charset=utf-8')
         # Définit le nom du fichier qui sera téléchargé
         response['Content-Disposition'] = f'attachment; filename="notes_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-        
-        writer = csv.writer(response)
-        # Écrit l'en-tête du CSV (noms des colonnes)
-        writer.writerow([
-            'Nom Etudiant', 'Cours', 'Note', 'Date Publication', 'Publie Par',
-            'Specialite Etudiant', 'Promotion Etudiant', 'Specialite Cours'
-        ])
-        
-        # Itère sur les notes et écrit chaque ligne dans le CSV
-        for note in notes:
-            etudiant_profile = note.etudiant
-            cours_obj = note.cours
-            etudiant_speciality_name = etudiant_profile.promotion.speciality.name if etudiant_profile.promotion and etudiant_profile.promotion.speciality else 'N/A'
-
-            writer.writerow([
-                etudiant_profile.user.username,
-                cours_obj.nom,
-                str(note.valeur), # Convertir le Decimal en string pour le CSV
-                note.date_publication.strftime("%Y-%m-%d %H:%M:%S"), # Formater la date
-                note.publie_par.user.username if note.publie_par else 'N/A', # Gérer le cas où publie_par est NULL
-                etudiant_speciality_name,
-                etudiant_profile.promotion.name if etudiant_profile.promotion else 'N/A',
-                cours_obj.speciality.name if cours_obj.speciality else 'N/A'
-            ])
-        return response
\ No newline at end of file
+        return response
+
+    # Exports CSV en arrière-plan (voir user/export_jobs.py) : POST /api/grades/exports/ enregistre l'export
+    # (202, ou 200 si un export identique existe déjà), GET /api/grades/exports/{id}/ donne son statut et
+    # GET /api/grades/exports/{id}/download/ le fichier terminé. Mêmes notes que export_csv, selon le rôle.
+    @action(detail=False, methods=['post'], url_path='exports')
+    def exports(self, request):
+        job, created = request_export(get_principal(request))
+        serializer = ExportJobSerializer(job, context={'request': request})
+        headers = {'Location': serializer.data['status_url']}
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK, headers=headers)
+
+    def _get_export_job(self, request, job_id):
+        job = ExportJob.objects.filter(pk=job_id).first()
+        # Un export d'un autre périmètre est traité comme inexistant (comme une note non visible)
+        if job is None or not can_access_export(get_principal(request), job):
+            raise Http404
+        return job
+
+    @action(detail=False, methods=['get'], url_path=r'exports/(?P<job_id>[0-9]+)', url_name='export-detail')
+    def export_detail(self, request, job_id=None):
+        job = self._get_export_job(request, job_id)
+        return Response(ExportJobSerializer(job, context={'request': request}).data)
+
+    @action(detail=False, methods=['get'], url_path=r'exports/(?P<job_id>[0-9]+)/download', url_name='export-download')
+    def export_download(self, request, job_id=None):
+        job = self._get_export_job(request, job_id)
+        if job.status != ExportJob.Status.DONE:
+            return Response({"detail": "L'export n'est pas terminé.", "status": job.status}, status=status.HTTP_409_CONFLICT)
+        try:
+            file = job.file.open('rb')
+        except FileNotFoundError:
+            # Fichier supprimé du stockage : l'export passe en échec pour qu'une nouvelle demande en relance un
+            ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.Status.FAILED, error="Fichier d'export introuvable.")
+            return Response(
+                {"detail": "Le fichier de cet export n'est plus disponible. Demandez un nouvel export."},
+                status=status.HTTP_410_GONE,
+            )
+        filename = f'notes_{job.created_at.strftime("%Y%m%d_%H%M%S")}.csv'
+        return FileResponse(file, as_attachment=True, filename=filename, content_type='text/csv; charset=utf-8')
+
+
+# ViewSet du flux de synchronisation incrémentale de l'application mobile (/api/sync/?since=<jeton>)
+# Renvoie les notes et les cours créés, modifiés ou supprimés depuis le jeton, dans le périmètre de l'appelant,
+# et le jeton suivant (voir user/sync.py). Sans changement, une seule requête en plus de l'authentification.
+class SyncViewSet(ProfiledViewMixin, viewsets.ViewSet):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request):
+        try:
+            changes = sync_changes(
+                get_principal(request), request.query_params.get('since'),
+                # Mêmes jointures que NoteViewSet et CoursViewSet (champs lus par les sérialiseurs)
+                notes_queryset=Note.objects.select_related('etudiant__user', 'cours', 'publie_par__user', 'cours__speciality'),
+                cours_queryset=Cours.objects.select_related('formateur__user', 'speciality', 'promotion'),
+            )
+        except InvalidSyncToken as error:
+            raise ValidationError({'since': [str(error)]})
+        context = {'request': request}
+        return Response({
+            'token': changes['token'],
+            'reset': changes['reset'],
+            'has_more': changes['has_more'],
+            'grades': {
+                'changed': [] if changes['notes'] is None else NoteSerializer(changes['notes'], many=True, context=context).data,
+                'deleted': changes['deleted_notes'],
+            },
+            'courses': {
+                'changed': [] if changes['cours'] is None else CoursSerializer(changes['cours'], many=True, context=context).data,
+                'deleted': changes['deleted_cours'],
+            },
+        })
+
+
+class MetricsView(ProfiledViewMixin, APIView):
+    """
+    GET /api/v1/_metrics : histogrammes de latence du processus (user/profiling.py), au format texte de
+    Prometheus. Réservé aux administrateurs (le collecteur s'authentifie avec un jeton JWT d'administrateur).
+    Chaque processus a ses propres histogrammes : le collecteur interroge chaque processus.
+    """
+    permission_classes = [IsAdmin]
+    renderer_classes = [PrometheusTextRenderer]
+
+    def get(self, request):
+        if not profiling_enabled():
+            raise NotFound("Le profilage des requêtes est désactivé (REQUEST_PROFILING).")
+        # Version du format d'exposition attendue par Prometheus
+        return Response(registry.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,110 @@
+# user/visibility.py
+
+# Règles de visibilité des cours et des notes selon le rôle de l'appelant (voir user/principal.py).
+# Les filtres n'utilisent que des colonnes de la table interrogée ou des sous-requêtes
+# d'identifiants (IN / UNION) : aucune jointure multi-valuée, donc aucun DISTINCT à trier
+# sur des lignes larges, et chaque branche peut s'appuyer sur son propre index.
+
+from django.db.models import Q
+
+from .models import Cours, Note, Tombstone
+
+
+def cours_filter(principal):
+    """
+    Condition de visibilité des cours, ou None si l'appelant voit tous les cours.
+    Ne porte que sur des colonnes de user_cours (formateur_id, speciality_id, promotion_id).
+    """
+    if principal.is_admin:
+        return None
+    if principal.is_trainer:
+        # Les cours qu'il enseigne OU ceux de ses spécialités assignées
+        return Q(formateur_id=principal.profile_id) | Q(speciality_id__in=principal.speciality_ids)
+    if principal.is_student and principal.promotion_id:
+        # Les cours de SA promotion OU de SA spécialité
+        return Q(promotion_id=principal.promotion_id) | Q(speciality_id=principal.promotion_speciality_id)
+    return Q(pk__in=[]) # Aucun cours visible
+
+
+def cours_scope(principal):
+    """
+    Paramètres de cours_filter pour l'appelant : deux appelants de même périmètre voient
+    exactement les mêmes cours (utilisé dans l'ETag des listes de cours).
+    """
+    if principal is None:
+        return None
+    if principal.is_admin:
+        return [principal.role]
+    if principal.is_trainer:
+        return [principal.role, principal.profile_id, sorted(principal.speciality_ids)]
+    if principal.is_student and principal.promotion_id:
+        return [principal.role, principal.promotion_id, principal.promotion_speciality_id]
+    return []
+
+
+def notes_scope(principal):
+    """
+    Paramètres de visible_notes pour l'appelant : deux appelants de même périmètre voient exactement
+    les mêmes notes (utilisé pour partager les exports en arrière-plan, voir user/export_jobs.py).
+    """
+    if principal is None:
+        return None
+    if principal.is_admin:
+        return [principal.role]
+    if principal.is_student:
+        return [principal.role, principal.profile_id]
+    if principal.is_trainer:
+        return [principal.role, principal.profile_id, sorted(principal.speciality_ids)]
+    return []
+
+
+def visible_cours(principal, queryset=None):
+    """Filtre un queryset de cours selon la visibilité de l'appelant."""
+    queryset = Cours.objects.all() if queryset is None else queryset
+    if principal is None:
+        return queryset.none()
+    condition = cours_filter(principal)
+    return queryset if condition is None else queryset.filter(condition)
+
+
+def visible_notes(principal, queryset=None):
+    """Filtre un queryset de notes selon la visibilité de l'appelant."""
+    queryset = Note.objects.all() if queryset is None else queryset
+    if principal is None:
+        return queryset.none()
+    if principal.is_admin:
+        return queryset
+    if principal.is_student:
+        # Un étudiant ne voit que SES propres notes
+        return queryset.filter(etudiant_id=principal.profile_id)
+    if principal.is_trainer:
+        # Un formateur voit les notes des cours visibles (index sur cours_id) UNION celles qu'il a
+        # publiées (index sur publie_par_id). L'union ne porte que sur des identifiants.
+        visible_cours_ids = visible_cours(principal).order_by().values('id')
+        note_ids = Note.objects.order_by().filter(cours_id__in=visible_cours_ids).values('id').union(
+            Note.objects.order_by().filter(publie_par_id=principal.profile_id).values('id')
+        )
+        return queryset.filter(pk__in=note_ids)
+    return queryset.none()
+
+
+def visible_tombstones(principal, queryset=None):
+    """
+    Filtre les traces de suppression (user/sync.py) selon les règles de visibilité ci-dessus, appliquées
+    aux colonnes recopiées sur la trace : un appelant ne reçoit que les suppressions de lignes qu'il voyait.
+    """
+    queryset = Tombstone.objects.all() if queryset is None else queryset
+    if principal is None:
+        return queryset.none()
+    if principal.is_admin:
+        return queryset
+    # Cours : cours_filter ne lit que formateur_id, speciality_id et promotion_id, recopiés sur la trace
+    condition = Q(kind=Tombstone.Kinds.COURS) & cours_filter(principal)
+    if principal.is_student:
+        condition |= Q(kind=Tombstone.Kinds.NOTE, etudiant_id=principal.profile_id)
+    elif principal.is_trainer:
+        # Comme visible_notes : les notes des cours visibles (formateur / spécialité du cours) et celles qu'il a publiées
+        condition |= Q(kind=Tombstone.Kinds.NOTE) & (
+            Q(formateur_id=principal.profile_id) | Q(speciality_id__in=principal.speciality_ids) | Q(publie_par_id=principal.profile_id)
+        )
+    return queryset.filter(condition)
@@ -9,6 +9,31 @@ import 'package:trow_app_frontend/core/models/cours.dart';
 import 'package:trow_app_frontend/core/models/note.dart';
 
 class ApiService {
+  // =====================
+  // LISTES PAGINÉES
+  // =====================
+  // Les listes de l'API sont paginées par curseur : {"next": url | null, "previous": url | null, "results": [...]}.
+  // Suit les liens "next" jusqu'à la dernière page et renvoie toutes les lignes.
+  Future<List<dynamic>> _getAllPages(Uri uri, Map<String, String> headers, String errorMessage) async {
+    final List<dynamic> results = [];
+    Uri? next = uri;
+    while (next != null) {
+      final response = await http.get(next, headers: headers);
+      if (response.statusCode != 200) {
+        throw Exception('$errorMessage Status code: ${response.statusCode}, Body: ${response.body}');
+      }
+      final dynamic body = jsonDecode(utf8.decode(response.bodyBytes));
+      if (body is List) {
+        // Serveur sans pagination (ancienne version de l'API)
+        results.addAll(body);
+        break;
+      }
+      results.addAll(body['results'] as List<dynamic>);
+      next = body['next'] != null ? Uri.parse(body['next'] as String) : null;
+    }
+    return results;
+  }
+
   // =====================
   // LOGIN
   // =====================
@@ -57,58 +82,40 @@ class ApiService {
     // role ∈ { "etudiant", "formateur", "admin" }
     final uri = Uri.parse('$baseUrl/courses/');
 
-    final response = await http.get(
+    final body = await _getAllPages(
       uri,
-      headers: {
+      {
         'Authorization': 'Bearer $accessToken',
       },
+      'Failed to load courses (role: $role).',
     );
-
-    if (response.statusCode == 200) {
-      List<dynamic> body = jsonDecode(utf8.decode(response.bodyBytes));
-      return body.map((dynamic item) => Cours.fromJson(item)).toList();
-    } else {
-      throw Exception(
-        'Failed to load courses (role: $role). '
-        'Status: ${response.statusCode}, Body: ${response.body}',
-      );
-    }
+    return body.map((dynamic item) => Cours.fromJson(item)).toList();
   }
 
   // =====================
   // GRADES
   // =====================
   Future<List<Note>> getMyGrades(String accessToken) async {
-    final response = await http.get(
+    final body = await _getAllPages(
       Uri.parse('$baseUrl/grades/'),
-      headers: {
+      {
         'Authorization': 'Bearer $accessToken',
       },
+      'Failed to load grades.',
     );
-
-    if (response.statusCode == 200) {
-      List<dynamic> body = jsonDecode(utf8.decode(response.bodyBytes));
-      return body.map((dynamic item) => Note.fromJson(item)).toList();
-    } else {
-      throw Exception('Failed to load grades. Status code: ${response.statusCode}');
-    }
+    return body.map((dynamic item) => Note.fromJson(item)).toList();
   }
 
   // Récupérer les notes d’un cours spécifique
   Future<List<Note>> getGradesByCourse(String accessToken, int courseId) async {
-    final response = await http.get(
+    final body = await _getAllPages(
       Uri.parse('$baseUrl/grades/?cours=$courseId'),
-      headers: {
+      {
         'Authorization': 'Bearer $accessToken',
       },
+      'Failed to load grades for course $courseId.',
     );
-
-    if (response.statusCode == 200) {
-      List<dynamic> body = jsonDecode(utf8.decode(response.bodyBytes));
-      return body.map((dynamic item) => Note.fromJson(item)).toList();
-    } else {
-      throw Exception('Failed to load grades for course $courseId');
-    }
+    return body.map((dynamic item) => Note.fromJson(item)).toList();
   }
 
   // Exporter les notes en CSV
@@ -129,49 +136,35 @@ class ApiService {
 
   // --- Récupérer les notes d’un cours précis ---
   Future<List<Note>> getNotesByCourse(String accessToken, int courseId) async {
-    final response = await http.get(
+    final body = await _getAllPages(
       Uri.parse('$baseUrl/grades/?cours=$courseId'),
-      headers: {
+      {
         'Authorization': 'Bearer $accessToken',
         'Content-Type': 'application/json',
       },
+      'Échec lors de la récupération des notes pour le cours $courseId.',
     );
-
-    if (response.statusCode == 200) {
-      List<dynamic> body = jsonDecode(utf8.decode(response.bodyBytes));
-      return body.map((item) => Note.fromJson(item)).toList();
-    } else {
-      throw Exception(
-          'Échec lors de la récupération des notes pour le cours $courseId');
-    }
+    return body.map((item) => Note.fromJson(item)).toList();
   }
 
   /// ADMIN: Récupère TOUS les profils
   Future<List<Profile>> getAllProfiles(String accessToken) async {
-    final response = await http.get(
+    final body = await _getAllPages(
       Uri.parse('$baseUrl/profiles/'),
-      headers: {'Authorization': 'Bearer $accessToken'},
+      {'Authorization': 'Bearer $accessToken'},
+      'Failed to load all profiles.',
     );
-    if (response.statusCode == 200) {
-      List<dynamic> body = jsonDecode(utf8.decode(response.bodyBytes));
-      return body.map((dynamic item) => Profile.fromJson(item)).toList();
-    } else {
-      throw Exception('Failed to load all profiles');
-    }
+    return body.map((dynamic item) => Profile.fromJson(item)).toList();
   }
 
   /// TRAINER: Récupère les notes pour un cours spécifique
   Future<List<Note>> getNotesForCourse(String accessToken, int courseId) async {
-    final response = await http.get(
+    final body = await _getAllPages(
       Uri.parse('$baseUrl/grades/?cours=$courseId'),
-      headers: {'Authorization': 'Bearer $accessToken'},
+      {'Authorization': 'Bearer $accessToken'},
+      'Failed to load notes for course $courseId.',
     );
-    if (response.statusCode == 200) {
-      List<dynamic> body = jsonDecode(utf8.decode(response.bodyBytes));
-      return body.map((dynamic item) => Note.fromJson(item)).toList();
-    } else {
-      throw Exception('Failed to load notes for course $courseId');
-    }
+    return body.map((dynamic item) => Note.fromJson(item)).toList();
   }
 
   /// TRAINER: Ajoute une nouvelle note
@@ -254,30 +247,22 @@ class ApiService {
 
   // Récupérer la liste des promotions
   Future<List<Promotion>> getPromotions(String accessToken) async {
-    final response = await http.get(
+    final body = await _getAllPages(
       Uri.parse('$baseUrl/promotions/'),
-      headers: {'Authorization': 'Bearer $accessToken'},
+      {'Authorization': 'Bearer $accessToken'},
+      'Failed to load promotions.',
     );
-    if (response.statusCode == 200) {
-      List<dynamic> body = jsonDecode(utf8.decode(response.bodyBytes));
-      return body.map((dynamic item) => Promotion.fromJson(item)).toList();
-    } else {
-      throw Exception('Failed to load promotions. Status code: ${response.statusCode}');
-    }
+    return body.map((dynamic item) => Promotion.fromJson(item)).toList();
   }
 
   // Récupérer la liste des spécialités
   Future<List<Speciality>> getSpecialities(String accessToken) async {
-    final response = await http.get(
+    final body = await _getAllPages(
       Uri.parse('$baseUrl/specialities/'),
-      headers: {'Authorization': 'Bearer $accessToken'},
+      {'Authorization': 'Bearer $accessToken'},
+      'Failed to load specialities.',
     );
-    if (response.statusCode == 200) {
-      List<dynamic> body = jsonDecode(utf8.decode(response.bodyBytes));
-      return body.map((dynamic item) => Speciality.fromJson(item)).toList();
-    } else {
-      throw Exception('Failed to load specialities. Status code: ${response.statusCode}');
-    }
+    return body.map((dynamic item) => Speciality.fromJson(item)).toList();
   }
 
   // Mettre à jour un profil utilisateur ADMIN